@@ -34,8 +34,7 @@ def main():
     # %% load az/el data
     themis = ta.loadcal(P.themiscal)
     if themis.site == "gako":
-        themis.attrs["Baz"] = 21.028
-        themis.attrs["Bel"] = 75.816
+        # magnetic zenith Baz, Bel from the bundled field model at this epoch
         themis.attrs["Bepoch"] = "2010-01-01"
         themis.attrs["verbose"] = False
         themis.attrs["srpts"] = np.logspace(5, 6.9, 40)
@@ -46,8 +45,6 @@ def main():
         dasc.attrs["lat"] = 65.126
         dasc.attrs["lon"] = -147.479
         dasc.attrs["alt_m"] = 200.0
-        dasc.attrs["Baz"] = 21.145  # Baz = declination
-        dasc.attrs["Bel"] = 77.464  # Bel = inclination
         dasc.attrs["Bepoch"] = "2010-01-01"
         dasc.attrs["verbose"] = False
         # np.linspace(10**4.6,10**6.8,40) #np.logspace(4.6, 6.4, 40)
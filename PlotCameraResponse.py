@@ -8,8 +8,8 @@ import pandas
 import numpy as np
 from matplotlib.pyplot import figure, show
 
-camfn = "data/icx249al_response.csv"
-filtfn = "data/ir_filter.csv"
+camfn = "src/themisasi/icx249al_response.csv"
+filtfn = "src/themisasi/ir_filter.csv"
 
 resp = pandas.read_csv(camfn, index_col=0)
 filt = pandas.read_csv(filtfn, index_col=0)
@@ -1,5 +1,17 @@
-from .io import load, loadcal, filetimes
-
 __all__ = ["load", "loadcal", "filetimes"]
 
 __version__ = "1.2.0"
+
+
+# xarray, cdflib etc. are imported on first use, for fast startup of short-lived processes
+def __getattr__(name: str):
+    if name in __all__:
+        from . import io
+
+        return getattr(io, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
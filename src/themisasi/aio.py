@@ -0,0 +1,166 @@
+"""
+asyncio counterparts of the readers, for services that must not block the event loop
+
+CDF decoding and calibration reading run in a bounded thread pool.
+Concurrent requests for the same time slice or calibration file share one read,
+so a burst of requests for the latest frames costs one decode.
+Cancelling a request stops waiting at once, and work not yet started is dropped when no request waits for it.
+
+    dat = await themisasi.aio.aload("~/data/themis", "gako", "2011-01-06T17:00:03")
+    dats = await themisasi.aio.aload_sites("~/data/themis", ["gako", "fykn"], "2011-01-06T17:00:03")
+    async for imgs in themisasi.aio.aiterload(fn, batch=64):
+        ...
+
+Coalesced requests share the returned Dataset: copy it before modifying in place.
+"""
+
+from __future__ import annotations
+import asyncio
+import collections.abc
+import concurrent.futures
+import functools
+import typing
+from pathlib import Path
+
+from .io import iterload, loadcal_file, _assemble, _calpath, _timeslice, _timereq
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+MAX_WORKERS = 4  # threads decoding at once
+
+_executor: concurrent.futures.ThreadPoolExecutor | None = None
+# (event loop, request): [future of the shared read, number of waiting requests]
+_inflight: dict[tuple, list] = {}
+
+
+def executor() -> concurrent.futures.ThreadPoolExecutor:
+    """the bounded thread pool of the readers, created on first use"""
+    global _executor
+
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(
+            MAX_WORKERS, thread_name_prefix="themisasi"
+        )
+
+    return _executor
+
+
+async def aload(
+    path: Path,
+    site: str | None = None,
+    treq=None,
+    calfn: Path | None = None,
+    quality: bool | dict[str, float | None] | None = None,
+    caldtype: str | None = None,
+    background: Path | bool | None = None,
+) -> xarray.Dataset:
+    """
+    read THEMIS ASI camera data without blocking the event loop, see themisasi.load()
+
+    The time slice and the calibration are read concurrently,
+    each shared with other requests in flight for the same slice or calibration file.
+    """
+    if treq is not None:
+        treq = _timereq(treq)
+
+    imgs, cal = await asyncio.gather(
+        _coalesced(
+            ("timeslice", str(path), site, str(treq), repr(quality)),
+            _timeslice,
+            path,
+            site,
+            treq,
+            quality,
+        ),
+        _acal(path, site, treq, calfn, caldtype),
+    )
+
+    return await _run(_assemble, imgs, cal, path, background)
+
+
+async def aload_sites(
+    path: Path, sites: list[str], treq=None, **kwargs
+) -> dict[str, xarray.Dataset]:
+    """
+    read several sites concurrently, see aload()
+
+    If any site fails, the others are cancelled and the error is raised.
+
+    Returns
+    -------
+    dats: dict of xarray.Dataset
+        site: data
+    """
+    async with asyncio.TaskGroup() as tg:
+        tasks = {s: tg.create_task(aload(path, s, treq, **kwargs)) for s in sites}
+
+    return {s: t.result() for s, t in tasks.items()}
+
+
+async def aiterload(
+    path: Path | list[Path],
+    site: str | None = None,
+    treq=None,
+    batch: int = 64,
+    quality: bool | dict[str, float | None] | None = None,
+) -> collections.abc.AsyncIterator[xarray.DataArray]:
+    """
+    stream batches of images without blocking the event loop, see themisasi.io.iterload()
+
+    The next batch is read while the current one is processed.
+    """
+    it = iterload(path, site, treq, batch, quality)
+
+    # iterload() never yields None
+    pending = executor().submit(next, it, None)
+    try:
+        while (imgs := await asyncio.wrap_future(pending)) is not None:
+            pending = executor().submit(next, it, None)
+            yield imgs
+    finally:
+        if pending.cancel() or pending.done():
+            it.close()
+        else:  # the generator is reading in a thread, close it there when the read finishes
+            pending.add_done_callback(lambda _: it.close())
+
+
+async def _acal(path, site, treq, calfn, caldtype) -> xarray.Dataset | None:
+    """calibration of aload(), like themisasi.load()"""
+    try:
+        fn = await _run(_calpath, calfn or path, site, treq)
+        return await _coalesced(("cal", str(fn), caldtype), loadcal_file, fn, caldtype)
+    except (FileNotFoundError, ValueError):
+        if calfn:
+            raise
+
+    return None
+
+
+async def _coalesced(key: tuple, func, *args):
+    """run func in the thread pool, shared by concurrent requests with the same key"""
+    loop = asyncio.get_running_loop()
+    k = (loop, key)
+
+    entry = _inflight.get(k)
+    if entry is None:
+        fut = loop.run_in_executor(executor(), functools.partial(func, *args))
+        entry = _inflight[k] = [fut, 0]
+        fut.add_done_callback(lambda f: _inflight.pop(k) if _inflight.get(k) is entry else None)
+
+    entry[1] += 1
+    try:
+        # one request cancelled does not cancel the read for the others
+        return await asyncio.shield(entry[0])
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and not entry[0].done():
+            entry[0].cancel()  # drops the read if not started
+            _inflight.pop(k, None)
+
+
+async def _run(func, *args):
+    """run func in the thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(
+        executor(), functools.partial(func, *args)
+    )
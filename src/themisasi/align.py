@@ -0,0 +1,127 @@
+"""
+match frames of several sites in time, for stereo and mosaics
+
+Exposures of different sites are not exactly simultaneous, and each site is loaded on its own time coordinate.
+Frames are matched to reference times (one site's times, or a common cadence) by binary search,
+and the result is index arrays, so each site's frames are gathered without reindexing whole Datasets:
+
+    idx = themisasi.align.align({"gako": gako, "fykn": fykn}, tol=1.0)
+    gako.isel(time=idx["gako"].values)
+"""
+
+from __future__ import annotations
+import typing
+
+import numpy as np
+
+from .io import TIME_TOL
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+
+def nearest(time, t, tol: float = TIME_TOL) -> np.ndarray:
+    """
+    index of the nearest record time to each requested time
+
+    Parameters
+    ----------
+    time: numpy.ndarray of datetime64
+        increasing record times
+    t: numpy.ndarray of datetime64
+        requested times
+    tol: float
+        maximum offset (seconds) of a match
+
+    Returns
+    -------
+    i: numpy.ndarray of int
+        index into "time" for each of "t", -1 where no record is within tol
+    """
+    time = np.asarray(time, dtype="datetime64[ns]")
+    t = np.atleast_1d(np.asarray(t, dtype="datetime64[ns]"))
+
+    if time.size == 0:
+        return np.full(t.shape, -1)
+
+    k = np.searchsorted(time, t)
+    lo = np.clip(k - 1, 0, time.size - 1)
+    hi = np.clip(k, 0, time.size - 1)
+
+    dlo = abs(t - time[lo])
+    dhi = abs(time[hi] - t)
+    # ties go to the earlier record, like themisasi.load()
+    i = np.where(dhi < dlo, hi, lo)
+    i[np.minimum(dlo, dhi) > np.timedelta64(int(tol * 1e9), "ns")] = -1
+
+    return i
+
+
+def align(
+    sites: dict[str, typing.Any] | list[xarray.Dataset],
+    tol: float = TIME_TOL,
+    cadence: float | None = None,
+    reference: str | None = None,
+    complete: bool = True,
+) -> xarray.Dataset:
+    """
+    match frames across sites within a time tolerance
+
+    Parameters
+    ----------
+    sites: dict or list
+        site: Dataset, DataArray or array of times. A list of Datasets is keyed by their "site" attribute.
+    tol: float
+        maximum offset (seconds) between a frame and the reference time.
+        Less than half the cadence keeps a frame from matching two reference times.
+    cadence: float, optional
+        match to a regular grid of this period (seconds) over the time common to all sites
+    reference: str, optional
+        match to the times of this site, by default the first site. Not used with "cadence".
+    complete: bool
+        keep only reference times matched at every site. Otherwise unmatched frames have index -1.
+
+    Returns
+    -------
+    idx: xarray.Dataset
+        one (time,) index variable per site, on the reference time coordinate
+    """
+    import xarray
+
+    if not isinstance(sites, dict):
+        sites = {d.attrs["site"]: d for d in sites}
+
+    times = {k: _times(v) for k, v in sites.items()}
+    if not times:
+        raise ValueError("no sites to align")
+
+    if cadence is not None:
+        start = max(t[0] for t in times.values())
+        end = min(t[-1] for t in times.values())
+        step = np.timedelta64(int(cadence * 1e9), "ns")
+        if end >= start:
+            tref = np.arange(start, end + step, step)
+        else:  # no common time
+            tref = np.array([], dtype="datetime64[ns]")
+    else:
+        tref = times[reference or next(iter(times))]
+
+    idx = {k: nearest(t, tref, tol) for k, t in times.items()}
+
+    if complete:
+        good = np.logical_and.reduce([i >= 0 for i in idx.values()])
+        tref = tref[good]
+        idx = {k: i[good] for k, i in idx.items()}
+
+    return xarray.Dataset(
+        {k: ("time", i) for k, i in idx.items()},
+        coords={"time": tref},
+        attrs={"tol_s": tol},
+    )
+
+
+def _times(dat) -> np.ndarray:
+    """record times of a Dataset, DataArray or time array"""
+    t = dat.time.values if hasattr(dat, "time") else dat
+
+    return np.asarray(t, dtype="datetime64[ns]")
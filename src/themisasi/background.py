@@ -0,0 +1,373 @@
+"""
+background and flat-field models of a site, estimated over many nights
+
+Frames are streamed a batch at a time into a per-pixel histogram of data numbers on geometric bins,
+so a robust per-pixel background (e.g. the median) is estimated over any number of nights
+in fixed memory. The flat-field is the elevation profile of the dark-subtracted background,
+corrected for the van Rhijn brightening of airglow toward the horizon and normalized at zenith,
+so it captures the vignetting of the all-sky lens.
+
+Models are stored per site and calibration epoch, as the optics and pointing change between calibrations:
+
+    model = themisasi.background.estimate("~/data/themis", "gako", ("2011-01-01", "2011-01-31"))
+    themisasi.background.save(model, "~/data/themis")
+    dat = themisasi.load("~/data/themis", "gako", "2011-02-06T17", background=True)
+"""
+
+from __future__ import annotations
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import xarray
+
+from .io import iterload, loadcal, azel, _downsample, _timereq
+
+BINS = 128  # histogram bins per pixel
+DN_RANGE = (256.0, 65536.0)  # histogram data number range, geometric bins
+PERCENTILE = 50.0
+EL_STEP = 2.0  # degrees, flat-field elevation profile resolution
+AIRGLOW_KM = 100.0  # emission altitude for the van Rhijn correction
+RE_KM = 6371.0
+
+MODEL_CACHE_SIZE = 8  # number of models kept in memory
+_model_cache: dict[tuple, xarray.Dataset] = {}
+
+
+def estimate(
+    path: Path | list[Path],
+    site: str | None = None,
+    treq=None,
+    cal: xarray.Dataset | None = None,
+    percentile: float = PERCENTILE,
+    batch: int = 64,
+    quality: bool | dict[str, float | None] | None = None,
+    airglow_km: float | None = AIRGLOW_KM,
+) -> xarray.Dataset:
+    """
+    per-pixel background and elevation-dependent flat-field from many frames
+
+    Parameters
+    ----------
+    path: pathlib.Path or list of pathlib.Path
+        directory where Themis ASI data files are, data file, or list of data files
+    site: str, optional
+        site code e.g. gako.  Only needed if "path" is a directory
+    treq: datetime.datetime or list of datetime.datetime, optional
+        min,max time range, e.g. many nights within one calibration epoch
+    cal: xarray.Dataset, optional
+        calibration, by default the calibration in effect at the first frame
+    percentile: float
+        per-pixel percentile (0..100) of the background
+    batch: int
+        number of records read at once
+    quality: bool or dict, optional
+        skip frames rejected by quality screening e.g. clouds, moon
+    airglow_km: float, optional
+        emission altitude (km) of the van Rhijn correction of the flat-field, None for no correction
+
+    Returns
+    -------
+    model: xarray.Dataset
+        * background: (y, x) percentile data number
+        * flat: (y, x) relative sensitivity, 1 at zenith, NaN outside the FOV
+        * profile: (el,) flat-field elevation profile
+    """
+    if treq is not None:
+        treq = _timereq(treq)
+
+    hist = None
+    for imgs in iterload(path, site, treq, batch, quality):
+        if hist is None:
+            hist = np.zeros((imgs.shape[1] * imgs.shape[2], BINS), dtype=np.uint32)
+            first = imgs
+        accumulate(hist, imgs.values)
+        last = imgs.time.values[-1]
+
+    if hist is None:
+        raise ValueError("no images to estimate background")
+
+    if cal is None:
+        p = path[0] if isinstance(path, (list, tuple)) else path
+        cal = loadcal(p, first.site, first.time.values[0].astype("datetime64[us]").item())
+    cal = _downsample(cal, first.shape[1:])
+
+    background = quantile(hist, percentile).reshape(first.shape[1:])
+    flat, profile, dark = flatfield(background, azel(cal)[1], airglow_km)
+
+    return xarray.Dataset(
+        {
+            "background": (("y", "x"), background),
+            "flat": (("y", "x"), flat),
+            "profile": ("el", profile[1]),
+        },
+        coords={"el": profile[0]},
+        attrs={
+            "site": first.site,
+            "caltime": str(cal.attrs.get("caltime")),
+            "calfilename": cal.attrs.get("calfilename"),
+            "percentile": percentile,
+            "frames": int(hist[0].sum()),
+            "start": str(first.time.values[0]),
+            "end": str(last),
+            "dark": dark,
+        },
+    )
+
+
+def accumulate(hist: np.ndarray, imgs: np.ndarray) -> np.ndarray:
+    """
+    add a batch of frames to the per-pixel histogram, in place
+
+    Parameters
+    ----------
+    hist: numpy.ndarray
+        (pixel, BINS) counts
+    imgs: numpy.ndarray
+        (time, y, x) data numbers
+
+    Returns
+    -------
+    hist: numpy.ndarray
+        updated counts
+    """
+    npix = hist.shape[0]
+    b = _bin(imgs.reshape(imgs.shape[0], npix))
+    b += np.arange(npix) * BINS
+    hist += np.bincount(b.ravel(), minlength=hist.size).reshape(hist.shape).astype(hist.dtype)
+
+    return hist
+
+
+def quantile(hist: np.ndarray, percentile: float) -> np.ndarray:
+    """
+    per-pixel percentile from histogram counts, interpolated within the bin
+
+    Parameters
+    ----------
+    hist: numpy.ndarray
+        (pixel, BINS) counts from accumulate()
+    percentile: float
+        0..100
+
+    Returns
+    -------
+    q: numpy.ndarray
+        (pixel,) float32 data number
+    """
+    edges = _edges()
+    c = np.cumsum(hist, axis=1, dtype=np.float64)
+    target = c[:, -1:] * percentile / 100
+
+    k = np.minimum((c < target).sum(axis=1), BINS - 1)
+    below = np.take_along_axis(c, np.maximum(k - 1, 0)[:, None], axis=1)[:, 0]
+    below[k == 0] = 0
+    n = hist[np.arange(k.size), k]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f = np.clip(np.where(n > 0, (target[:, 0] - below) / n, 0.5), 0, 1)
+
+    # geometric bins: interpolate in log data number
+    return np.exp(np.log(edges[k]) + f * np.log(edges[1] / edges[0])).astype(np.float32)
+
+
+def flatfield(
+    background: np.ndarray, el: np.ndarray, airglow_km: float | None = AIRGLOW_KM
+) -> tuple[np.ndarray, tuple[np.ndarray, np.ndarray], float]:
+    """
+    elevation-dependent flat-field from a background image
+
+    Parameters
+    ----------
+    background: numpy.ndarray
+        (y, x) background data number
+    el: numpy.ndarray
+        (y, x) elevation (degrees), NaN outside the FOV
+    airglow_km: float, optional
+        emission altitude (km) of the van Rhijn correction, None for no correction
+
+    Returns
+    -------
+    flat: numpy.ndarray
+        (y, x) float32 relative sensitivity, 1 at zenith, NaN outside the FOV
+    profile: tuple of numpy.ndarray
+        (elevation bin centers, relative sensitivity)
+    dark: float
+        dark level, the median background outside the FOV
+    """
+    inside = np.isfinite(el)
+    dark = float(np.median(background[~inside])) if (~inside).any() else 0.0
+
+    signal = background[inside] - dark
+    if airglow_km is not None:
+        signal = signal / vanrhijn(el[inside], airglow_km)
+
+    edges = np.arange(0.0, 90.0 + EL_STEP, EL_STEP)
+    k = np.clip(np.digitize(el[inside], edges) - 1, 0, edges.size - 2)
+    centers = edges[:-1] + EL_STEP / 2
+    profile = np.full(centers.size, np.nan)
+    for j in np.unique(k):
+        profile[j] = np.median(signal[k == j])
+
+    good = np.isfinite(profile)
+    if not good.any():
+        raise ValueError("no pixels within the FOV for the flat-field")
+    # highest elevation bin is zenith
+    profile /= profile[good][-1]
+
+    flat = np.full(el.shape, np.nan, dtype=np.float32)
+    flat[inside] = np.interp(el[inside], centers[good], profile[good])
+
+    return flat, (centers, profile.astype(np.float32)), dark
+
+
+def vanrhijn(el, airglow_km: float = AIRGLOW_KM) -> np.ndarray:
+    """
+    path length through a thin emitting shell relative to zenith
+
+    Parameters
+    ----------
+    el: numpy.ndarray
+        elevation (degrees)
+    airglow_km: float
+        emission altitude (km)
+
+    Returns
+    -------
+    v: numpy.ndarray
+        van Rhijn factor, 1 at zenith
+    """
+    r = RE_KM / (RE_KM + airglow_km)
+
+    return 1 / np.sqrt(1 - (r * np.cos(np.radians(el))) ** 2)
+
+
+def modelfn(path: Path, site: str, caltime) -> Path:
+    """model filename of a site and calibration epoch"""
+    t = np.datetime64(str(caltime), "s").astype(datetime)
+
+    return Path(path).expanduser() / f"themis_background_{site}_{t:%Y%m%d%H%M%S}.nc"
+
+
+def save(model: xarray.Dataset, path: Path) -> Path:
+    """
+    store a model of a site and calibration epoch
+
+    Parameters
+    ----------
+    model: xarray.Dataset
+        from estimate()
+    path: pathlib.Path
+        directory of models, e.g. the data directory
+
+    Returns
+    -------
+    fn: pathlib.Path
+        model file
+    """
+    fn = modelfn(path, model.site, model.caltime)
+    model.to_netcdf(fn)
+
+    return fn
+
+
+def lookup(path: Path, site: str, caltime=None, time=None) -> xarray.Dataset:
+    """
+    model of a site and calibration epoch, cached per model file
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        directory of models
+    site: str
+        site code e.g. gako
+    caltime: datetime.datetime, optional
+        calibration epoch
+    time: datetime.datetime, optional
+        if no calibration epoch is given, or no model was estimated for it,
+        use the latest model of calibrations before this time
+
+    Returns
+    -------
+    model: xarray.Dataset
+        background and flat-field
+    """
+    path = Path(path).expanduser()
+
+    fn = None
+    if caltime is not None and str(caltime) != "None":
+        fn = modelfn(path, site, caltime)
+        if not fn.is_file():
+            if time is None:
+                raise FileNotFoundError(f"no {site} background model for calibration {caltime}")
+            logging.warning(f"no {site} background model for calibration {caltime}, using {time}")
+            fn = None
+
+    if fn is None:
+        if time is None:
+            raise ValueError("must specify calibration epoch or time")
+        t = np.datetime64(time, "s").astype(datetime)
+        flist = [
+            f
+            for f in sorted(path.glob(f"themis_background_{site}_*.nc"))
+            if datetime.strptime(f.stem.rsplit("_", 1)[1], "%Y%m%d%H%M%S") <= t
+        ]
+        if not flist:
+            raise FileNotFoundError(f"no {site} background model in {path} before {time}")
+        fn = flist[-1]
+
+    # models may be re-estimated while a process runs
+    key = (str(fn), os.stat(fn).st_mtime)
+    if key in _model_cache:
+        return _model_cache[key]
+
+    logging.info(f"loading background model {fn}")
+    with xarray.open_dataset(fn) as d:
+        model = d.load()
+    model.attrs["modelfilename"] = fn.name
+
+    if len(_model_cache) >= MODEL_CACHE_SIZE:
+        _model_cache.pop(next(iter(_model_cache)))
+    _model_cache[key] = model
+
+    return model
+
+
+def correct(imgs: xarray.DataArray, model: xarray.Dataset) -> xarray.DataArray:
+    """
+    subtract background and divide by flat-field
+
+    Parameters
+    ----------
+    imgs: xarray.DataArray
+        (time, y, x) data numbers
+    model: xarray.Dataset
+        from estimate() or lookup()
+
+    Returns
+    -------
+    imgs: xarray.DataArray
+        (time, y, x) float32 background-subtracted, flat-fielded images, NaN outside the FOV
+    """
+    if model["background"].shape != imgs.shape[1:]:
+        raise ValueError(f"background model shape {model['background'].shape} != {imgs.shape[1:]}")
+
+    x = imgs.values.astype(np.float32)
+    x -= model["background"].values
+    x /= model["flat"].values
+
+    return imgs.copy(data=x)
+
+
+def _edges() -> np.ndarray:
+    return np.geomspace(*DN_RANGE, BINS + 1)
+
+
+def _bin(x: np.ndarray) -> np.ndarray:
+    """histogram bin of data numbers, out of range values go to the end bins"""
+    lo, hi = DN_RANGE
+    b = np.log(np.maximum(x, 1).astype(np.float32)) - np.float32(np.log(lo))
+    b *= np.float32(BINS / np.log(hi / lo))
+
+    return np.clip(b, 0, BINS - 1).astype(np.int64)
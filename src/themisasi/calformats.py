@@ -0,0 +1,220 @@
+"""
+calibration (skymap) file format readers
+
+Readers are registered by filename suffix and by the magic bytes at the start of the file,
+so a file with an unexpected suffix is still read by the right reader.
+Each reader returns a dict of az, el, x, y, lat, lon, alt_m, site, time.
+
+The native .npz format holds float32 az/el and metadata in one uncompressed file,
+so that production systems can precompile each skymap once (themisasi-convert-cal) and load it in milliseconds.
+"""
+
+import collections.abc
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+READERS: dict[str, collections.abc.Callable[[Path], dict]] = {}
+MAGIC: dict[bytes, str] = {}
+
+
+def register(suffix: str, magic: tuple[bytes, ...] = ()):
+    """
+    register a calibration file reader
+
+    Parameters
+    ----------
+    suffix: str
+        filename suffix e.g. ".cdf"
+    magic: tuple of bytes
+        possible leading bytes of the file format
+    """
+
+    def decorator(func):
+        READERS[suffix] = func
+        for m in magic:
+            MAGIC[m] = suffix
+        return func
+
+    return decorator
+
+
+def reader(fn: Path) -> collections.abc.Callable[[Path], dict]:
+    """
+    find reader for a calibration file by suffix, then by magic bytes
+    """
+    if fn.suffix in READERS:
+        return READERS[fn.suffix]
+
+    with fn.open("rb") as f:
+        head = f.read(8)
+
+    for m, suffix in MAGIC.items():
+        if head.startswith(m):
+            return READERS[suffix]
+
+    raise ValueError(f"{fn} calibration file format is not known to this program.")
+
+
+@register(".cdf", (b"\xcd\xf3\x00\x01", b"\xcd\xf2\x60\x02"))
+def read_cdf(fn: Path) -> dict:
+    import cdflib
+
+    site = fn.name.split("_")[3]
+
+    h = cdflib.cdfread.CDF(fn)
+
+    return {
+        "az": h[f"thg_asf_{site}_azim"][0],
+        "el": h[f"thg_asf_{site}_elev"][0],
+        "lat": h[f"thg_asc_{site}_glat"],
+        "lon": (h[f"thg_asc_{site}_glon"] + 180) % 360 - 180,  # [0,360] -> [-180,180]
+        "alt_m": h[f"thg_asc_{site}_alti"],
+        "x": h[f"thg_asf_{site}_c256"],
+        "y": h[f"thg_asf_{site}_c256"],
+        "site": site,
+        "time": datetime.fromtimestamp(h[f"thg_asf_{site}_time"][-1]),
+    }
+
+
+@register(".sav", (b"SR\x00\x04",))
+def read_sav(fn: Path) -> dict:
+    import scipy.io
+
+    name = fn.name.split("_")
+    site = name[2] if len(name) > 2 else None
+    # THEMIS SAV calibration files written with glitch from bug in IDL
+    warnings.simplefilter("ignore", UserWarning)
+    h = scipy.io.readsav(fn, python_dict=True, verbose=False)
+    warnings.resetwarnings()
+
+    try:
+        tstr = h["skymap"]["generation_info"][0][0][2]
+        time = datetime(int(tstr[:4]), int(tstr[4:6]), int(tstr[6:8]), int(tstr[8:10]))
+    except (KeyError, ValueError):
+        if h["skymap"]["site_unix_time"] > 0:
+            tutc = h["skymap"]["site_unix_time"]
+        elif h["skymap"]["imager_unix_time"] > 0:
+            tutc = h["skymap"]["imager_unix_time"]
+        else:
+            tutc = None
+
+        if tutc is not None:
+            time = datetime.utcfromtimestamp(tutc)
+        else:  # last resort
+            time = datetime(int(fn.name[19:23]), int(fn.name[23:25]), int(fn.name[25:27]))
+
+    return {
+        "az": h["skymap"]["full_azimuth"][0],
+        "el": h["skymap"]["full_elevation"][0],
+        "lat": h["skymap"]["site_map_latitude"].item(),
+        # [0,360] -> [-180,180]
+        "lon": (h["skymap"]["site_map_longitude"].item() + 180) % 360 - 180,
+        "alt_m": h["skymap"]["site_map_altitude"].item(),
+        "x": h["skymap"]["full_column"][0][0, :],
+        "y": h["skymap"]["full_row"][0][:, 0],
+        "site": site,
+        "time": time,
+    }
+
+
+@register(".h5", (b"\x89HDF\r\n\x1a\n",))
+def read_h5(fn: Path) -> dict:
+    import h5py
+
+    with h5py.File(fn, "r") as h:
+        return {
+            "az": h["az"][:],
+            "el": h["el"][:],
+            "lat": h["lla"][0],
+            "lon": h["lla"][1],
+            "alt_m": h["lla"][2],
+            "x": h["x"][0, :],
+            "y": h["y"][:, 0],
+        }
+
+
+@register(".nc", (b"CDF\x01", b"CDF\x02"))
+def read_nc(fn: Path) -> dict:
+    import netCDF4
+
+    with netCDF4.Dataset(fn, "r") as h:
+        return {
+            "az": h["az"][:],
+            "el": h["el"][:],
+            "lat": h["lla"][0],
+            "lon": h["lla"][1],
+            "alt_m": h["lla"][2],
+            "x": h["x"][0, :].astype(int),
+            "y": np.flipud(h["y"][:, 0]).astype(int),
+        }
+
+
+@register(".npz", (b"PK\x03\x04",))
+def read_npz(fn: Path) -> dict:
+    with np.load(fn) as h:
+        time = h["caltime"]
+        site = h["site"].item()
+
+        return {
+            "az": h["az"],
+            "el": h["el"],
+            "lat": h["lla"][0].item(),
+            "lon": h["lla"][1].item(),
+            "alt_m": h["lla"][2].item(),
+            "x": h["x"],
+            "y": h["y"],
+            "site": site if site else None,
+            "time": None if np.isnat(time) else time.astype("datetime64[us]").item(),
+            "calfilename": h["calfilename"].item(),
+        }
+
+
+def write_npz(cal, fn: Path) -> Path:
+    """
+    write calibration in the native .npz format
+
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        calibration from themisasi.loadcal()
+    fn: pathlib.Path
+        output filename
+
+    Returns
+    -------
+    fn: pathlib.Path
+        output filename
+    """
+    from .io import azel
+
+    fn = Path(fn).expanduser().with_suffix(".npz")
+    az, el = azel(cal)
+
+    np.savez(
+        fn,
+        az=az.astype(np.float32),
+        el=el.astype(np.float32),
+        x=cal.x.values,
+        y=cal.y.values,
+        lla=np.array([cal.lat, cal.lon, cal.alt_m], dtype=float).ravel(),
+        site=np.array(cal.site or ""),
+        calfilename=np.array(cal.calfilename),
+        caltime=np.datetime64(cal.caltime or "NaT", "us"),
+    )
+
+    return fn
+
+
+def compiled(fn: Path) -> Path:
+    """
+    native .npz version of a calibration file if it is at least as new as the file, else the file itself
+    """
+    npz = fn.with_suffix(".npz")
+
+    if fn.suffix != ".npz" and npz.is_file() and npz.stat().st_mtime >= fn.stat().st_mtime:
+        return npz
+
+    return fn
@@ -0,0 +1,243 @@
+"""
+celestial coordinates of ASI pixels
+
+The az/el of each pixel is fixed by the calibration, so the pixel directions in a local equatorial frame
+(hour angle, declination) are computed once.
+Over time, the sky only rotates about the celestial pole by the local sidereal time,
+which is applied as a batch of rotation matrices.
+"""
+
+import collections.abc
+
+import numpy as np
+import xarray
+
+from .io import azel
+
+J2000 = np.datetime64("2000-01-01T12:00:00", "ns")
+
+
+def azel2enu(az, el, dtype=float):
+    """
+    unit direction vectors in local East, North, Up
+
+    Parameters
+    ----------
+    az, el: numpy.ndarray
+        azimuth, elevation (degrees)
+
+    Returns
+    -------
+    enu: numpy.ndarray
+        (..., 3) unit vectors
+    """
+    az = np.radians(np.asarray(az, dtype=dtype))
+    el = np.radians(np.asarray(el, dtype=dtype))
+    cel = np.cos(el)
+
+    return np.stack((cel * np.sin(az), cel * np.cos(az), np.sin(el)), axis=-1)
+
+
+def enu2hadec(lat: float):
+    """
+    rotation from local ENU to the local equatorial frame (hour angle, declination)
+
+    In the local equatorial frame, x points to the upper meridian on the celestial equator,
+    y points East (so hour angle is measured westward from x) and z points to the celestial pole.
+    """
+    phi = np.radians(lat)
+
+    return np.array(
+        [
+            [0.0, -np.sin(phi), np.cos(phi)],
+            [1.0, 0.0, 0.0],
+            [0.0, np.cos(phi), np.sin(phi)],
+        ]
+    )
+
+
+def sidereal(time, lon: float):
+    """
+    local mean sidereal time (radians), vectorized over numpy.datetime64
+
+    from D. Vallado "Fundamentals of Astrodynamics and Applications" Algorithm 15, same as pymap3d
+
+    Parameters
+    ----------
+    time: numpy.ndarray of datetime64
+        UTC times
+    lon: float
+        observer longitude (degrees)
+
+    Returns
+    -------
+    lst: numpy.ndarray
+        local sidereal time (radians)
+    """
+    time = np.atleast_1d(np.asarray(time, dtype="datetime64[ns]"))
+    # Julian centuries since J2000
+    T_UT1 = (time - J2000).astype(np.float64) / (86400e9 * 36525)
+
+    gmst = (
+        67310.54841
+        + (876600 * 3600 + 8640184.812866) * T_UT1
+        + 0.093104 * T_UT1**2
+        - 6.2e-6 * T_UT1**3
+    )
+    # 1/86400 of a full rotation per second
+    gmst = np.radians(gmst * 360 / 86400)
+
+    return (gmst + np.radians(lon)) % (2 * np.pi)
+
+
+def sidereal_rotation(time, lon: float):
+    """
+    (time, 3, 3) rotation matrices from the local equatorial frame to the celestial (RA, Dec) frame
+    """
+    lst = sidereal(time, lon)
+
+    c = np.cos(lst)
+    s = np.sin(lst)
+    R = np.zeros((lst.size, 3, 3))
+    R[:, 0, 0] = c
+    R[:, 0, 1] = -s
+    R[:, 1, 0] = s
+    R[:, 1, 1] = c
+    R[:, 2, 2] = 1.0
+
+    return R
+
+
+def azel2radec(az, el, lat: float, lon: float, time, dtype=np.float64) -> tuple:
+    """
+    right ascension, declination of every pixel for every time
+
+    Parameters
+    ----------
+    az, el: numpy.ndarray
+        (y, x) azimuth, elevation of each pixel (degrees)
+    lat, lon: float
+        observer geodetic latitude, longitude (degrees)
+    time: numpy.ndarray of datetime64
+        (time,) observation times
+    dtype: numpy.dtype
+        output precision e.g. numpy.float32 to halve memory for long stacks
+
+    Returns
+    -------
+    ra, dec: numpy.ndarray
+        (time, y, x) right ascension [0, 360), declination (degrees)
+    """
+    u = _hadec_vectors(az, el, lat, dtype)
+    R = sidereal_rotation(time, lon).astype(dtype)
+
+    v = np.einsum("tij,yxj->tyxi", R, u)
+
+    return _vec2radec(v)
+
+
+def iter_radec(
+    az, el, lat: float, lon: float, time, dtype=np.float64
+) -> collections.abc.Iterator[tuple]:
+    """
+    lazy per-frame azel2radec, for stacks too large to hold (time, y, x) in memory.
+    The per-pixel transform is still computed only once.
+
+    yields
+    ------
+    ra, dec: numpy.ndarray
+        (y, x) right ascension, declination (degrees)
+    """
+    u = _hadec_vectors(az, el, lat, dtype)
+
+    for R in sidereal_rotation(time, lon).astype(dtype):
+        yield _vec2radec(u @ R.T)
+
+
+def radec2azel(ra, dec, lat: float, lon: float, time) -> tuple:
+    """
+    azimuth, elevation of fixed celestial targets (e.g. stars) for every time
+
+    Parameters
+    ----------
+    ra, dec: numpy.ndarray
+        (N,) right ascension, declination (degrees)
+    lat, lon: float
+        observer geodetic latitude, longitude (degrees)
+    time: numpy.ndarray of datetime64
+        (time,) observation times
+
+    Returns
+    -------
+    az, el: numpy.ndarray
+        (time, N) azimuth, elevation (degrees)
+    """
+    v = radec2vec(ra, dec)
+    # inverse rotations are the transposes
+    enu = np.einsum("tji,nj->tni", sidereal_rotation(time, lon), v) @ enu2hadec(lat)
+
+    return enu2azel(enu)
+
+
+def radec2vec(ra, dec):
+    """(..., 3) unit vectors of right ascension, declination (degrees)"""
+    ra = np.radians(np.asarray(ra, dtype=float))
+    dec = np.radians(np.asarray(dec, dtype=float))
+    cdec = np.cos(dec)
+
+    return np.stack((cdec * np.cos(ra), cdec * np.sin(ra), np.sin(dec)), axis=-1)
+
+
+def enu2azel(enu) -> tuple:
+    """azimuth [0, 360), elevation (degrees) of (..., 3) ENU unit vectors"""
+    az = np.degrees(np.arctan2(enu[..., 0], enu[..., 1])) % 360
+    el = np.degrees(np.arcsin(np.clip(enu[..., 2], -1, 1)))
+
+    return az, el
+
+
+def radec(dat: xarray.Dataset, min_el: float = 10.0, dtype=np.float64) -> xarray.Dataset:
+    """
+    RA/Dec for each frame of an ASI Dataset with calibration
+
+    Parameters
+    ----------
+    dat: xarray.Dataset
+        az, el, lat, lon and time from themisasi.load()
+    min_el: float
+        minimum elevation angle (degrees). Data near the horizon is poorly calibrated (large angular error).
+    dtype: numpy.dtype
+        output precision
+
+    Returns
+    -------
+    rd: xarray.Dataset
+        "ra" (time, y, x) and "dec" (y, x) in degrees. Declination does not depend on time.
+    """
+    az, el = azel(dat)
+    ra, dec = azel2radec(
+        az,
+        np.where(el >= min_el, el, np.nan),
+        np.asarray(dat.lat).item(),
+        np.asarray(dat.lon).item(),
+        dat.time.values,
+        dtype,
+    )
+
+    return xarray.Dataset(
+        {"ra": (("time", "y", "x"), ra), "dec": (("y", "x"), dec[0])},
+        coords={"time": dat.time, "y": dat.y, "x": dat.x},
+        attrs={"site": dat.attrs.get("site")},
+    )
+
+
+def _hadec_vectors(az, el, lat: float, dtype):
+    """pixel unit vectors in the local equatorial frame"""
+    return (azel2enu(az, el, dtype) @ enu2hadec(lat).T.astype(dtype)).astype(dtype, copy=False)
+
+
+def _vec2radec(v) -> tuple:
+    ra = np.degrees(np.arctan2(v[..., 1], v[..., 0])) % 360
+    dec = np.degrees(np.arcsin(np.clip(v[..., 2], -1, 1)))
+
+    return ra, dec
@@ -0,0 +1,323 @@
+"""
+ASI brightness along satellite footprint tracks, e.g. THEMIS or Swarm conjunctions
+
+Each track sample (time, lat, lon, alt_m) is mapped to the pixel of each site that sees it,
+by a spatial index of pixel directions cached per calibration,
+so the mapping is a vectorized query for any track altitude.
+Only the site-hours the track passes over are opened, and only the records nearest the track samples are read.
+Site-hours are processed in parallel:
+
+    track = xarray.Dataset({"lat": ("time", lat), "lon": ("time", lon), "alt_m": ("time", alt_m)}, coords={"time": t})
+    b = themisasi.conjunction.footprint("~/data/themis", ["gako", "fykn"], track, radius=1)
+    b["brightness"]  # (time, site)
+"""
+
+from __future__ import annotations
+import collections.abc
+import concurrent.futures
+import logging
+import re
+import warnings
+from pathlib import Path
+
+import numpy as np
+import xarray
+from scipy.spatial import cKDTree
+
+from .align import nearest
+from .geometry import camera
+from .io import TIME_TOL, epoch2datetime64, loadcal_file, _downsample, _read_records
+
+MIN_EL = 10.0  # degrees, calibration error is large near the horizon
+AGGREGATES: dict[str, collections.abc.Callable[..., np.ndarray]] = {
+    "mean": np.nanmean,
+    "max": np.nanmax,
+    "median": np.nanmedian,
+}
+
+INDEX_CACHE_SIZE = 16  # number of pixel direction indexes kept in memory
+_index_cache: dict[tuple, tuple] = {}
+
+
+def footprint(
+    path: Path | list[Path],
+    sites: str | list[str],
+    track: xarray.Dataset,
+    radius: int = 0,
+    agg: str = "mean",
+    tol: float = TIME_TOL,
+    cals: dict[str, xarray.Dataset] | None = None,
+    min_el: float = MIN_EL,
+    processes: int | None = 1,
+) -> xarray.Dataset:
+    """
+    brightness of each site at each footprint track sample
+
+    Parameters
+    ----------
+    path: pathlib.Path or list of pathlib.Path
+        directory where Themis ASI data files are, or list of data files
+    sites: str or list of str
+        site codes e.g. gako
+    track: xarray.Dataset
+        "lat", "lon" (degrees) and "alt_m" (meters) on "time", e.g. footprint mapped to 110 km
+    radius: int
+        neighborhood (pixels) of each sample, 0 for the nearest pixel only, 1 for 3x3 pixels, ...
+    agg: str
+        aggregate of the neighborhood, one of AGGREGATES
+    tol: float
+        maximum offset (seconds) between a track sample and an image
+    cals: dict of xarray.Dataset, optional
+        calibration of each site, by default the calibration in effect at each hour of the track
+    min_el: float
+        minimum elevation angle (degrees) of a sample from a site
+    processes: int, optional
+        number of worker processes for site-hours, 1 runs in this process, None is the number of CPUs
+
+    Returns
+    -------
+    b: xarray.Dataset
+        * brightness: (time, site) float32, NaN where not seen or no image within tol
+        * row, col: (time, site) pixel of each sample, -1 where not seen
+        * el: (time, site) elevation (degrees) of each sample from the site
+        * frame_time: (time, site) time of the image used
+    """
+    if agg not in AGGREGATES:
+        raise ValueError(f"agg must be one of {list(AGGREGATES)}")
+    if isinstance(sites, str):
+        sites = [sites]
+    cals = cals or {}
+
+    t = np.asarray(track.time.values, dtype="datetime64[ns]")
+    p = _ecef(track)
+    files = _sitehours(path)
+
+    shape = (t.size, len(sites))
+    rows = np.full(shape, -1)
+    cols = np.full(shape, -1)
+    el = np.full(shape, np.nan, dtype=np.float32)
+    tasks = []
+
+    hours = t.astype("datetime64[h]")
+
+    for j, site in enumerate(sites):
+        # binned sites have fewer pixels than their calibration
+        fn = next((f for (s, _), f in files.items() if s == site), None)
+        shp = _shape(fn, site) if fn is not None else None
+
+        for cal, m in _calibrations(path, site, t, cals.get(site)):
+            if shp is not None:
+                cal = _downsample(cal, shp)
+            rows[m, j], cols[m, j], el[m, j] = pixels(cal, p[m], min_el)
+            seen = m & (rows[:, j] >= 0)
+            # %% site-hours over which the track is seen
+            for h in np.unique(hours[seen]):
+                fn = files.get((site, h))
+                if fn is None:
+                    logging.info(f"no {site} data for {h}")
+                    continue
+                k = np.flatnonzero(seen & (hours == h))
+                tasks.append((fn, site, j, k, t[k], _window(cal, rows[k, j], cols[k, j], radius)))
+
+    bright = np.full(shape, np.nan, dtype=np.float32)
+    ftime = np.full(shape, np.datetime64("NaT", "ns"))
+
+    pool = concurrent.futures.ProcessPoolExecutor(processes) if processes != 1 else None
+    try:
+        args = [(fn, site, tk, w, agg, tol) for fn, site, _, _, tk, w in tasks]
+        for (_, _, j, k, _, _), (b, ft) in zip(tasks, (pool.map if pool else map)(_gather, args)):
+            bright[k, j] = b
+            ftime[k, j] = ft
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    dims = ("time", "site")
+    return xarray.Dataset(
+        {
+            "brightness": (dims, bright),
+            "row": (dims, rows),
+            "col": (dims, cols),
+            "el": (dims, el),
+            "frame_time": (dims, ftime),
+        },
+        coords={"time": t, "site": list(sites)},
+        attrs={"radius": radius, "agg": agg, "tol_s": tol},
+    )
+
+
+def pixels(
+    cal: xarray.Dataset, p: np.ndarray, min_el: float = MIN_EL
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    pixel of a camera seeing each ECEF point, by nearest pixel direction
+
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        calibration
+    p: numpy.ndarray
+        (N, 3) ECEF points (meters)
+    min_el: float
+        minimum elevation angle (degrees)
+
+    Returns
+    -------
+    row, col: numpy.ndarray
+        (N,) pixel, -1 where not in the FOV
+    el: numpy.ndarray
+        (N,) elevation angle (degrees) of each point
+    """
+    g = camera(cal)
+    tree, fov, pixscale = _index(g, min_el)
+
+    v = (np.asarray(p) - g.origin) @ g.rotation
+    v /= np.linalg.norm(v, axis=-1, keepdims=True)
+    el = np.degrees(np.arcsin(np.clip(v[..., 2], -1, 1)))
+
+    d, k = tree.query(v, distance_upper_bound=2 * pixscale)
+    ok = np.isfinite(d) & (el >= min_el)
+
+    row = np.full(el.shape, -1)
+    col = np.full(el.shape, -1)
+    row[ok], col[ok] = np.divmod(fov[k[ok]], g.enu.shape[1])
+
+    return row, col, el
+
+
+def _index(g, min_el: float) -> tuple[cKDTree, np.ndarray, float]:
+    """spatial index of pixel directions above min_el, cached per camera"""
+    key = (g, float(min_el))
+    if key in _index_cache:
+        return _index_cache[key]
+
+    fov = np.flatnonzero(g.enu[..., 2].ravel() >= np.sin(np.radians(min_el)))
+    tree = cKDTree(g.enu.reshape(-1, 3)[fov])
+    # angular size of a pixel, chord length on unit sphere
+    pixscale = np.median(tree.query(tree.data[:: max(fov.size // 1000, 1)], k=2)[0][:, 1])
+
+    if len(_index_cache) >= INDEX_CACHE_SIZE:
+        _index_cache.pop(next(iter(_index_cache)))
+    _index_cache[key] = tree, fov, pixscale
+
+    return _index_cache[key]
+
+
+def _window(cal: xarray.Dataset, row, col, radius: int) -> np.ndarray:
+    """(sample, neighbor) flat pixel index of the neighborhood of each pixel, -1 outside the FOV"""
+    valid = cal["valid"].values
+    o = np.arange(-radius, radius + 1)
+    r = (row[:, None, None] + o[:, None]).reshape(row.size, -1)
+    c = (col[:, None, None] + o).reshape(col.size, -1)
+
+    inside = (r >= 0) & (r < valid.shape[0]) & (c >= 0) & (c < valid.shape[1])
+    r = np.where(inside, r, 0)
+    c = np.where(inside, c, 0)
+
+    return np.where(inside & valid[r, c], r * valid.shape[1] + c, -1)
+
+
+def _gather(args: tuple) -> tuple[np.ndarray, np.ndarray]:
+    """brightness of samples from one site-hour, reading only the nearest records"""
+    import cdflib
+
+    fn, site, t, window, agg, tol = args
+
+    h = cdflib.cdfread.CDF(fn)
+    time = epoch2datetime64(h[f"thg_asf_{site}_epoch"][:])
+
+    i = nearest(time, t, tol)
+    b = np.full(t.size, np.nan, dtype=np.float32)
+    ft = np.full(t.size, np.datetime64("NaT", "ns"))
+    ok = i >= 0
+    if not ok.any():
+        return b, ft
+
+    rec, inv = np.unique(i[ok], return_inverse=True)
+    imgs = _read_records(h, f"thg_asf_{site}", rec)
+    imgs = imgs.reshape(rec.size, -1)
+
+    w = window[ok]
+    v = imgs[inv[:, None], np.maximum(w, 0)].astype(np.float32)
+    v[w < 0] = np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        b[ok] = AGGREGATES[agg](v, axis=1)
+    ft[ok] = time[i[ok]]
+
+    return b, ft
+
+
+def _calibrations(
+    path: Path | list[Path], site: str, t: np.ndarray, cal: xarray.Dataset | None = None
+) -> list[tuple[xarray.Dataset, np.ndarray]]:
+    """
+    calibration in effect over each part of the track, with the (time,) mask of its samples
+
+    Each hour of the track takes the latest calibration before its first sample,
+    so a track spanning a calibration change is mapped by both calibrations.
+    The skymap files of the site are listed and read once.
+    """
+    if cal is not None:
+        return [(cal, np.ones(t.size, dtype=bool))]
+
+    caldir = Path(path[0]).parent if isinstance(path, (list, tuple)) else Path(path)
+    caldir = caldir.expanduser()
+
+    skymaps = [
+        loadcal_file(fn)
+        for fn in (
+            *caldir.glob(f"thg_l2_asc_{site}_*.cdf"),
+            *caldir.glob(f"themis_skymap_{site}_*.sav"),
+        )
+    ]
+    skymaps = [c for c in skymaps if c.caltime is not None]
+    skymaps.sort(key=lambda c: c.caltime)
+    caltimes = np.array([c.caltime for c in skymaps], dtype="datetime64[us]")
+
+    hours = t.astype("datetime64[h]")
+    masks: dict[int, np.ndarray] = {}
+    for h in np.unique(hours):
+        m = hours == h
+        t0 = t[m][0].astype("datetime64[us]")
+        k = int(np.searchsorted(caltimes, t0)) - 1
+        if k < 0:
+            raise FileNotFoundError(f"no {site} calibration before {t0} in {caldir}")
+        masks[k] = masks[k] | m if k in masks else m
+
+    return [(skymaps[k], m) for k, m in masks.items()]
+
+
+def _shape(fn: Path, site: str) -> tuple[int, int]:
+    """image shape of a data file, from the CDF header only"""
+    import cdflib
+
+    ny, nx = cdflib.cdfread.CDF(fn).varinq(f"thg_asf_{site}").Dim_Sizes
+
+    return int(ny), int(nx)
+
+
+def _ecef(track: xarray.Dataset) -> np.ndarray:
+    """(time, 3) ECEF position (meters) of track samples"""
+    import pymap3d as pm
+
+    x, y, z = pm.geodetic2ecef(track["lat"].values, track["lon"].values, track["alt_m"].values)
+
+    return np.column_stack((x, y, z))
+
+
+def _sitehours(path: Path | list[Path]) -> dict[tuple[str, np.datetime64], Path]:
+    """data files by (site, hour)"""
+    if isinstance(path, (list, tuple)):
+        flist = [Path(p).expanduser() for p in path]
+    else:
+        flist = list(Path(path).expanduser().glob("thg_l1_asf_*_v01.cdf"))
+
+    files: dict[tuple[str, np.datetime64], Path] = {}
+    for fn in flist:
+        m = re.match(r"thg_l1_asf_(\w{4})_(\d{4})(\d{2})(\d{2})(\d{2})_v01", fn.stem)
+        if m:
+            y, mo, d, hh = m.groups()[1:]
+            files[(m[1], np.datetime64(f"{y}-{mo}-{d}T{hh}", "h"))] = fn
+
+    return files
@@ -0,0 +1,62 @@
+"""
+Precompile THEMIS ASI calibration (skymap) files to the native .npz format,
+which loads in milliseconds instead of parsing CDF or IDL .sav each time.
+
+themisasi-convert-cal ~/data/themis/themis_skymap_*.sav ~/data/themis/thg_l2_asc_*.cdf
+
+By default the .npz is written next to each input file, where themisasi.loadcal() finds it automatically.
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+import time
+
+
+def convert(fn: Path, odir: Path | None = None) -> Path:
+    """
+    convert one calibration file to native .npz
+
+    Parameters
+    ----------
+    fn: pathlib.Path
+        calibration file
+    odir: pathlib.Path, optional
+        output directory, default is the directory of the input file
+
+    Returns
+    -------
+    ofn: pathlib.Path
+        output filename
+    """
+    from .io import loadcal_file
+    from .calformats import write_npz
+
+    fn = Path(fn).expanduser()
+    odir = fn.parent if odir is None else Path(odir).expanduser()
+    ofn = odir / fn.with_suffix(".npz").name
+    if ofn == fn:
+        raise ValueError(f"{fn} is already in native format")
+
+    odir.mkdir(parents=True, exist_ok=True)
+
+    return write_npz(loadcal_file(fn), ofn)
+
+
+def cli():
+    p = ArgumentParser(description="precompile THEMIS ASI calibration files to native .npz")
+    p.add_argument("files", help="calibration files (.cdf, .sav, .h5, .nc)", nargs="+")
+    p.add_argument("-o", "--odir", help="output directory (default: next to input)")
+    P = p.parse_args()
+
+    from .io import loadcal_file
+
+    for fn in P.files:
+        ofn = convert(fn, P.odir)
+
+        tic = time.perf_counter()
+        loadcal_file(ofn)
+        print(f"{fn} => {ofn}  loads in {(time.perf_counter() - tic) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,385 @@
+"""
+streaming auroral event detection across sites and hours, e.g. substorm onsets and brightenings
+
+Frames are read a batch at a time and reduced to vectorized per-frame features over the FOV:
+mean brightness, fraction of bright pixels and the time derivative of the mean.
+Frames exceeding thresholds are flagged, and runs of flagged frames are events.
+Hourly files of all sites are processed in a process pool, and the events are gathered into a catalog:
+
+    cat = themisasi.events.catalog("~/data/themis", ["gako", "fykn"], ("2011-01-01", "2011-12-31"), processes=8)
+    cat.to_netcdf("events.nc")
+
+python -m themisasi.events ~/data/themis gako fykn -t 2011-01-01 2011-12-31 -o events.nc -j 8
+"""
+
+from __future__ import annotations
+import concurrent.futures
+import logging
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import xarray
+
+from .io import iterload, loadcal_file, azel, _datafiles, _downsample, _findcal, _timereq
+
+BRIGHT = 6000  # data numbers, bright pixel level
+MIN_EL = 10.0  # degrees, FOV mask from calibration
+GAP = 30.0  # seconds, flagged frames closer than this are one event
+
+THRESHOLDS: dict[str, float | None] = {
+    "min_rise": 100.0,  # data numbers / second increase of FOV mean e.g. onset, brightening
+    "min_bright": 0.05,  # fraction of FOV above BRIGHT e.g. auroral arc, breakup
+    "min_mean": None,  # FOV mean brightness
+}
+
+FLAGS = {"rise": 1, "bright": 2, "mean": 4}
+
+MASK_CACHE_SIZE = 8  # number of FOV masks kept in memory per process
+_mask_cache: dict[tuple, np.ndarray] = {}
+
+
+def features(imgs, mask=None, prev=None, bright: float = BRIGHT) -> dict[str, np.ndarray]:
+    """
+    per-frame features of a batch of images
+
+    Parameters
+    ----------
+    imgs: xarray.DataArray
+        (time, y, x) images
+    mask: numpy.ndarray of bool, optional
+        (y, x) pixels to use e.g. FOV
+    prev: tuple, optional
+        (time, mean) of the frame before this batch, for the derivative across batches
+    bright: float
+        data number of a bright pixel
+
+    Returns
+    -------
+    feat: dict of numpy.ndarray
+        (time,) mean, bright fraction, rise of mean (data numbers / second)
+    """
+    x = imgs.values
+    if mask is not None:
+        x = x[:, mask]
+    x = x.reshape(x.shape[0], -1)
+
+    mean = x.mean(axis=1, dtype=np.float64)
+    t = imgs.time.values
+
+    if prev is not None:
+        t = np.concatenate(([prev[0]], t))
+        m = np.concatenate(([prev[1]], mean))
+    else:
+        t = np.concatenate((t[:1], t))
+        m = np.concatenate(([np.nan], mean))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rise = np.diff(m) / (np.diff(t) / np.timedelta64(1, "s"))
+
+    return {
+        "mean": mean.astype(np.float32),
+        "bright": (x >= bright).mean(axis=1, dtype=np.float32),
+        "rise": rise.astype(np.float32),
+    }
+
+
+def flags(feat: dict[str, np.ndarray], thresholds: dict[str, float | None] | None = None):
+    """
+    event flags of each frame from its features
+
+    Parameters
+    ----------
+    feat: dict of numpy.ndarray
+        from features()
+    thresholds: dict, optional
+        override THRESHOLDS, None disables a test
+
+    Returns
+    -------
+    flag: numpy.ndarray of int
+        (time,) bitwise OR of FLAGS, 0 if not in an event
+    """
+    th = {**THRESHOLDS, **(thresholds or {})}
+
+    flag = np.zeros(feat["mean"].size, dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        if th["min_rise"] is not None:
+            flag[feat["rise"] >= th["min_rise"]] |= FLAGS["rise"]
+        if th["min_bright"] is not None:
+            flag[feat["bright"] >= th["min_bright"]] |= FLAGS["bright"]
+        if th["min_mean"] is not None:
+            flag[feat["mean"] >= th["min_mean"]] |= FLAGS["mean"]
+
+    return flag
+
+
+def detect(
+    fn: Path,
+    cal: xarray.Dataset | None = None,
+    batch: int = 64,
+    thresholds: dict[str, float | None] | None = None,
+    bright: float = BRIGHT,
+    gap: float = GAP,
+    treq=None,
+) -> tuple[list[dict], int]:
+    """
+    events of one data file, streaming in batches of records
+
+    Parameters
+    ----------
+    fn: pathlib.Path
+        THEMIS ASI data file
+    cal: xarray.Dataset, optional
+        calibration for the FOV mask. If not given, the calibration in effect found next to the data file.
+    batch: int
+        number of records read at once
+    thresholds: dict, optional
+        override THRESHOLDS
+    bright: float
+        data number of a bright pixel
+    gap: float
+        seconds between flagged frames that are still one event
+    treq: datetime.datetime or list of datetime.datetime, optional
+        min,max time range
+
+    Returns
+    -------
+    events: list of dict
+        site, filename, start, end, peak time and peak mean, max rise, max bright fraction, flags
+    frames: int
+        number of frames processed
+    """
+    fn = Path(fn).expanduser()
+
+    feat: dict[str, list] = {}
+    times = []
+    mask = None
+    prev = None
+    site = None
+
+    for imgs in iterload(fn, treq=treq, batch=batch):
+        if site is None:
+            site = imgs.site
+            mask = _mask(fn, imgs, cal)
+
+        for k, v in features(imgs, mask, prev, bright).items():
+            feat.setdefault(k, []).append(v)
+        times.append(imgs.time.values)
+        prev = (imgs.time.values[-1], feat["mean"][-1][-1])
+
+    if site is None:  # no frames
+        return [], 0
+
+    t = np.concatenate(times)
+    f = {k: np.concatenate(v) for k, v in feat.items()}
+    flag = flags(f, thresholds)
+
+    return _events(t, f, flag, gap, site, fn.name), t.size
+
+
+def catalog(
+    path: Path | list[Path],
+    sites: str | list[str] | None = None,
+    treq=None,
+    processes: int | None = None,
+    batch: int = 64,
+    thresholds: dict[str, float | None] | None = None,
+    bright: float = BRIGHT,
+    gap: float = GAP,
+) -> xarray.Dataset:
+    """
+    event catalog of many sites and hours, one data file per task in a process pool
+
+    Events are not joined across hourly files.
+
+    Parameters
+    ----------
+    path: pathlib.Path or list of pathlib.Path
+        directory where Themis ASI data files are, or list of data files
+    sites: str or list of str, optional
+        site codes e.g. gako.  Only needed if "path" is a directory
+    treq: datetime.datetime or list of datetime.datetime, optional
+        min,max time range, which may span years
+    processes: int, optional
+        number of worker processes, by default the number of CPUs. 1 runs in this process.
+    batch, thresholds, bright, gap:
+        see detect()
+
+    Returns
+    -------
+    cat: xarray.Dataset
+        (event,) variables, with attributes of the number of frames, elapsed seconds and frames per second
+    """
+    if treq is not None:
+        treq = _timereq(treq)
+    if isinstance(sites, str) or sites is None:
+        sites = [sites]
+
+    flist: list[Path] = []
+    for s in sites:
+        try:
+            flist += _datafiles(path, s, treq)
+        except FileNotFoundError as e:
+            logging.warning(f"skipping {s}: {e}")
+    if not flist:
+        raise FileNotFoundError(f"no data files of {sites} in {path} for {treq}")
+    args = (None, batch, thresholds, bright, gap, treq)
+
+    tic = time.perf_counter()
+    events: list[dict] = []
+    frames = 0
+
+    pool = concurrent.futures.ProcessPoolExecutor(processes) if processes != 1 else None
+    try:
+        for ev, n in (pool.map if pool else map)(_detect, flist, [args] * len(flist)):
+            events += ev
+            frames += n
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - tic
+    logging.info(
+        f"{frames} frames of {len(flist)} files in {elapsed:.1f} s, {frames / elapsed:.0f} frames/s"
+    )
+
+    events.sort(key=lambda e: (e["start"], e["site"]))
+    cat = xarray.Dataset(
+        {
+            k: ("event", np.array([e[k] for e in events], dtype=dt))
+            for k, dt in _EVENT_DTYPES.items()
+        },
+        attrs={
+            "files": len(flist),
+            "frames": frames,
+            "elapsed_s": elapsed,
+            "frames_per_s": frames / elapsed,
+        },
+    )
+
+    return cat
+
+
+_EVENT_DTYPES: dict[str, npt.DTypeLike] = {
+    "site": str,
+    "filename": str,
+    "start": "datetime64[ns]",
+    "end": "datetime64[ns]",
+    "peak": "datetime64[ns]",
+    "peak_mean": np.float32,
+    "max_rise": np.float32,
+    "max_bright": np.float32,
+    "flags": np.int8,
+}
+
+
+def _detect(fn: Path, args: tuple) -> tuple[list[dict], int]:
+    """one file of the pool, a bad file is logged and does not stop the catalog"""
+    try:
+        return detect(fn, *args)
+    except (OSError, ValueError) as e:
+        logging.warning(f"skipping {fn}: {e}")
+        return [], 0
+
+
+def _events(t, f, flag, gap: float, site: str, filename: str) -> list[dict]:
+    """runs of flagged frames, joined across gaps shorter than gap seconds"""
+    k = np.flatnonzero(flag)
+    if k.size == 0:
+        return []
+
+    split = np.flatnonzero(np.diff(t[k]) > np.timedelta64(int(gap * 1e9), "ns")) + 1
+    events = []
+    for run in np.split(k, split):
+        s, e = run[0], run[-1] + 1
+        p = s + np.argmax(f["mean"][s:e])
+        events.append(
+            {
+                "site": site,
+                "filename": filename,
+                "start": t[s],
+                "end": t[e - 1],
+                "peak": t[p],
+                "peak_mean": float(f["mean"][p]),
+                "max_rise": float(np.nanmax(f["rise"][s:e], initial=-np.inf)),
+                "max_bright": float(f["bright"][s:e].max()),
+                "flags": int(np.bitwise_or.reduce(flag[run])),
+            }
+        )
+
+    return events
+
+
+def _mask(fn: Path, imgs: xarray.DataArray, cal: xarray.Dataset | None):
+    """
+    pixels above MIN_EL, or all pixels if no calibration is available.
+    Cached per calibration file, so each worker process reads each calibration once.
+    """
+    if cal is None:
+        try:
+            calfn = _findcal(
+                fn.parent, imgs.site, imgs.time.values[0].astype("datetime64[us]").item()
+            )
+        except (FileNotFoundError, ValueError):
+            return None
+
+        key = (str(calfn), imgs.shape[1:])
+        if key in _mask_cache:
+            return _mask_cache[key]
+        cal = loadcal_file(calfn)
+    else:
+        key = None
+
+    mask = azel(_downsample(cal, imgs.shape[1:]))[1] >= MIN_EL
+
+    if key is not None:
+        if len(_mask_cache) >= MASK_CACHE_SIZE:
+            _mask_cache.pop(next(iter(_mask_cache)))
+        _mask_cache[key] = mask
+
+    return mask
+
+
+def cli():
+    p = ArgumentParser(description="catalog auroral events in THEMIS ASI data")
+    p.add_argument("path", help="ASI data directory")
+    p.add_argument("sites", help="site 4 character codes e.g. gako fykn", nargs="+")
+    p.add_argument("-t", "--treq", help="start, stop time", nargs=2, required=True)
+    p.add_argument("-o", "--out", help="catalog file (.nc or .csv)")
+    p.add_argument("-j", "--processes", help="worker processes", type=int)
+    p.add_argument("-bright", help="bright pixel data number", type=float, default=BRIGHT)
+    p.add_argument(
+        "-min_rise", help="data numbers / second", type=float, default=THRESHOLDS["min_rise"]
+    )
+    p.add_argument(
+        "-min_bright", help="bright FOV fraction", type=float, default=THRESHOLDS["min_bright"]
+    )
+    P = p.parse_args()
+
+    cat = catalog(
+        P.path,
+        P.sites,
+        P.treq,
+        P.processes,
+        thresholds={"min_rise": P.min_rise, "min_bright": P.min_bright},
+        bright=P.bright,
+    )
+
+    print(
+        f"{cat.event.size} events, {cat.frames} frames of {cat.files} files in {cat.elapsed_s:.1f} s:"
+        f" {cat.frames_per_s:.0f} frames/s"
+    )
+
+    if P.out:
+        out = Path(P.out).expanduser()
+        if out.suffix == ".csv":
+            cat.to_dataframe().to_csv(out, index=False)
+        else:
+            cat.to_netcdf(out)
+
+
+if __name__ == "__main__":
+    cli()
@@ -6,6 +6,9 @@ import pymap3d as pm
 from pymap3d.vincenty import vdist
 import histutils.findnearest as fnd
 
+from .geometry import camera, mapto
+from .io import azel
+
 try:
     import scipy.ndimage as ndi
 except ImportError:
@@ -27,6 +30,7 @@ def getimgind(imgs: xarray.Dataset, lla, az, el):
     else:
         raise ValueError("must specify LLA or az/el")
     # %% work
+    imgs = _degrees(imgs)
     ind = np.empty((N, 2), dtype=int)
 
     if lla is not None:
@@ -46,16 +50,15 @@ def getimgind(imgs: xarray.Dataset, lla, az, el):
 
 
 def projected_coord(imgs: xarray.Dataset, ind, lla: tuple[float, float, float]):
+    imgs = _degrees(imgs)
     az = imgs.az[ind[:, 0], ind[:, 1]].values.squeeze()
     el = imgs.el[ind[:, 0], ind[:, 1]].values.squeeze()
 
     alt_m = lla[2] * 1000 if lla is not None else 100e3
 
-    plat, plon, palt_m = pm.aer2geodetic(
-        az, el, alt_m / np.sin(np.radians(el)), imgs.lat, imgs.lon, imgs.alt_m
-    )
+    plat, plon, palt_m = camera(imgs).geodetic(alt_m, (ind[:, 0], ind[:, 1]))
 
-    return az, el, plat, plon, palt_m
+    return az, el, plat.squeeze(), plon.squeeze(), palt_m.squeeze()
 
 
 def line2plane(cam: xarray.Dataset) -> xarray.Dataset:
@@ -73,6 +76,7 @@ def line2plane(cam: xarray.Dataset) -> xarray.Dataset:
       If less, the image is sampled more sparsely, which is in effect recducing the resolution of the image.
       This parameter is not critical.
     """
+    cam = _degrees(cam)
     # %% linear regression
     polycoeff = np.polyfit(cam["cols"], cam["rows"], deg=3, full=False)
     # %% columns (x)  to cut from picture (have to pick either rows or cols, arbitrarily I use cols)
@@ -86,6 +90,7 @@ def line2plane(cam: xarray.Dataset) -> xarray.Dataset:
 
     # DONT DO THIS: cutrow.clip(0,self.supery,cutrow)
     # %% angle from magnetic zenith corresponding to those pixels
+    cam = magzenith(cam)
     anglesep_deg = anglesep(
         cam.Bel,
         cam.Baz,
@@ -159,18 +164,17 @@ def mergefov(
     print(
         f"intercamera distance with {w0.site}:  {vdist(w0.lat, w0.lon, w1.lat, w1.lon)[0] / 1e3:.1f} kilometers"
     )
-    # %% ENU projection from cam0 to cam1
-    e1, n1, u1 = pm.geodetic2enu(w1.lat, w1.lon, w1.alt_m, w0.lat, w0.lon, w0.alt_m)
+    w0 = _degrees(w0)
+    w1 = _degrees(w1)
+    # %% pixel ray geometry, computed once per calibration
+    g0 = camera(w0)
+    g1 = camera(w1)
     # %% find the ENU of narrow FOV pixels at 110km from narrow FOV
     w1 = pixelmask(w1, method)
     if method is not None and method.lower() == "mzslice":
         w0 = pixelmask(w0, method)
-        azSlice0, elSlice0, rSlice0 = pm.ecef2aer(
-            w1.x2mz, w1.y2mz, w1.z2mz, w0.lat, w0.lon, w0.alt_m
-        )
-        azSlice1, elSlice1, rSlice1 = pm.ecef2aer(
-            w0.x2mz, w0.y2mz, w0.z2mz, w1.lat, w1.lon, w1.alt_m
-        )
+        azSlice0, elSlice0 = g0.look(np.stack((w1.x2mz, w1.y2mz, w1.z2mz), axis=-1))
+        azSlice1, elSlice1 = g1.look(np.stack((w0.x2mz, w0.y2mz, w0.z2mz), axis=-1))
         # find image indices (mask) corresponding to slice az,el
         w0["rows"], w0["cols"] = fnd.findClosestAzel(
             w0["az"].where(w0["fovmask"]),
@@ -192,18 +196,12 @@ def mergefov(
             w1["az"], w1["el"], w1.Baz, w1.Bel
         )
     else:
-        # csc(x) = 1/sin(x)
-        slantrange = projalt / np.sin(
-            np.radians(np.ma.masked_invalid(w1["el"].where(w1["fovmask"])))
-        )
-        assert (slantrange >= projalt).all(), (
-            "slantrange must be >= projection altitude"
-        )
-
-        e0, n0, u0 = pm.aer2enu(w1["az"], w1["el"], slantrange)
-        # %% find az,el to narrow FOV from ASI FOV
-        az0, el0, _ = pm.enu2aer(e0 - e1, n0 - n1, u0 - u1)
-        assert (el0 >= 0).all(), (
+        # %% find az,el to narrow FOV pixels at projection altitude from ASI FOV
+        mask = w1["fovmask"].values
+        az0 = np.full(mask.shape, np.nan)
+        el0 = np.full(mask.shape, np.nan)
+        az0[mask], el0[mask] = mapto(g0, g1, projalt, mask)
+        assert (el0[mask & np.isfinite(el0)] >= 0).all(), (
             "FOVs may not overlap, negative elevation from cam0 to cam1"
         )
         # %% nearest neighbor brute force
@@ -218,6 +216,7 @@ def pixelmask(data: xarray.Dataset, method: str | None = None) -> xarray.Dataset
 
     returns mask of chosen pixels
     """
+    data = _degrees(data)
     if method is None or method == "rect":  # outermost edge of image (trivial)
         mask = np.zeros(data["az"].shape, dtype=bool)
         mask[:, 0] = True
@@ -236,6 +235,7 @@ def pixelmask(data: xarray.Dataset, method: str | None = None) -> xarray.Dataset
         MIN_EL = 5  # degrees, arbitrary
         if data.srpts is None:
             raise ValueError("must include slant range points")
+        data = magzenith(data)
 
         mask = np.zeros(data["az"].shape, dtype=bool)
         mask[data["el"] >= MIN_EL] = True
@@ -260,3 +260,37 @@ def pixelmask(data: xarray.Dataset, method: str | None = None) -> xarray.Dataset
     data["fovmask"] = (("y", "x"), mask)
 
     return data
+
+
+def magzenith(data: xarray.Dataset) -> xarray.Dataset:
+    """
+    magnetic zenith attributes Baz, Bel from the bundled field model, unless already set
+
+    Baz is the declination and Bel the inclination (degrees), see themisasi.magnetic.zenith().
+    The field epoch is attribute Bepoch if set, otherwise the calibration time.
+    The input is not modified: a shallow copy with the attributes is returned.
+    """
+    if "Baz" in data.attrs and "Bel" in data.attrs:
+        return data
+
+    from .magnetic import zenith, _year
+
+    epoch = data.attrs.get("Bepoch") or data.attrs.get("caltime")
+    if not isinstance(epoch, (int, float)):
+        epoch = _year(epoch)
+
+    data = data.copy()
+    data.attrs["Baz"], data.attrs["Bel"] = zenith(data.lat, data.lon, data.alt_m, epoch)
+    data.attrs["Bepoch"] = epoch
+
+    return data
+
+
+def _degrees(data: xarray.Dataset) -> xarray.Dataset:
+    """az, el in degrees, decoding compact int16 calibration storage"""
+    if data["az"].dtype != np.int16 and data["el"].dtype != np.int16:
+        return data
+
+    az, el = azel(data)
+
+    return data.assign(az=(data["az"].dims, az), el=(data["el"].dims, el))
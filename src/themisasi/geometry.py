@@ -0,0 +1,227 @@
+"""
+per-camera pixel ray geometry
+
+The direction of every pixel is computed once per calibration, as unit vectors in local ENU and in ECEF.
+Intersecting the pixel rays with an altitude shell and looking at those points from another camera
+are then batched vector operations, reused across calls and cameras.
+
+    g0 = themisasi.geometry.camera(cal0)
+    g1 = themisasi.geometry.camera(cal1)
+    az, el = g0.look(g1.intersect(110e3))  # cam1 pixels at 110 km as seen from cam0
+"""
+
+from __future__ import annotations
+import dataclasses
+import typing
+
+import numpy as np
+
+from .celestial import azel2enu, enu2azel
+from .io import azel
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+# WGS84 ellipsoid
+A = 6378137.0  # semimajor axis (meters)
+B = 6356752.31424518  # semiminor axis (meters)
+
+CAMERA_CACHE_SIZE = 16  # number of camera geometries kept in memory
+_camera_cache: dict[tuple, "Camera"] = {}
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class Camera:
+    """
+    pixel ray geometry of a calibrated camera
+
+    Attributes
+    ----------
+    lat, lon, alt_m: float
+        camera geodetic position
+    origin: numpy.ndarray
+        (3,) camera ECEF position (meters)
+    rotation: numpy.ndarray
+        (3, 3) columns are the local East, North, Up unit vectors in ECEF
+    enu: numpy.ndarray
+        (y, x, 3) pixel unit vectors in local ENU, NaN outside the FOV
+    ecef: numpy.ndarray
+        (y, x, 3) pixel unit vectors in ECEF, NaN outside the FOV
+    """
+
+    lat: float
+    lon: float
+    alt_m: float
+    origin: np.ndarray
+    rotation: np.ndarray
+    enu: np.ndarray
+    ecef: np.ndarray
+
+    def intersect(self, alt_m: float, mask=None) -> np.ndarray:
+        """
+        ECEF points (meters) where pixel rays reach an altitude above the ellipsoid
+
+        The altitude shell is the ellipsoid with both axes extended by alt_m,
+        within a few meters of constant geodetic altitude at auroral altitudes.
+
+        Parameters
+        ----------
+        alt_m: float
+            altitude of the shell (meters)
+        mask: numpy.ndarray of bool or tuple of numpy.ndarray, optional
+            (y, x) pixels to intersect, or (row, col) pixel indices. By default all pixels.
+
+        Returns
+        -------
+        p: numpy.ndarray
+            (y, x, 3) or (npixel, 3) ECEF points, NaN for rays outside the FOV or not reaching the shell
+        """
+        d = self.ecef if mask is None else self.ecef[mask]
+        # scale to the unit sphere
+        s = np.array([A + alt_m, A + alt_m, B + alt_m])
+        o = self.origin / s
+        d = d / s.astype(d.dtype)
+
+        dd = (d * d).sum(axis=-1)
+        od = d @ o.astype(d.dtype)
+        c = o @ o - 1
+        # the camera is inside the shell, so the far root is the forward intersection
+        with np.errstate(invalid="ignore"):
+            t = (-od + np.sqrt(od**2 - dd * c)) / dd
+
+        return self.origin + t[..., None] * (d * s)
+
+    def look(self, p) -> tuple[np.ndarray, np.ndarray]:
+        """
+        azimuth, elevation (degrees) from this camera to ECEF points
+
+        Parameters
+        ----------
+        p: numpy.ndarray
+            (..., 3) ECEF points (meters)
+
+        Returns
+        -------
+        az, el: numpy.ndarray
+            (...) azimuth, elevation (degrees)
+        """
+        v = (np.asarray(p) - self.origin) @ self.rotation
+        v = v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+        return enu2azel(v)
+
+    def geodetic(self, alt_m: float, mask=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        geodetic latitude, longitude (degrees) and altitude (meters) of pixel rays at an altitude,
+        see intersect()
+        """
+        import pymap3d as pm
+
+        p = self.intersect(alt_m, mask)
+
+        return pm.ecef2geodetic(p[..., 0], p[..., 1], p[..., 2])
+
+
+def camera(cal: xarray.Dataset, dtype=np.float64) -> Camera:
+    """
+    pixel ray geometry of a calibration, cached per calibration
+
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        az, el and camera lat, lon, alt_m from themisasi.loadcal() or themisasi.load()
+    dtype: numpy.dtype
+        precision of pixel unit vectors e.g. numpy.float32 to halve memory
+
+    Returns
+    -------
+    geom: Camera
+        pixel ray geometry
+    """
+    lat = np.asarray(cal.lat).item()
+    lon = np.asarray(cal.lon).item()
+    alt_m = np.asarray(cal.alt_m).item()
+
+    key = (
+        cal.attrs.get("calfilename"),
+        str(cal.attrs.get("caltime")),
+        cal["az"].shape,
+        lat,
+        lon,
+        alt_m,
+        np.dtype(dtype).str,
+    )
+    if key in _camera_cache:
+        return _camera_cache[key]
+
+    R = enu2ecef_rotation(lat, lon)
+    enu = azel2enu(*azel(cal), dtype)
+
+    geom = Camera(
+        lat=lat,
+        lon=lon,
+        alt_m=alt_m,
+        origin=geodetic2ecef(lat, lon, alt_m),
+        rotation=R,
+        enu=enu,
+        ecef=enu @ R.T.astype(enu.dtype),
+    )
+
+    if len(_camera_cache) >= CAMERA_CACHE_SIZE:
+        _camera_cache.pop(next(iter(_camera_cache)))
+    _camera_cache[key] = geom
+
+    return geom
+
+
+def mapto(cam0: Camera, cam1: Camera, alt_m: float, mask=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    azimuth, elevation (degrees) from camera 0 of camera 1 pixels at an altitude
+
+    Parameters
+    ----------
+    cam0, cam1: Camera
+        geometry of the looking camera and of the camera whose pixels are mapped
+    alt_m: float
+        altitude (meters) of the emission
+    mask: numpy.ndarray of bool, optional
+        (y, x) camera 1 pixels to map
+
+    Returns
+    -------
+    az, el: numpy.ndarray
+        azimuth, elevation (degrees) in camera 0, NaN outside camera 1 FOV
+    """
+    return cam0.look(cam1.intersect(alt_m, mask))
+
+
+def enu2ecef_rotation(lat: float, lon: float) -> np.ndarray:
+    """(3, 3) rotation with columns East, North, Up in ECEF"""
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    sp, cp = np.sin(phi), np.cos(phi)
+    sl, cl = np.sin(lam), np.cos(lam)
+
+    return np.array(
+        [
+            [-sl, -sp * cl, cp * cl],
+            [cl, -sp * sl, cp * sl],
+            [0.0, cp, sp],
+        ]
+    )
+
+
+def geodetic2ecef(lat: float, lon: float, alt_m: float) -> np.ndarray:
+    """(3,) ECEF position (meters) of a geodetic position"""
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    e2 = 1 - (B / A) ** 2
+    N = A / np.sqrt(1 - e2 * np.sin(phi) ** 2)
+
+    return np.array(
+        [
+            (N + alt_m) * np.cos(phi) * np.cos(lam),
+            (N + alt_m) * np.cos(phi) * np.sin(lam),
+            (N * (1 - e2) + alt_m) * np.sin(phi),
+        ]
+    )
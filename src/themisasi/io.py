@@ -1,32 +1,48 @@
 """
 Read THEMIS GBO ASI data
+
+xarray, cdflib and the calibration format readers are imported on first use,
+so that importing themisasi is fast for short-lived processes.
 """
 
+from __future__ import annotations
+import collections.abc
 import logging
-import warnings
+import threading
+import typing
 from pathlib import Path
-from datetime import datetime
-import xarray
+from datetime import datetime, timedelta
 import numpy as np
-import scipy.io
-
-import cdflib
 
-try:
-    import h5py
-except ImportError:
-    h5py = None
-try:
-    import netCDF4
-except ImportError:
-    netCDF4 = None
+if typing.TYPE_CHECKING:
+    import xarray
+
+TIME_TOL = 1  # number of seconds to tolerate in time request offset
+# compact int16 calibration: centidegrees, azimuth offset to fit [0, 360) in int16
+INT16_SCALE = 0.01
+INT16_FILL = np.iinfo(np.int16).min
+# CDF_EPOCH is milliseconds since 0000-01-01, TT2000 is nanoseconds since J2000 Terrestrial Time
+CDF_EPOCH_UNIX_MS = -np.datetime64("0000-01-01", "ms").astype(np.int64)
+TT2000_FILL = np.iinfo(np.int64).min
+BIN_CACHE_SIZE = 8  # number of binned calibrations kept in memory
+_bin_cache: dict[tuple, xarray.Dataset] = {}
+FRAME_CACHE_BYTES = 512 * 2**20  # decoded images kept in memory by load(), 0 disables
+BLOCK_RECORDS = 16  # records decoded and cached together
+# (file, mtime, size, variable, first record, end record): images, in least recently used order
+_frame_cache: dict[tuple, np.ndarray] = {}
+_frame_stats = {"hits": 0, "misses": 0, "bytes": 0}
+_frame_lock = threading.Lock()
+_frame_reading: dict[tuple, threading.Event] = {}  # blocks being decoded, set when done
 
 
 def load(
     path: Path,
     site: str | None = None,
-    treq = None,
+    treq=None,
     calfn: Path | None = None,
+    quality: bool | dict[str, float | None] | None = None,
+    caldtype: str | None = None,
+    background: Path | bool | None = None,
 ) -> xarray.Dataset:
     """
     read THEMIS ASI camera data
@@ -43,6 +59,14 @@ def load(
         requested time to load
     calfn: pathlib.Path, optional
         path to calibration file (skymap)
+    quality: bool or dict, optional
+        skip frames rejected by quality screening, see themisasi.quality.
+        True uses default thresholds, or give a dict of thresholds to override.
+    caldtype: str, optional
+        compact calibration az/el storage, "float32" or "int16", see loadcal_file()
+    background: pathlib.Path or bool, optional
+        subtract background and divide by flat-field of the calibration epoch, see themisasi.background.
+        Give the directory of the models, or True for the data directory.
 
     Returns
     -------
@@ -53,26 +77,40 @@ def load(
     if treq is not None:
         treq = _timereq(treq)  # type: ignore
 
-    imgs = _timeslice(path, site, treq)
+    imgs = _timeslice(path, site, treq, quality)
     # %% optional load calibration (az, el)
-    data = xarray.Dataset({"imgs": imgs})
-    data.attrs = imgs.attrs
-
     cal = None
     if calfn:
-        cal = loadcal(calfn, site, treq)
+        cal = loadcal(calfn, site, treq, caldtype)
     else:
         try:
-            cal = loadcal(path, site, treq)
+            cal = loadcal(path, site, treq, caldtype)
         except (FileNotFoundError, ValueError):
             pass
 
+    return _assemble(imgs, cal, path, background)
+
+
+def _assemble(
+    imgs: xarray.DataArray,
+    cal: xarray.Dataset | None,
+    path: Path,
+    background: Path | bool | None = None,
+) -> xarray.Dataset:
+    """images with calibration and optional background correction, see load()"""
+    import xarray
+
+    data = xarray.Dataset({"imgs": imgs})
+    data.attrs = imgs.attrs
+
     if cal is not None:
         if cal.site is not None and cal.site != imgs.site:
             raise ValueError(
                 f"cal site {cal.site} and data site {imgs.site} do not match. Was wrong calibration file used?"
             )
 
+        cal = _downsample(cal, imgs.shape[1:])
+
         data = xarray.merge((data, cal))
         data.attrs = cal.attrs
         data.attrs.update(imgs.attrs)
@@ -82,12 +120,29 @@ def load(
                     "calibration is taken AFTER the images--may be incorrect lat/lon az/el plate scale"
                 )
 
+    if background:
+        from .background import lookup, correct
+
+        if background is True:
+            background = Path(path).expanduser()
+            if not background.is_dir():
+                background = background.parent
+
+        model = lookup(
+            background,
+            imgs.site,
+            data.attrs.get("caltime"),
+            imgs.time.values[0].astype("datetime64[us]").item(),
+        )
+        data["imgs"] = correct(data["imgs"], model)
+        data.attrs["background"] = model.modelfilename
+
     return data
 
 
-def filetimes(fn: Path) -> list[datetime]:
+def filetimes(fn: Path) -> np.ndarray:
     """
-    prints the times available in a THEMIS ASI CDF file
+    times available in a THEMIS ASI CDF file
 
     Parameters
     ----------
@@ -96,19 +151,23 @@ def filetimes(fn: Path) -> list[datetime]:
 
     Returns
     -------
-    time: list of datetime.datetime
+    time: numpy.ndarray of datetime64[ns]
         times available in this CDF file
     """
+    import cdflib
 
     h = cdflib.cdfread.CDF(fn)
 
     site = h.attget("Descriptor", 0).Data[:4].lower()
 
-    return cdflib.cdfepoch().to_datetime(h[f"thg_asf_{site}_epoch"][:])
+    return epoch2datetime64(h[f"thg_asf_{site}_epoch"][:])
 
 
 def _timeslice(
-    path: Path, site: str | None = None, treq: datetime | None = None
+    path: Path,
+    site: str | None = None,
+    treq: datetime | None = None,
+    quality: bool | dict[str, float | None] | None = None,
 ) -> xarray.DataArray:
     """
     loads time slice of Themis ASI data
@@ -121,58 +180,392 @@ def _timeslice(
         site code e.g. gako for Gakon
     treq: datetime.datetime or list of datetime.datetime
         requested time or min,max time range
+    quality: bool or dict, optional
+        skip frames rejected by quality screening
 
     Results
     -------
     data: xarray.DataArray
         Themis ASI data
     """
+    import cdflib
+    import xarray
 
-    TIME_TOL = 1  # number of seconds to tolerate in time request offset
     # %% open CDF file handle (no close method)
     site, fn = _sitefn(path, site, treq)
 
     h = cdflib.cdfread.CDF(fn)
     # %% load image times
-    time = cdflib.cdfepoch().to_datetime(h[f"thg_asf_{site}_epoch"][:])
+    time = epoch2datetime64(h[f"thg_asf_{site}_epoch"][:])
     # %% time request handling
+    i = _timeindex(time, treq, fn)
+    if quality:
+        i = _screen(fn, i, quality)
 
-    if treq is None:
-        i = slice(None)
-    else:
-        atreq = np.atleast_1d(np.asarray(treq)).astype(np.datetime64)
-
-        if atreq.size == 1:
-            # Note: arbitrarily allowing up to 1 second time offset from request
-            if all(atreq < (time - np.timedelta64(TIME_TOL, "s"))) | all(
-                atreq > time + np.timedelta64(TIME_TOL, "s")
-            ):
-                raise ValueError(f"requested time {atreq} outside {fn}")
-
-            i = abs(time - np.datetime64(atreq[0])).argmin()
-        elif atreq.size == 2:  # start, end
-            i = (time >= atreq[0]) & (time <= atreq[1])
-        else:
-            raise ValueError("for now, time req is single time or time range")
-
-    imgs = h[f"thg_asf_{site}"][i]
-    if imgs.ndim == 2:
-        imgs = imgs[None, ...]
-
-    time = time[i]
-    if isinstance(time, (datetime, np.datetime64)):
-        time = [time]
-    if len(time) == 0:
+    if len(i) == 0:
         raise ValueError(f"no times were found with requested time bounds {treq}")
 
     return xarray.DataArray(
-        imgs,
-        coords={"time": time},
+        _read_records(h, f"thg_asf_{site}", i, cache=True),
+        coords={"time": time[i]},
         dims=["time", "y", "x"],
         attrs={"filename": fn.name, "site": site},
     )
 
 
+def iterload(
+    path: Path | list[Path],
+    site: str | None = None,
+    treq=None,
+    batch: int = 64,
+    quality: bool | dict[str, float | None] | None = None,
+) -> collections.abc.Generator[xarray.DataArray, None, None]:
+    """
+    streams THEMIS ASI images in batches of records, in time order across hourly files,
+    so that long time spans can be processed without holding the whole image stack in memory.
+
+    Parameters
+    ----------
+    path: pathlib.Path or list of pathlib.Path
+        directory where Themis ASI data files are, data file, or list of data files
+    site: str, optional
+        site code e.g. gako.  Only needed if "path" is a directory
+    treq: datetime.datetime or list of datetime.datetime, optional
+        requested time or min,max time range, which may span many hourly files
+    batch: int
+        maximum number of records per yielded batch
+    quality: bool or dict, optional
+        skip frames rejected by quality screening
+
+    Yields
+    ------
+    imgs: xarray.DataArray
+        (time, y, x) batch of images
+    """
+    import cdflib
+    import xarray
+
+    if treq is not None:
+        treq = _timereq(treq)
+
+    for fn in _datafiles(path, site, treq):
+        h = cdflib.cdfread.CDF(fn)
+        fsite = h.attget("Descriptor", 0).Data[:4].lower()
+        time = epoch2datetime64(h[f"thg_asf_{fsite}_epoch"][:])
+
+        if treq is None or isinstance(treq, datetime) or len(treq) == 1:
+            i = _timeindex(time, treq, fn)
+        else:
+            i = _timeindex(time, (treq[0], treq[-1]), fn)
+        if quality:
+            i = _screen(fn, i, quality)
+
+        for k in range(0, len(i), batch):
+            j = i[k : k + batch]
+            yield xarray.DataArray(
+                _read_records(h, f"thg_asf_{fsite}", j),
+                coords={"time": time[j]},
+                dims=["time", "y", "x"],
+                attrs={"filename": fn.name, "site": fsite},
+            )
+
+
+def epoch2datetime64(epoch) -> np.ndarray:
+    """
+    convert CDF_EPOCH or CDF_TIME_TT2000 values to datetime64[ns] with array arithmetic,
+    without going through Python datetime objects
+
+    Parameters
+    ----------
+    epoch: numpy.ndarray
+        CDF_EPOCH (float64 milliseconds since 0000-01-01) or TT2000 (int64 nanoseconds since J2000)
+
+    Returns
+    -------
+    time: numpy.ndarray of datetime64[ns]
+        UTC times. Fill values are NaT.
+    """
+    epoch = np.asarray(epoch)
+
+    if np.issubdtype(epoch.dtype, np.integer):
+        return _tt2000(epoch.astype(np.int64))
+    if np.iscomplexobj(epoch):  # CDF_EPOCH16 is not used by THEMIS ASI
+        import cdflib
+
+        return np.asarray(cdflib.cdfepoch.to_datetime(epoch), dtype="datetime64[ns]")
+
+    unix_ms = epoch.astype(np.float64) - CDF_EPOCH_UNIX_MS
+    good = np.isfinite(epoch) & (epoch > 0)
+    # microsecond rounding: float64 milliseconds since year 0 resolve about 10 microseconds
+    us = np.rint(np.where(good, unix_ms, 0) * 1000).astype(np.int64)
+
+    return np.where(good, us.astype("datetime64[us]"), np.datetime64("NaT", "ns")).astype(
+        "datetime64[ns]"
+    )
+
+
+def _tt2000(tt) -> np.ndarray:
+    """
+    TT2000 to UTC using the leap second table of cdflib.
+    Leap seconds before 1972 (fractional, drifting) are not handled.
+    """
+    import cdflib
+
+    # integer leap seconds (TAI - UTC) since 1972, and the TT2000 value at which each takes effect
+    lts = [r for r in cdflib.epochs.CDFepoch.LTS if r[0] >= 1972]
+    dates = np.array([f"{y:04d}-{m:02d}-{d:02d}" for y, m, d, *_ in lts], dtype="datetime64[ns]")
+    leap = np.array([r[3] for r in lts], dtype=np.int64) * 1_000_000_000
+
+    j2000 = np.datetime64("2000-01-01T12:00:00", "ns")
+    # TT = TAI + 32.184 s = UTC + leap seconds + 32.184 s
+    offset = leap + 32_184_000_000
+    start = (dates - j2000).astype(np.int64) + offset
+
+    fill = tt <= TT2000_FILL + 1  # fill and pad values
+    tt = np.where(fill, 0, tt)
+
+    k = np.clip(np.searchsorted(start, tt, side="right") - 1, 0, None)
+    t = j2000 + (tt - offset[k]).astype("timedelta64[ns]")
+
+    return np.where(fill, np.datetime64("NaT", "ns"), t)
+
+
+def _timeindex(time, treq, fn: Path):
+    """
+    record indices of a time request, by binary search of the increasing record times
+
+    Parameters
+    ----------
+    time: numpy.ndarray of datetime64
+        times of records in file
+    treq: datetime.datetime or list of datetime.datetime
+        requested time or min,max time range
+    fn: pathlib.Path
+        filename for error messages
+
+    Returns
+    -------
+    i: numpy.ndarray of int
+        record indices
+    """
+
+    if treq is None:
+        return np.arange(len(time))
+
+    time = np.asarray(time, dtype="datetime64[ns]")
+    atreq = np.atleast_1d(np.asarray(treq, dtype="datetime64[ns]"))
+
+    if atreq.size == 1:
+        # Note: arbitrarily allowing up to 1 second time offset from request
+        tol = np.timedelta64(TIME_TOL, "s")
+        if time.size == 0 or atreq[0] < time[0] - tol or atreq[0] > time[-1] + tol:
+            raise ValueError(f"requested time {atreq} outside {fn}")
+        # nearest record: the one at or after the request, or the one before
+        k = np.searchsorted(time, atreq[0])
+        if k == time.size or (k > 0 and atreq[0] - time[k - 1] <= time[k] - atreq[0]):
+            k -= 1
+
+        return np.atleast_1d(k)
+    elif atreq.size == 2:  # start, end
+        return np.arange(
+            np.searchsorted(time, atreq[0], "left"), np.searchsorted(time, atreq[1], "right")
+        )
+    else:
+        raise ValueError("for now, time req is single time or time range")
+
+
+def _read_records(h, var: str, i, cache: bool = False) -> np.ndarray:
+    """
+    reads only the requested records of a CDF variable, one read per contiguous run of records
+
+    Parameters
+    ----------
+    h: cdflib.cdfread.CDF
+        open CDF file
+    var: str
+        variable name
+    i: numpy.ndarray of int
+        increasing record indices
+    cache: bool
+        read through the in-process frame cache, in blocks of BLOCK_RECORDS
+
+    Returns
+    -------
+    dat: numpy.ndarray
+        (len(i), ...) records
+    """
+    i = np.asarray(i)
+    if cache and FRAME_CACHE_BYTES > 0:
+        return _read_cached(h, var, i)
+
+    shape = h.varinq(var).Dim_Sizes
+
+    runs = np.split(i, np.flatnonzero(np.diff(i) != 1) + 1)
+
+    return np.concatenate(
+        [
+            h.varget(var, startrec=int(r[0]), endrec=int(r[-1])).reshape(r.size, *shape)
+            for r in runs
+        ]
+    )
+
+
+def _read_cached(h, var: str, i: np.ndarray) -> np.ndarray:
+    """
+    records through the frame cache, keyed by file modification time and size
+    so that rewritten or growing files are read again
+
+    Threads missing on the same block wait for the one decoding it rather than decoding it again.
+    """
+    st = Path(h.file).stat()
+    nrec = h.varinq(var).Last_Rec + 1
+
+    blocks = i // BLOCK_RECORDS
+    dat = None
+    for b in np.unique(blocks):
+        start = int(b) * BLOCK_RECORDS
+        end = min(start + BLOCK_RECORDS, nrec)
+        key = (str(h.file), st.st_mtime_ns, st.st_size, var, start, end)
+
+        blk = _frame_get(key)
+        if blk is None:
+            try:
+                blk = _read_records(h, var, np.arange(start, end))
+                _frame_put(key, blk)
+            finally:
+                with _frame_lock:
+                    _frame_reading.pop(key).set()
+
+        if dat is None:
+            dat = np.empty((i.size, *blk.shape[1:]), dtype=blk.dtype)
+        k = blocks == b
+        dat[k] = blk[i[k] - start]
+
+    if dat is None:
+        raise ValueError("no records requested")
+
+    return dat
+
+
+def _frame_get(key: tuple) -> np.ndarray | None:
+    """
+    block from the frame cache, waiting while another thread decodes it
+
+    None is a miss: the caller decodes the block, then removes key from _frame_reading and sets its event.
+    """
+    while True:
+        with _frame_lock:
+            blk = _frame_cache.pop(key, None)
+            if blk is not None:
+                _frame_cache[key] = blk  # most recently used
+                _frame_stats["hits"] += 1
+                return blk
+
+            reading = _frame_reading.get(key)
+            if reading is None:
+                _frame_reading[key] = threading.Event()
+                _frame_stats["misses"] += 1
+                return None
+        # a block too large to cache or a failed read is a miss again for the waiters
+        reading.wait()
+
+
+def _frame_put(key: tuple, blk: np.ndarray):
+    """adds a block to the frame cache, evicting least recently used blocks beyond FRAME_CACHE_BYTES"""
+    if blk.nbytes > FRAME_CACHE_BYTES:
+        return
+
+    with _frame_lock:
+        if key in _frame_cache:
+            return
+        _frame_cache[key] = blk
+        _frame_stats["bytes"] += blk.nbytes
+        while _frame_stats["bytes"] > FRAME_CACHE_BYTES:
+            _frame_stats["bytes"] -= _frame_cache.pop(next(iter(_frame_cache))).nbytes
+
+
+def frame_cache_info() -> dict[str, int]:
+    """
+    statistics of the in-process frame cache used by load(), for sizing FRAME_CACHE_BYTES
+
+    Returns
+    -------
+    info: dict
+        hits, misses (blocks), blocks and bytes held, max_bytes
+    """
+    with _frame_lock:
+        return {
+            "hits": _frame_stats["hits"],
+            "misses": _frame_stats["misses"],
+            "blocks": len(_frame_cache),
+            "bytes": _frame_stats["bytes"],
+            "max_bytes": FRAME_CACHE_BYTES,
+        }
+
+
+def frame_cache_clear():
+    """empties the frame cache and resets its statistics"""
+    with _frame_lock:
+        _frame_cache.clear()
+        _frame_stats.update(hits=0, misses=0, bytes=0)
+
+
+def _screen(fn: Path, i, quality: bool | dict[str, float | None]):
+    """keeps record indices accepted by quality screening"""
+    from .quality import accepted
+
+    return i[accepted(fn, quality if isinstance(quality, dict) else None)[i]]
+
+
+def _datafiles(
+    path: Path | list[Path], site: str | None, treq: datetime | list[datetime] | None
+) -> list[Path]:
+    """
+    hourly data files covering a time request
+
+    Parameters
+    ----------
+    path: pathlib.Path or list of pathlib.Path
+        directory of data files, data file or list of data files
+    site: str
+        site code e.g. gako.  Only needed if "path" is a directory
+    treq: datetime.datetime or list of datetime.datetime
+        requested time or time range
+
+    Returns
+    -------
+    flist: list of pathlib.Path
+        existing data files, in time order
+    """
+    if isinstance(path, (list, tuple)):
+        return [Path(p).expanduser() for p in path]
+
+    path = Path(path).expanduser()
+
+    if path.is_file():
+        return [path]
+    if not path.is_dir():
+        raise FileNotFoundError(path)
+    if not isinstance(site, str) or treq is None:
+        raise ValueError("Must specify filename OR path and site and time")
+
+    if isinstance(treq, datetime):
+        treq = [treq]
+    t = treq[0].replace(minute=0, second=0, microsecond=0)
+
+    flist = []
+    while t <= treq[-1]:
+        fn = path / f"thg_l1_asf_{site}_{t.year}{t.month:02d}{t.day:02d}{t.hour:02d}_v01.cdf"
+        if fn.is_file():
+            flist.append(fn)
+        t += timedelta(hours=1)
+
+    if not flist:
+        raise FileNotFoundError(f"no {site} data files in {path} for {treq}")
+
+    return flist
+
+
 def _sitefn(
     path: Path, site: str | None = None, treq: datetime | list[datetime] | None = None
 ) -> tuple[str, Path]:
@@ -195,6 +588,7 @@ def _sitefn(
     fn: pathlib.Path
         path to Themis ASI data file
     """
+    import cdflib
 
     path = Path(path).expanduser()
 
@@ -212,10 +606,7 @@ def _sitefn(
         else:
             raise ValueError("Must specify filename OR path and site and time")
 
-        fn = (
-            path
-            / f"thg_l1_asf_{site}_{t0.year}{t0.month:02d}{t0.day:02d}{t0.hour:02d}_v01.cdf"
-        )
+        fn = path / f"thg_l1_asf_{site}_{t0.year}{t0.month:02d}{t0.day:02d}{t0.hour:02d}_v01.cdf"
         if not fn.is_file():
             # try to use last time in file, if first time wasn't covered
             if isinstance(treq, datetime):
@@ -262,145 +653,212 @@ def _timereq(treq) -> datetime | list[datetime]:
     return treq
 
 
-def _downsample(imgs: xarray.Dataset, az, el, x, y) -> tuple:
+def _downsample(cal: xarray.Dataset, shape: collections.abc.Sequence[int]) -> xarray.Dataset:
     """
-    downsamples cal data to match image data
+    bins calibration to match binned image data e.g. kian, whit
 
-    because of the discontinuous nature of the calibration data, typical resampling is not valid.
-    Figured better to add a little error with plain decimation rather than enormous error with invalid technique.
-    """
-    if az.shape == imgs.shape[1:]:
-        return az, el, x, y
+    Because azimuth wraps around and is undefined at zenith, az/el are not averaged directly.
+    The pixel direction unit vectors of each block are averaged on the sphere instead.
+    Pixels outside the FOV (NaN) are left out of the average,
+    and a binned pixel is within the FOV if at least half of its block is.
+    Blocks need not be whole numbers of pixels, e.g. 256 -> 100 pixels.
 
-    downscale = (az.shape[0] // imgs.shape[1], az.shape[1] // imgs.shape[2])
+    The binned calibration is cached per calibration and image shape, so the cost is paid once per process.
 
-    logging.warning(
-        f"downsizing calibration az/el data by factors of {downscale} to match image data"
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        calibration from loadcal()
+    shape: sequence of int
+        (y, x) image shape, no larger than the calibration
+
+    Returns
+    -------
+    cal: xarray.Dataset
+        calibration binned to the image shape
+    """
+    import xarray
+    from .celestial import azel2enu, enu2azel
+
+    shape = tuple(int(n) for n in shape)
+    if cal["az"].shape == shape:
+        return cal
+    if len(shape) != 2 or not all(0 < m <= n for m, n in zip(shape, cal["az"].shape)):
+        raise ValueError(f"cannot bin calibration {cal['az'].shape} to image shape {shape}")
+
+    key = (
+        cal.attrs.get("calfilename"),
+        str(cal.attrs.get("caltime")),
+        cal["az"].shape,
+        str(cal["az"].dtype),
+        shape,
+    )
+    if key in _bin_cache:
+        return _bin_cache[key]
+
+    logging.info(f"binning calibration {cal['az'].shape} to image shape {shape}")
+
+    az, el = azel(cal)
+    valid = np.isfinite(az) & np.isfinite(el)
+    enu = np.where(valid[..., None], azel2enu(az, el), 0.0)
+    # %% block sums by block edges, any binning factor
+    ey, ex = (np.linspace(0, n, m + 1).round().astype(int)[:-1] for n, m in zip(az.shape, shape))
+
+    s = np.add.reduceat(np.add.reduceat(enu, ey, axis=0), ex, axis=1)
+    n = np.add.reduceat(np.add.reduceat(valid.astype(float), ey, axis=0), ex, axis=1)
+    size = np.diff(np.append(ey, az.shape[0]))[:, None] * np.diff(np.append(ex, az.shape[1]))
+
+    good = (n >= size / 2) & (np.linalg.norm(s, axis=-1) > 0)
+    baz, bel = enu2azel(s / np.linalg.norm(np.where(good[..., None], s, 1.0), axis=-1)[..., None])
+    baz[~good] = np.nan
+    bel[~good] = np.nan
+
+    out = xarray.Dataset(
+        {
+            "az": _like(baz, cal["az"], good),
+            "el": _like(bel, cal["el"], good),
+            "valid": (("y", "x"), good),
+        },
+        coords={"y": np.arange(shape[0]), "x": np.arange(shape[1])},
+        attrs=cal.attrs,
     )
 
-    az = az[:: downscale[0], :: downscale[1]]
-    el = el[:: downscale[0], :: downscale[1]]
-    x = np.arange(az.shape[1])
-    y = np.arange(az.shape[0])
+    if len(_bin_cache) >= BIN_CACHE_SIZE:
+        _bin_cache.pop(next(iter(_bin_cache)))
+    _bin_cache[key] = out
+
+    return out
+
 
-    return az, el, x, y
+def _like(a, v: xarray.DataArray, valid) -> tuple:
+    """binned az or el in the storage dtype of the original calibration variable"""
+    if v.dtype == np.int16:
+        return ("y", "x"), _encode_int16(a, valid, v.attrs["add_offset"]), v.attrs
 
+    return ("y", "x"), a.astype(v.dtype, copy=False), v.attrs
 
-def loadcal_file(fn: Path) -> xarray.Dataset:
+
+def loadcal_file(fn: Path, dtype: str | None = None) -> xarray.Dataset:
     """
     reads data mapping themis gbo asi pixels to azimuth,elevation
     calibration data url is
     https://data.phys.ucalgary.ca/sort_by_project/THEMIS/asi/skymaps/new_style/
 
+    If a native .npz version of the file made by themisasi-convert-cal is present and current, it is read instead.
+
+    The "valid" variable is True for pixels with finite az/el, i.e. within the FOV.
+
     Parameters
     ----------
     fn: pathlib.Path
         path to calibration file
+    dtype: str, optional
+        compact az/el storage for large or multi-site Datasets:
+
+        * "float32": half the memory of float64 sources
+        * "int16": centidegrees with CF "scale_factor" / "add_offset" attributes,
+          pixels outside the FOV are INT16_FILL. Use azel() to get degrees.
 
     Returns
     -------
     cal: xarray.Dataset
         calibration data
     """
-    site = None
-    time = None
+    import xarray
+    from .calformats import reader, compiled
+
     fn = Path(fn).expanduser()
     if not fn.is_file():
         raise FileNotFoundError(fn)
 
-    match fn.suffix:
-        case ".cdf":
-            site = fn.name.split("_")[3]
-
-            h = cdflib.cdfread.CDF(fn)
-
-            az = h[f"thg_asf_{site}_azim"][0]
-            el = h[f"thg_asf_{site}_elev"][0]
-            lat = h[f"thg_asc_{site}_glat"]
-            lon = (h[f"thg_asc_{site}_glon"] + 180) % 360 - 180  # [0,360] -> [-180,180]
-            alt_m = h[f"thg_asc_{site}_alti"]
-            x = y = h[f"thg_asf_{site}_c256"]
-
-            time = datetime.fromtimestamp(h[f"thg_asf_{site}_time"][-1])
-        case ".sav":
-            site = fn.name.split("_")[2]
-            # THEMIS SAV calibration files written with glitch from bug in IDL
-            warnings.simplefilter("ignore", UserWarning)
-            h = scipy.io.readsav(fn, python_dict=True, verbose=False)
-            warnings.resetwarnings()
-
-            az = h["skymap"]["full_azimuth"][0]
-            el = h["skymap"]["full_elevation"][0]
-            lat = h["skymap"]["site_map_latitude"].item()
-            lon = (
-                h["skymap"]["site_map_longitude"].item() + 180
-            ) % 360 - 180  # [0,360] -> [-180,180]
-            alt_m = h["skymap"]["site_map_altitude"].item()
-            x = h["skymap"]["full_column"][0][0, :]
-            y = h["skymap"]["full_row"][0][:, 0]
-            try:
-                tstr = h["skymap"]["generation_info"][0][0][2]
-                time = datetime(
-                    int(tstr[:4]), int(tstr[4:6]), int(tstr[6:8]), int(tstr[8:10])
-                )
-            except (KeyError, ValueError):
-                if h["skymap"]["site_unix_time"] > 0:
-                    tutc = h["skymap"]["site_unix_time"]
-                elif h["skymap"]["imager_unix_time"] > 0:
-                    tutc = h["skymap"]["imager_unix_time"]
-                else:
-                    tutc = None
-
-                if tutc is not None:
-                    time = datetime.utcfromtimestamp(tutc)
-                else:  # last resort
-                    time = datetime(
-                        int(fn.name[19:23]), int(fn.name[23:25]), int(fn.name[25:27])
-                    )
-
-        case ".h5":
-
-            with h5py.File(fn, "r") as h:
-                az = h["az"][:]
-                el = h["el"][:]
-                lat = h["lla"][0]
-                lon = h["lla"][1]
-                alt_m = h["lla"][2]
-                x = h["x"][0, :]
-                y = h["y"][:, 0]
-        case ".nc":
-
-            with netCDF4.Dataset(fn, "r") as h:
-                az = h["az"][:]
-                el = h["el"][:]
-                lat = h["lla"][0]
-                lon = h["lla"][1]
-                alt_m = h["lla"][2]
-                x = h["x"][0, :].astype(int)
-                y = np.flipud(h["y"][:, 0]).astype(int)
+    fn = compiled(fn)
+    h = reader(fn)(fn)
+
+    # masked source pixels (netCDF4 fill values) are outside the FOV, NaN as xarray would make them
+    az = _filled(h["az"])
+    el = _filled(h["el"])
+    valid = np.isfinite(az) & np.isfinite(el)
+
+    match dtype:
+        case None:
+            vaz = ("y", "x"), az
+            vel = ("y", "x"), el
+        case "float32":
+            vaz = ("y", "x"), az.astype(np.float32)
+            vel = ("y", "x"), el.astype(np.float32)
+        case "int16":
+            vaz = ("y", "x"), _encode_int16(az % 360, valid, 180.0), _int16_attrs(180.0)
+            vel = ("y", "x"), _encode_int16(el, valid, 0.0), _int16_attrs(0.0)
         case _:
-            raise ValueError(
-                f"{fn} calibration file format is not known to this program."
-            )
+            raise ValueError(f"unknown calibration dtype {dtype}")
 
     cal = xarray.Dataset(
-        {"az": (("y", "x"), az), "el": (("y", "x"), el)},
-        coords={"y": y, "x": x},
+        {"az": vaz, "el": vel, "valid": (("y", "x"), valid)},
+        coords={"y": h["y"], "x": h["x"]},
         attrs={
-            "lat": lat,
-            "lon": lon,
-            "alt_m": alt_m,
-            "site": site,
-            "calfilename": fn.name,
-            "caltime": time,
+            "lat": h["lat"],
+            "lon": h["lon"],
+            "alt_m": h["alt_m"],
+            "site": h.get("site"),
+            "calfilename": h.get("calfilename", fn.name),
+            "caltime": h.get("time"),
         },
     )
 
     return cal
 
 
+def azel(cal: xarray.Dataset) -> tuple[np.ndarray, np.ndarray]:
+    """
+    calibration azimuth, elevation in degrees, whatever the storage dtype
+
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        calibration data
+
+    Returns
+    -------
+    az, el: numpy.ndarray
+        azimuth, elevation (degrees), NaN outside the FOV
+    """
+    return _decode_int16(cal["az"]), _decode_int16(cal["el"])
+
+
+def _filled(a) -> np.ndarray:
+    """masked array values as NaN"""
+    a = np.ma.asarray(a)
+    if a.dtype.kind != "f":
+        a = a.astype(np.float64)
+
+    return np.ma.filled(a, np.nan)
+
+
+def _encode_int16(a, valid, offset: float):
+    return np.where(valid, np.rint((a - offset) / INT16_SCALE), INT16_FILL).astype(np.int16)
+
+
+def _int16_attrs(offset: float) -> dict[str, float | str]:
+    return {"scale_factor": INT16_SCALE, "add_offset": offset, "units": "degrees"}
+
+
+def _decode_int16(v: xarray.DataArray) -> np.ndarray:
+    a = v.values
+    if a.dtype != np.int16:
+        return a
+
+    return np.where(
+        a == INT16_FILL,
+        np.float32(np.nan),
+        a * np.float32(v.attrs["scale_factor"]) + np.float32(v.attrs["add_offset"]),
+    )
+
+
 def loadcal(
-    path: Path, site: str | None = None, time: datetime | None = None
+    path: Path,
+    site: str | None = None,
+    time: datetime | None = None,
+    dtype: str | None = None,
 ) -> xarray.Dataset:
     """
     load calibration skymap file
@@ -413,25 +871,31 @@ def loadcal(
         site code e.g. gako
     time: datetime.datetime
         time requested
+    dtype: str, optional
+        compact az/el storage "float32" or "int16", see loadcal_file()
 
     Returns
     -------
     cal: xarray.Dataset
         calibration data
     """
+    return loadcal_file(_calpath(path, site, time), dtype)
+
+
+def _calpath(path: Path, site: str | None = None, time: datetime | None = None) -> Path:
+    """calibration file of loadcal()"""
     path = Path(path).expanduser()
 
     if path.is_file():
         if site is None or time is None:
-            return loadcal_file(path)
+            return path
         else:
             path = path.parent
 
     assert isinstance(site, str)
     assert time is not None
-    fn = _findcal(path, site, time)
 
-    return loadcal_file(fn)
+    return _findcal(path, site, time)
 
 
 def _findcal(path: Path, site: str, time: datetime) -> Path:
@@ -480,7 +944,7 @@ def _findcal(path: Path, site: str, time: datetime) -> Path:
             isav = len(sdates) - (_i + 1)
 
     # %% get result
-    if not sdates and not cdates:
+    if datecdf is None and datesav is None:
         raise FileNotFoundError(f"could not find cal file for {site} {time}  in {path}")
     elif datecdf is None:
         return fsav[isav]
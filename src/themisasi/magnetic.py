@@ -0,0 +1,407 @@
+"""
+per-pixel magnetic coordinates from a bundled geomagnetic field model
+
+The field is the IGRF-13 main field truncated to degree 4 (igrf13.csv, epochs 2000-2020 and secular variation),
+without network access. At auroral latitudes the declination is within a few tenths of a degree
+and the inclination within about a degree and a half. For the full model, set COEFFICIENTS
+to the path of a table of all degrees in the same format.
+For each pixel, computed once per calibration, altitude and epoch, and cached in memory and on disk:
+
+* mlat, mlon: centered dipole magnetic latitude, longitude of the pixel ray at the altitude
+* mz_angle: angle of the pixel from the magnetic zenith of the site
+
+The magnetic zenith of the site is in attributes Baz, Bel, as used by themisasi.fov:
+
+    dat = themisasi.magnetic.assign(themisasi.load(fn), alt_m=110e3)
+    keo = themisasi.magnetic.keogram(dat)  # (time, mlat) along the magnetic meridian of the site
+"""
+
+from __future__ import annotations
+import importlib.resources
+import logging
+import typing
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .geometry import camera
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+COEFFICIENTS = "igrf13.csv"
+RE_KM = 6371.2  # IGRF reference radius
+CACHE_DIR = Path("~/.cache/themisasi")
+
+LUT_CACHE_SIZE = 8  # number of per-pixel tables kept in memory
+_lut_cache: dict[tuple, xarray.Dataset] = {}
+
+
+def coefficients(epoch: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Schmidt semi-normalized Gauss coefficients at an epoch
+
+    Parameters
+    ----------
+    epoch: float
+        decimal year. Interpolated between model epochs, extrapolated by secular variation after the last.
+
+    Returns
+    -------
+    g, h: numpy.ndarray
+        (n, m) coefficients (nT)
+    """
+    fn = Path(COEFFICIENTS).expanduser()
+    src = fn if fn.is_file() else importlib.resources.files(__package__) / COEFFICIENTS
+    with src.open("r") as f:
+        tab = np.genfromtxt(f, delimiter=",", names=True, dtype=None, encoding="utf8")
+
+    names = tab.dtype.names
+    if names is None:
+        raise ValueError(f"{COEFFICIENTS} has no header row")
+    epochs = names[3:-1]  # model epoch columns, between gh, n, m and sv
+
+    years = np.array([float(k) for k in epochs])
+    values = np.array([tab[k] for k in epochs], dtype=np.float64)  # (epoch, coefficient)
+
+    if epoch < years[0]:
+        raise ValueError(f"epoch {epoch} before field model {years[0]}")
+    if epoch >= years[-1]:
+        c = values[-1] + (epoch - years[-1]) * tab["sv"]
+    else:
+        c = np.array([np.interp(epoch, years, v) for v in values.T])
+
+    N = tab["n"].max()
+    g = np.zeros((N + 1, N + 1))
+    h = np.zeros((N + 1, N + 1))
+    for gh, n, m, v in zip(tab["gh"], tab["n"], tab["m"], c):
+        (g if gh == "g" else h)[n, m] = v
+
+    return g, h
+
+
+def field(lat, lon, alt_m, epoch: float) -> np.ndarray:
+    """
+    geomagnetic field in local geodetic East, North, Up
+
+    Parameters
+    ----------
+    lat, lon: numpy.ndarray
+        geodetic latitude, longitude (degrees)
+    alt_m: numpy.ndarray
+        altitude (meters)
+    epoch: float
+        decimal year
+
+    Returns
+    -------
+    B: numpy.ndarray
+        (..., 3) East, North, Up field (nT)
+    """
+    import pymap3d as pm
+
+    lat, lon, alt_m = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (lat, lon, alt_m)))
+    x, y, z = pm.geodetic2ecef(lat, lon, alt_m)
+
+    r = np.sqrt(x**2 + y**2 + z**2) / 1e3
+    theta = np.arccos(z / 1e3 / r)
+    phi = np.arctan2(y, x)
+
+    g, h = coefficients(epoch)
+    Br, Bt, Bp = _spherical(r, theta, phi, g, h)
+    # spherical to ECEF
+    st, ct = np.sin(theta), np.cos(theta)
+    sp, cp = np.sin(phi), np.cos(phi)
+    B = np.stack(
+        (
+            Br * st * cp + Bt * ct * cp - Bp * sp,
+            Br * st * sp + Bt * ct * sp + Bp * cp,
+            Br * ct - Bt * st,
+        ),
+        axis=-1,
+    )
+    # ECEF to geodetic ENU
+    la, lo = np.radians(lat), np.radians(lon)
+    e = np.stack((-np.sin(lo), np.cos(lo), np.zeros_like(lo)), axis=-1)
+    n = np.stack((-np.sin(la) * np.cos(lo), -np.sin(la) * np.sin(lo), np.cos(la)), axis=-1)
+    u = np.stack((np.cos(la) * np.cos(lo), np.cos(la) * np.sin(lo), np.sin(la)), axis=-1)
+
+    return np.stack(((B * e).sum(-1), (B * n).sum(-1), (B * u).sum(-1)), axis=-1)
+
+
+def zenith(lat: float, lon: float, alt_m: float, epoch: float) -> tuple[float, float]:
+    """
+    magnetic zenith of a site, in the Baz, Bel convention of themisasi.fov
+
+    Returns
+    -------
+    Baz, Bel: float
+        declination and magnitude of the inclination (degrees), e.g. about 21, 78 at Poker Flat.
+        The upward field line itself is at azimuth Baz + 180, elevation Bel.
+    """
+    e, n, u = field(lat, lon, alt_m, epoch)
+
+    return float(np.degrees(np.arctan2(e, n)) % 360), float(
+        np.degrees(np.arctan2(abs(u), np.hypot(e, n)))
+    )
+
+
+def dipole(p: np.ndarray, epoch: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    centered dipole magnetic latitude, longitude (degrees) of ECEF points
+
+    Parameters
+    ----------
+    p: numpy.ndarray
+        (..., 3) ECEF points (meters)
+    epoch: float
+        decimal year
+
+    Returns
+    -------
+    mlat, mlon: numpy.ndarray
+        (...) magnetic latitude, longitude (degrees)
+    """
+    g, h = coefficients(epoch)
+    # north geomagnetic pole
+    zm = -np.array([g[1, 1], h[1, 1], g[1, 0]])
+    zm /= np.linalg.norm(zm)
+    ym = np.cross([0.0, 0.0, 1.0], zm)
+    ym /= np.linalg.norm(ym)
+    xm = np.cross(ym, zm)
+
+    v = p / np.linalg.norm(p, axis=-1, keepdims=True)
+    mlat = np.degrees(np.arcsin(np.clip(v @ zm, -1, 1)))
+    mlon = np.degrees(np.arctan2(v @ ym, v @ xm))
+
+    return mlat, mlon
+
+
+def lookup(
+    cal: xarray.Dataset,
+    alt_m: float = 110e3,
+    epoch: float | None = None,
+    cache: Path | None = CACHE_DIR,
+) -> xarray.Dataset:
+    """
+    per-pixel magnetic coordinates of a calibration, cached per calibration, altitude and epoch
+
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        calibration
+    alt_m: float
+        altitude (meters) of the pixel rays for mlat, mlon
+    epoch: float, optional
+        decimal year of the field, by default the year of the calibration, rounded to a tenth
+    cache: pathlib.Path, optional
+        directory of stored tables, None to not store
+
+    Returns
+    -------
+    mag: xarray.Dataset
+        "mlat", "mlon", "mz_angle" (y, x) float32 NaN outside the FOV, attributes Baz, Bel, Bepoch
+    """
+    import xarray
+
+    if epoch is None:
+        epoch = _year(cal.attrs.get("caltime"))
+    epoch = round(float(epoch), 1)
+
+    g = camera(cal)
+    key = (g, float(alt_m), epoch)
+    if key in _lut_cache:
+        return _lut_cache[key]
+
+    fn = None
+    if cache is not None and cal.attrs.get("calfilename"):
+        ny, nx = g.enu.shape[:2]
+        fn = Path(cache).expanduser() / (
+            f"{Path(cal.calfilename).stem}_{ny}x{nx}_mag_{alt_m / 1e3:g}km_{epoch:.1f}.nc"
+        )
+
+    mag = None
+    if fn is not None and fn.is_file():
+        with xarray.open_dataset(fn) as d:
+            if np.allclose([d.lat, d.lon, d.alt_m], [g.lat, g.lon, g.alt_m]):
+                mag = d.load()
+                # tables stored before the themisasi.fov convention have Baz opposite
+                mag.attrs["Baz"], mag.attrs["Bel"] = zenith(g.lat, g.lon, g.alt_m, epoch)
+
+    if mag is None:
+        mag = _compute(g, alt_m, epoch)
+        if fn is not None:
+            try:
+                fn.parent.mkdir(parents=True, exist_ok=True)
+                mag.to_netcdf(fn)
+            except OSError as e:
+                logging.warning(f"could not write magnetic coordinates {fn}: {e}")
+
+    if len(_lut_cache) >= LUT_CACHE_SIZE:
+        _lut_cache.pop(next(iter(_lut_cache)))
+    _lut_cache[key] = mag
+
+    return mag
+
+
+def assign(dat: xarray.Dataset, alt_m: float = 110e3, epoch: float | None = None, **kwargs):
+    """
+    add per-pixel magnetic coordinates and magnetic zenith to data or calibration, see lookup()
+
+    Returns
+    -------
+    dat: xarray.Dataset
+        with "mlat", "mlon", "mz_angle" variables and Baz, Bel, Bepoch attributes
+    """
+    mag = lookup(dat, alt_m, epoch, **kwargs)
+
+    out = dat.assign({k: (("y", "x"), mag[k].values) for k in ("mlat", "mlon", "mz_angle")})
+    out.attrs.update({k: mag.attrs[k] for k in ("Baz", "Bel", "Bepoch")})
+    out.attrs["mag_alt_m"] = alt_m
+
+    return out
+
+
+def keogram(
+    dat: xarray.Dataset, width: float = 0.5, step: float = 0.25, reduce: str = "mean"
+) -> xarray.DataArray:
+    """
+    magnetic meridian keogram of the site
+
+    Parameters
+    ----------
+    dat: xarray.Dataset
+        images with magnetic coordinates from assign()
+    width: float
+        half width (degrees of magnetic longitude) of the meridian
+    step: float
+        magnetic latitude bin (degrees)
+    reduce: str
+        "mean" or "max" of the pixels in each bin
+
+    Returns
+    -------
+    keo: xarray.DataArray
+        (time, mlat) brightness, NaN for bins without pixels
+    """
+    import xarray
+
+    mlat = dat["mlat"].values
+    mlon = dat["mlon"].values
+    # magnetic meridian: magnetic longitude of the pixel closest to zenith
+    zen = np.unravel_index(np.nanargmax(camera(dat).enu[..., 2]), mlon.shape)
+    dlon = (mlon - mlon[zen] + 180) % 360 - 180
+    rows, cols = np.nonzero(abs(dlon) <= width)
+
+    edges = np.arange(
+        np.floor(np.nanmin(mlat[rows, cols])), np.nanmax(mlat[rows, cols]) + step, step
+    )
+    k = np.digitize(mlat[rows, cols], edges) - 1
+    order = np.argsort(k, kind="stable")
+    bins, starts = np.unique(k[order], return_index=True)
+    rows, cols = rows[order], cols[order]
+
+    x = dat["imgs"].values[:, rows, cols].astype(np.float32)
+    keo = np.full((x.shape[0], edges.size - 1), np.nan, dtype=np.float32)
+    if reduce == "max":
+        keo[:, bins] = np.maximum.reduceat(x, starts, axis=1)
+    elif reduce == "mean":
+        keo[:, bins] = np.add.reduceat(x, starts, axis=1) / np.diff(np.append(starts, x.shape[1]))
+    else:
+        raise ValueError(f"unknown reduce {reduce}")
+
+    return xarray.DataArray(
+        keo,
+        coords={"time": dat.time.values, "mlat": edges[:-1] + step / 2},
+        dims=("time", "mlat"),
+        attrs={"site": dat.attrs.get("site"), "mlon": float(mlon[zen])},
+    )
+
+
+def _compute(g, alt_m: float, epoch: float) -> xarray.Dataset:
+    """magnetic coordinates of every pixel of a camera geometry"""
+    import xarray
+
+    Baz, Bel = zenith(g.lat, g.lon, g.alt_m, epoch)
+    # upward field line, opposite the declination
+    az = np.radians(Baz + 180)
+    mz = np.array(
+        [
+            np.cos(np.radians(Bel)) * np.sin(az),
+            np.cos(np.radians(Bel)) * np.cos(az),
+            np.sin(np.radians(Bel)),
+        ]
+    )
+    mz_angle = np.degrees(np.arccos(np.clip(g.enu @ mz.astype(g.enu.dtype), -1, 1)))
+
+    mlat, mlon = dipole(g.intersect(alt_m), epoch)
+
+    dims = ("y", "x")
+    return xarray.Dataset(
+        {
+            "mlat": (dims, mlat.astype(np.float32)),
+            "mlon": (dims, mlon.astype(np.float32)),
+            "mz_angle": (dims, mz_angle.astype(np.float32)),
+        },
+        attrs={
+            "Baz": Baz,
+            "Bel": Bel,
+            "Bepoch": epoch,
+            "alt_m_proj": alt_m,
+            "lat": g.lat,
+            "lon": g.lon,
+            "alt_m": g.alt_m,
+        },
+    )
+
+
+def _spherical(r, theta, phi, g, h) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """radial, colatitude, longitude field components (nT) of a spherical harmonic model"""
+    N = g.shape[0] - 1
+    st, ct = np.sin(theta), np.cos(theta)
+    # Schmidt semi-normalized associated Legendre functions and theta derivatives, by recursion
+    P = {(0, 0): np.ones_like(theta)}
+    dP = {(0, 0): np.zeros_like(theta)}
+    for n in range(1, N + 1):
+        for m in range(n + 1):
+            if n == m:
+                s = np.sqrt(1 - 1 / (2 * n)) if n > 1 else 1.0
+                P[n, m] = s * st * P[n - 1, m - 1]
+                dP[n, m] = s * (st * dP[n - 1, m - 1] + ct * P[n - 1, m - 1])
+            else:
+                a = (2 * n - 1) / np.sqrt(n * n - m * m)
+                b = np.sqrt(((n - 1) ** 2 - m * m) / (n * n - m * m))
+                P[n, m] = a * ct * P[n - 1, m] - (b * P[n - 2, m] if n - 2 >= m else 0)
+                dP[n, m] = a * (ct * dP[n - 1, m] - st * P[n - 1, m]) - (
+                    b * dP[n - 2, m] if n - 2 >= m else 0
+                )
+
+    Br = np.zeros_like(r)
+    Bt = np.zeros_like(r)
+    Bp = np.zeros_like(r)
+    for n in range(1, N + 1):
+        f = (RE_KM / r) ** (n + 2)
+        for m in range(n + 1):
+            c, s = np.cos(m * phi), np.sin(m * phi)
+            gh = g[n, m] * c + h[n, m] * s
+            Br += (n + 1) * f * gh * P[n, m]
+            Bt -= f * gh * dP[n, m]
+            Bp -= f * m * (-g[n, m] * s + h[n, m] * c) * P[n, m]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        Bp = np.where(st > 0, Bp / st, 0.0)
+
+    return Br, Bt, Bp
+
+
+def _year(t) -> float:
+    """decimal year of a time"""
+    if t is None or str(t) == "None":
+        raise ValueError("calibration time unknown, specify epoch")
+    t = np.datetime64(str(t), "s").astype(datetime)
+    start = datetime(t.year, 1, 1)
+
+    return (
+        t.year + (t - start).total_seconds() / (datetime(t.year + 1, 1, 1) - start).total_seconds()
+    )
@@ -0,0 +1,270 @@
+"""
+motion fields of image sequences by FFT phase correlation over tiles, e.g. arc drift and pulsating aurora
+
+Each frame is cut into tiles, and the displacement of each tile between consecutive frames
+is the peak of the phase correlation, refined to subpixel by a parabola.
+Frames are streamed in batches: the tiles of a batch are gathered into preallocated buffers,
+each frame is transformed once and paired with both its neighbors,
+and all tiles of the batch share one FFT size, so the FFT plan is reused throughout a night.
+
+    flow = themisasi.motion.motion(themisasi.io.iterload(fn), cal=cal, alt_m=110e3)
+    flow["ve"], flow["vn"]  # (time, tile) meters / second east, north at 110 km altitude
+
+Without a projection altitude, velocities are in pixels / second.
+"""
+
+from __future__ import annotations
+import collections.abc
+import typing
+
+import numpy as np
+import numpy.typing as npt
+import scipy.fft
+
+from .geometry import camera
+from .io import _downsample
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+TILE = 32  # pixels, tile size, an FFT-friendly size
+MAX_DT = 10.0  # seconds, frame pairs further apart are not correlated
+
+
+def motion(
+    batches: collections.abc.Iterable[xarray.DataArray],
+    tile: int = TILE,
+    step: int | None = None,
+    cal: xarray.Dataset | None = None,
+    alt_m: float | None = None,
+    max_dt: float = MAX_DT,
+    workers: int | None = None,
+) -> xarray.Dataset:
+    """
+    motion field of consecutive frames
+
+    Parameters
+    ----------
+    batches: iterable of xarray.DataArray
+        (time, y, x) batches of frames in time order, e.g. from themisasi.io.iterload()
+    tile: int
+        tile size (pixels). Displacements up to tile / 2 pixels per frame are measured.
+    step: int, optional
+        spacing of tiles (pixels), by default tile i.e. no overlap
+    cal: xarray.Dataset, optional
+        calibration: only tiles mostly within the FOV are used
+    alt_m: float, optional
+        projection altitude (meters) of geographic velocity, needs cal
+    max_dt: float
+        maximum time (seconds) between paired frames, e.g. skips data gaps
+    workers: int, optional
+        FFT threads
+
+    Returns
+    -------
+    flow: xarray.Dataset
+        * vy, vx: (time, tile) velocity (pixels / second) at the time of the second frame of each pair
+        * peak: (time, tile) phase correlation peak, near 1 for a clean shift, near 0 for noise
+        * ve, vn: (time, tile) east, north velocity (meters / second) at alt_m, if given
+        * row, col: (tile,) tile center pixel, and lat, lon at alt_m if given
+    """
+    import xarray
+
+    geocal = None
+    if alt_m is not None:
+        if cal is None:
+            raise ValueError("geographic velocity needs a calibration")
+        geocal = cal
+    step = tile if step is None else step
+
+    window = np.outer(np.hanning(tile), np.hanning(tile)).astype(np.float32)
+
+    times = []
+    out: dict[str, list] = {"vy": [], "vx": [], "peak": []}
+    prev = None  # (time, spectrum) of the last frame of the previous batch
+    idx: npt.NDArray[np.intp] | None = None  # flat pixel index of each tile
+
+    for imgs in batches:
+        if idx is None:
+            shape = imgs.shape[1:]
+            r0, c0 = tiles(shape, tile, step, cal)
+            # (ntile, tile, tile)
+            ij = np.arange(tile, dtype=np.intp)
+            idx = ((r0[:, None, None] + ij[:, None]) * shape[1] + (c0[:, None, None] + ij)).astype(
+                np.intp
+            )
+            raw = np.empty((0, r0.size, tile, tile), dtype=imgs.dtype)
+            buf = np.empty((0, r0.size, tile, tile), dtype=np.float32)
+
+        n = imgs.shape[0]
+        if raw.shape[0] < n:
+            raw = np.empty((n, *raw.shape[1:]), dtype=raw.dtype)
+            buf = np.empty((n, *buf.shape[1:]), dtype=buf.dtype)
+
+        np.take(imgs.values.reshape(n, -1), idx, axis=1, out=raw[:n])
+        x = buf[:n]
+        np.copyto(x, raw[:n], casting="unsafe")
+        x -= x.mean(axis=(-2, -1), keepdims=True)
+        x *= window
+
+        F = scipy.fft.rfft2(x, workers=workers)
+        t = imgs.time.values
+
+        if prev is not None:
+            F = np.concatenate((prev[1][None], F))
+            t = np.concatenate(([prev[0]], t))
+        prev = (t[-1], F[-1])
+
+        if t.size < 2:
+            continue
+
+        dy, dx, peak = correlate(F[:-1], F[1:], tile, workers)
+        dt = np.diff(t) / np.timedelta64(1, "s")
+        bad = (dt <= 0) | (dt > max_dt)
+        dt = np.where(bad, np.nan, dt)[:, None]
+
+        times.append(t[1:])
+        out["vy"].append((dy / dt).astype(np.float32))
+        out["vx"].append((dx / dt).astype(np.float32))
+        out["peak"].append(np.where(bad[:, None], np.nan, peak).astype(np.float32))
+
+    if idx is None:
+        raise ValueError("no images for motion")
+
+    dims = ("time", "tile")
+    flow = xarray.Dataset(
+        {
+            k: (dims, np.concatenate(v) if v else np.empty((0, r0.size), np.float32))
+            for k, v in out.items()
+        },
+        coords={
+            "time": np.concatenate(times) if times else np.array([], dtype="datetime64[ns]"),
+            "row": ("tile", r0 + tile / 2),
+            "col": ("tile", c0 + tile / 2),
+        },
+        attrs={"site": imgs.attrs.get("site"), "tile": tile, "step": step},
+    )
+
+    if alt_m is not None and geocal is not None:
+        _geographic(flow, _downsample(geocal, shape), alt_m, r0 + tile // 2, c0 + tile // 2)
+
+    return flow
+
+
+def tiles(
+    shape: collections.abc.Sequence[int], tile: int, step: int, cal: xarray.Dataset | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    upper left pixel of each tile
+
+    Parameters
+    ----------
+    shape: sequence of int
+        (y, x) image shape
+    tile: int
+        tile size (pixels)
+    step: int
+        spacing of tiles (pixels)
+    cal: xarray.Dataset, optional
+        calibration: only tiles at least half within the FOV
+
+    Returns
+    -------
+    r0, c0: numpy.ndarray
+        (tile,) row, column of upper left pixel
+    """
+    r0, c0 = np.meshgrid(
+        np.arange(0, shape[0] - tile + 1, step),
+        np.arange(0, shape[1] - tile + 1, step),
+        indexing="ij",
+    )
+    r0 = r0.ravel()
+    c0 = c0.ravel()
+
+    if cal is not None:
+        valid = _downsample(cal, shape)["valid"].values
+        # fraction of each tile within the FOV, by summed area table
+        s = np.pad(valid.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        n = s[r0 + tile, c0 + tile] - s[r0, c0 + tile] - s[r0 + tile, c0] + s[r0, c0]
+        good = n >= tile * tile / 2
+        r0 = r0[good]
+        c0 = c0[good]
+
+    if r0.size == 0:
+        raise ValueError(f"no {tile} pixel tiles in {shape} image")
+
+    return r0, c0
+
+
+def correlate(
+    Fa: np.ndarray, Fb: np.ndarray, tile: int, workers: int | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    displacement from a to b of each tile by phase correlation
+
+    Parameters
+    ----------
+    Fa, Fb: numpy.ndarray
+        (..., tile, tile // 2 + 1) real FFT of windowed tiles
+    tile: int
+        tile size (pixels)
+    workers: int, optional
+        FFT threads
+
+    Returns
+    -------
+    dy, dx: numpy.ndarray
+        (...) displacement (pixels), subpixel
+    peak: numpy.ndarray
+        (...) height of the phase correlation peak
+    """
+    R = Fb * Fa.conj()
+    R /= np.maximum(abs(R), np.finfo(np.float32).tiny)
+    r = scipy.fft.irfft2(R, s=(tile, tile), workers=workers)
+
+    flat = r.reshape(*r.shape[:-2], -1)
+    k = flat.argmax(axis=-1)
+    ky, kx = np.divmod(k, tile)
+    peak = np.take_along_axis(flat, k[..., None], axis=-1)[..., 0]
+
+    def at(dy, dx):
+        return np.take_along_axis(
+            flat, (((ky + dy) % tile) * tile + (kx + dx) % tile)[..., None], axis=-1
+        )[..., 0]
+
+    dy = ky + _vertex(at(-1, 0), peak, at(1, 0))
+    dx = kx + _vertex(at(0, -1), peak, at(0, 1))
+    # circular shifts past half a tile are negative
+    dy = np.where(dy > tile / 2, dy - tile, dy)
+    dx = np.where(dx > tile / 2, dx - tile, dx)
+
+    return dy, dx, peak
+
+
+def _vertex(y0, y1, y2):
+    """subpixel offset of a peak from a parabola through three samples"""
+    d = y0 - 2 * y1 + y2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        off = 0.5 * (y0 - y2) / d
+
+    return np.where((d < 0) & (abs(off) <= 1), off, 0)
+
+
+def _geographic(flow: xarray.Dataset, cal: xarray.Dataset, alt_m: float, rows, cols):
+    """east, north velocity at alt_m from the local Jacobian of pixel ground coordinates"""
+    g = camera(cal)
+    enu = (g.intersect(alt_m) - g.origin) @ g.rotation
+
+    dedy, dedx = np.gradient(enu[..., 0])
+    dndy, dndx = np.gradient(enu[..., 1])
+    J = [a[rows, cols] for a in (dedy, dedx, dndy, dndx)]
+
+    vy = flow["vy"].values
+    vx = flow["vx"].values
+    flow["ve"] = ("time", "tile"), (J[0] * vy + J[1] * vx).astype(np.float32)
+    flow["vn"] = ("time", "tile"), (J[2] * vy + J[3] * vx).astype(np.float32)
+
+    lat, lon, _ = g.geodetic(alt_m, (rows, cols))
+    flow.coords["lat"] = "tile", lat
+    flow.coords["lon"] = "tile", lon
+    flow.attrs["alt_m"] = alt_m
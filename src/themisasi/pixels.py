@@ -1,10 +1,4 @@
 from argparse import ArgumentParser
-import numpy as np
-
-from .io import load
-from .fov import getimgind, projected_coord
-from .plots import plotazel, plottimeseries
-from matplotlib.pyplot import show
 
 """
 Plot time series for pixel(s) chosen by az/el
@@ -37,6 +31,12 @@ def cli():
     p.add_argument("-v", "--verbose", action="store_true")
     P = p.parse_args()
 
+    import numpy as np
+    from matplotlib.pyplot import show
+    from .io import load
+    from .fov import getimgind, projected_coord
+    from .plots import plotazel, plottimeseries
+
     imgs = load(P.path, site=P.site, treq=P.treq)
 
     if P.verbose:
@@ -1,10 +1,16 @@
 from pathlib import Path
+import logging
+import queue
+import threading
+import time
 import xarray
 import numpy as np
 from datetime import datetime
-from matplotlib.pyplot import figure, draw, pause
+from matplotlib.pyplot import figure, draw, pause, show
 from matplotlib.colors import LogNorm
 
+from .io import azel
+
 
 def jointazel(cam: xarray.Dataset, ofn: Path | None = None, ttxt: str = ""):
 
@@ -46,13 +52,15 @@ def plotazel(data: xarray.Dataset, ttxt: str = ""):
 
     fg.suptitle(ttxt)
 
-    c = ax[0].contour(data["az"].x, data["az"].y, data["az"])
+    az, el = azel(data)
+
+    c = ax[0].contour(data["az"].x, data["az"].y, az)
     ax[0].clabel(c, fmt="%0.1f")
     ax[0].set_title("azimuth")
     ax[0].set_xlabel("x-pixels")
     ax[0].set_ylabel("y-pixels")
 
-    c = ax[1].contour(data["el"].x, data["el"].y, data["el"])
+    c = ax[1].contour(data["el"].x, data["el"].y, el)
     ax[1].clabel(c, fmt="%0.1f")
     ax[1].set_title("elevation")
     ax[1].set_xlabel("x-pixels")
@@ -94,10 +102,20 @@ def overlayrowcol(ax, rows, cols, color: str | None = None, label: str | None =
 # %%
 
 
-def plotasi(data: xarray.Dataset, ofn: Path | None = None):
+def plotasi(
+    data: xarray.Dataset,
+    ofn: Path | None = None,
+    fps: float | None = None,
+    batches=None,
+):
     """
     rows,cols expect lines to be along rows Nlines x len(line)
     list of 1-D arrays or 2-D array
+
+    If "fps" is given, play back in fast mode: only the image and timestamp are redrawn (blitting),
+    aiming for "fps" frames per second.
+    If "batches" of images are given e.g. themisasi.io.iterload(), fast mode plays them
+    instead of data["imgs"], read from disk ahead of display by a background thread.
     """
 
     if data["imgs"].shape[0] == 0:
@@ -127,6 +145,19 @@ def plotasi(data: xarray.Dataset, ofn: Path | None = None):
     if "imgs2" in data:
         overlayrowcol(ax, data.rows, data.cols)
     # %% play video
+    if fps and not ofn:
+        hts = ax.text(0.02, 0.97, "", transform=ax.transAxes, color="g", va="top")
+
+        def update(frame):
+            hi.set_data(frame[1])
+            hts.set_text(frame[0])
+
+        if batches is None:
+            play(fg, (hi, hts), update, _frames([data["imgs"]]), fps, prefetch=0)
+        else:
+            play(fg, (hi, hts), update, _frames(batches), fps)
+        return
+
     try:
         for im in data["imgs"]:
             ts = str(im.time.astype("datetime64[us]").astype(datetime))
@@ -142,36 +173,174 @@ def plotasi(data: xarray.Dataset, ofn: Path | None = None):
         return
 
 
-def pcolormesh_nan(x, y, c, cmap=None, axis=None):
-    """handles NaN in x and y by smearing last valid value in column or row out,
-    which doesn't affect plot because "c" will be masked too
+def play(fg, artists, update, frames, fps: float, prefetch: int = 8) -> float:
+    """
+    fast playback by blitting: the static figure is rendered once,
+    then only "artists" are redrawn for each frame.
+
+    Parameters
+    ----------
+    fg: matplotlib.figure.Figure
+        figure to animate
+    artists: sequence of matplotlib.artist.Artist
+        artists changed by "update" e.g. the image and timestamp text
+    update: callable
+        update(frame) modifies artists for each frame
+    frames: iterable
+        frames to play
+    fps: float
+        target frames per second
+    prefetch: int
+        number of frames read ahead by a background thread, e.g. from disk.
+        0 for frames already in memory.
+
+    Returns
+    -------
+    achieved: float
+        achieved frames per second
     """
 
+    for a in artists:
+        a.set_animated(True)
+
+    canvas = fg.canvas
+    show(block=False)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fg.bbox)
+
+    period = 1.0 / fps
+    N = 0
+    tic = tnext = time.perf_counter()
+    try:
+        for frame in _prefetch(frames, prefetch) if prefetch else frames:
+            update(frame)
+            canvas.restore_region(background)
+            for a in artists:
+                fg.draw_artist(a)
+            canvas.blit(fg.bbox)
+            canvas.flush_events()
+            N += 1
+
+            tnext += period
+            delay = tnext - time.perf_counter()
+            if delay > 0:
+                canvas.start_event_loop(delay)
+    except KeyboardInterrupt:
+        pass
+
+    achieved = N / (time.perf_counter() - tic)
+    logging.info(f"played {N} frames at {achieved:.1f} fps, target {fps} fps")
+
+    return achieved
+
+
+def _prefetch(frames, depth: int = 8):
+    """yields items of "frames" read ahead of the consumer by a background thread"""
+
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+    errors: list[BaseException] = []
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for item in frames:
+                if not _put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(done)
+
+    threading.Thread(target=reader, daemon=True).start()
+
+    try:
+        while (item := q.get()) is not done:
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+
+
+def _frames(batches):
+    """(timestamp, image) of each frame of batches of images"""
+    for imgs in batches:
+        yield from zip(_timestamps(imgs.time), imgs.values)
+
+
+def _timestamps(time) -> list[str]:
+    """human-readable timestamps of a time coordinate"""
+    return [str(t) for t in time.values.astype("datetime64[us]").astype(datetime)]
+
+
+def fill_nan_coords(x, y) -> tuple:
+    """smears the nearest valid coordinate into NaN regions, first along rows, then along columns
+
+    Parameters
+    ----------
+    x, y: numpy.ndarray
+        2-D coordinate grids that may contain NaN e.g. outside the FOV
+
+    Returns
+    -------
+    x, y: numpy.ndarray
+        copies of the coordinate grids with every NaN replaced
+    mask: numpy.ndarray of bool
+        True where the original coordinates were valid
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
     mask = np.isfinite(x) & np.isfinite(y)
-    top = None
-    bottom = None
 
-    for i, m in enumerate(mask):
-        good = m.nonzero()[0]
+    if not mask.any():
+        raise ValueError("no valid coordinates to plot")
 
-        if good.size == 0:
-            continue
-        elif top is None:
-            top = i
-        else:
-            bottom = i
+    cols = _fill_index(mask, axis=1)
+    rows = np.arange(mask.shape[0])[:, None]
+    x = x[rows, cols]
+    y = y[rows, cols]
+    # rows without any valid pixel take the nearest valid row
+    rows = _fill_index(mask.any(axis=1), axis=0)
+
+    return x[rows, :], y[rows, :], mask
+
+
+def _fill_index(mask, axis: int):
+    """index of the nearest preceding valid element, or the first valid element for leading gaps"""
+
+    n = mask.shape[axis]
+    shape = [1] * mask.ndim
+    shape[axis] = n
+    i = np.arange(n).reshape(shape)
 
-        x[i, good[-1] :] = x[i, good[-1]]
-        y[i, good[-1] :] = y[i, good[-1]]
+    fwd = np.maximum.accumulate(np.where(mask, i, -1), axis=axis)
+    back = np.flip(
+        np.minimum.accumulate(np.flip(np.where(mask, i, n), axis=axis), axis=axis), axis=axis
+    )
 
-        x[i, : good[0]] = x[i, good[0]]
-        y[i, : good[0]] = y[i, good[0]]
+    # fully invalid lines are left pointing at themselves
+    return np.where(fwd >= 0, fwd, np.where(back < n, back, i))
 
-    x[:top, :] = np.nanmean(x[top, :])
-    y[:top, :] = np.nanmean(y[top, :])
 
-    x[bottom:, :] = np.nanmean(x[bottom, :])
-    y[bottom:, :] = np.nanmean(y[bottom, :])
+def pcolormesh_nan(x, y, c, cmap=None, axis=None, mask=None):
+    """handles NaN in x and y by smearing last valid value in column or row out,
+    which doesn't affect plot because "c" will be masked too
+
+    If "mask" is given, x and y are assumed already filled by fill_nan_coords()
+    """
+
+    if mask is None:
+        x, y, mask = fill_nan_coords(x, y)
 
     if axis is None:
         axis = figure().gca()
@@ -6,7 +6,12 @@ import numpy as np
 from matplotlib.pyplot import figure, draw, pause
 
 import pymap3d as pm
-from .plots import pcolormesh_nan, overlayrowcol
+from .celestial import radec
+from .io import azel
+from .plots import pcolormesh_nan, overlayrowcol, fill_nan_coords, play, _frames
+
+GRID_CACHE_SIZE = 16  # number of projected coordinate grids kept in memory
+_grid_cache: dict[tuple, tuple] = {}
 
 
 def asi_projection(
@@ -14,6 +19,8 @@ def asi_projection(
     projalt_m: float | None = None,
     min_el: float = 10.0,
     ofn: Path | None = None,
+    fps: float | None = None,
+    batches=None,
 ):
     """
     plots ASI projected to altitude
@@ -22,6 +29,8 @@ def asi_projection(
     * projalt_m: projection altitude in meters
     * min_el: minimum elevation angle (degrees). Data near the horizon is poorly calibrated (large angular error).
     * ofn: filename to write of plot (optional)
+    * fps: target frames/second for fast blitting playback (optional)
+    * batches: images to play in fast mode instead of dat["imgs"], e.g. themisasi.io.iterload() (optional)
     """
     if projalt_m is None:
         logging.error("projection altitude must be specified")
@@ -34,23 +43,14 @@ def asi_projection(
         ofn = Path(ofn).expanduser()
         odir = ofn.parent
 
-    # %% censor pixels near the horizon with large calibration error do to poor skymap fits
-    badpix = dat["el"] < min_el
-    az = dat["az"].values
-    el = dat["el"].values
-    az[badpix] = np.nan
-    el[badpix] = np.nan
-    # %% coordinate transformation, let us know if error occurs
-    slant_range = projalt_m / np.sin(np.radians(el))
-
-    lat, lon, alt = pm.aer2geodetic(
-        az, el, slant_range, dat.lat.item(), dat.lon.item(), dat.alt_m.item()
-    )
+    lon, lat, mask = projected_grid(dat, projalt_m, min_el)
     # %% plots
     fg = figure()
     ax = fg.gca()
 
-    hi = pcolormesh_nan(lon, lat, dat["imgs"].data[0], cmap="gray", axis=ax)  # priming
+    hi = pcolormesh_nan(
+        lon, lat, dat["imgs"].data[0], cmap="gray", axis=ax, mask=mask
+    )  # priming
 
     ttxt = f"Themis ASI {dat.site}  projected to altitude {projalt_m / 1e3} km\n"
     # FOV vs. HST0,HST1: green,red '
@@ -63,6 +63,19 @@ def asi_projection(
     if "imgs2" in dat:
         overlayrowcol(ax, dat.rows, dat.cols)
     # %% play video
+    if fps and not ofn:
+        hts = ax.text(0.02, 0.97, "", transform=ax.transAxes, color="g", va="top")
+
+        def update(frame):
+            hi.set_array(np.ma.masked_where(~mask, frame[1]))
+            hts.set_text(frame[0])
+
+        if batches is None:
+            play(fg, (hi, hts), update, _frames([dat["imgs"]]), fps, prefetch=0)
+        else:
+            play(fg, (hi, hts), update, _frames(batches), fps)
+        return
+
     try:
         for im in dat["imgs"]:
             ts = im.time.values.astype(str)[:-6]
@@ -78,9 +91,71 @@ def asi_projection(
         return
 
 
+def projected_grid(dat: xarray.Dataset, projalt_m: float, min_el: float = 10.0) -> tuple:
+    """
+    longitude, latitude of each pixel projected to altitude, with NaN regions filled for plotting.
+
+    The filled grids are cached per calibration, camera position and projection altitude,
+    so repeated projections of the same camera skip the coordinate transformation and fill.
+    The cached grids are shared between callers and so are read-only.
+
+    Parameters
+    ----------
+    dat: xarray.Dataset
+        calibration az, el and camera lat, lon, alt_m
+    projalt_m: float
+        projection altitude in meters
+    min_el: float
+        minimum elevation angle (degrees)
+
+    Returns
+    -------
+    lon, lat: numpy.ndarray
+        filled projected coordinates
+    mask: numpy.ndarray of bool
+        True for pixels with valid projection
+    """
+    lat0 = np.asarray(dat.lat).item()
+    lon0 = np.asarray(dat.lon).item()
+    alt0 = np.asarray(dat.alt_m).item()
+
+    key = (
+        dat.attrs.get("calfilename"),
+        str(dat.attrs.get("caltime")),
+        dat["az"].shape,
+        lat0,
+        lon0,
+        alt0,
+        float(projalt_m),
+        float(min_el),
+    )
+    if key in _grid_cache:
+        return _grid_cache[key]
+    # %% censor pixels near the horizon with large calibration error do to poor skymap fits
+    az, el = azel(dat)
+    good = el >= min_el
+    az = np.where(good, az, np.nan)
+    el = np.where(good, el, np.nan)
+    # %% coordinate transformation, let us know if error occurs
+    slant_range = projalt_m / np.sin(np.radians(el))
+
+    lat, lon, alt = pm.aer2geodetic(az, el, slant_range, lat0, lon0, alt0)
+
+    grid = fill_nan_coords(lon, lat)
+    for a in grid:
+        a.setflags(write=False)
+
+    if len(_grid_cache) >= GRID_CACHE_SIZE:
+        _grid_cache.pop(next(iter(_grid_cache)))
+    _grid_cache[key] = grid
+
+    return grid
+
+
 def asi_radec(dat: xarray.Dataset, min_el: float = 10.0, ofn: Path | None = None):
     """
-    plots ASI projected to altitude
+    plots first ASI image in right ascension, declination.
+    For RA/Dec of every frame, see themisasi.celestial.radec()
 
     * min_el: minimum elevation angle (degrees). Data near the horizon is poorly calibrated (large angular error).
     * ofn: filename to write of plot (optional)
@@ -92,16 +167,10 @@ def asi_radec(dat: xarray.Dataset, min_el: float = 10.0, ofn: Path | None = None
     if ofn:
         ofn = Path(ofn).expanduser()
 
-    az = dat.az.values
-    el = dat.el.values
-    az.setflags(write=True)
-    el.setflags(write=True)
-
-    bad = el < min_el  # low to horizon, calibration is very bad
-    az[bad] = np.nan
-    el[bad] = np.nan
-
-    ra, dec = pm.azel2radec(az, el, dat.lat, dat.lon, dat.time)
+    # pixels low to horizon are censored, calibration is very bad
+    rd = radec(dat.isel(time=[0]), min_el)
+    ra = rd["ra"].values[0]
+    dec = rd["dec"].values
 
     fg = figure()
     ax = fg.gca()
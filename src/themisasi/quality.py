@@ -0,0 +1,249 @@
+"""
+frame quality screening
+
+Per-frame statistics over the FOV are computed in batches as frames are read,
+and stored in a sidecar table next to each hourly data file.
+Thresholds are applied to the stored statistics at load time,
+so trying different thresholds does not re-read the images.
+
+    dat = themisasi.load(fn, quality=True)
+    dat = themisasi.load(fn, quality={"max_mean": 5000})
+"""
+
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import xarray
+
+from .io import iterload, loadcal, azel
+
+SATURATION = 65535  # data numbers
+MIN_EL = 10.0  # degrees, FOV mask from calibration
+
+THRESHOLDS: dict[str, float | None] = {
+    "max_saturated": 0.01,  # fraction of FOV saturated e.g. moon, twilight
+    "max_mean": None,  # mean brightness of FOV e.g. moonlight
+    "min_contrast": None,  # 99th - 50th percentile, clouds wash out stars and aurora
+    "max_change": None,  # mean absolute change from previous frame / mean
+}
+
+FLAGS = {"dropout": 1, "saturated": 2, "bright": 4, "lowcontrast": 8, "jump": 16}
+
+
+def frame_stats(imgs, mask=None, prev=None, saturation: float = SATURATION) -> dict:
+    """
+    per-frame statistics of a batch of images
+
+    Parameters
+    ----------
+    imgs: numpy.ndarray
+        (time, y, x) images
+    mask: numpy.ndarray of bool, optional
+        (y, x) pixels to use e.g. FOV
+    prev: numpy.ndarray, optional
+        (y, x) frame before this batch, for frame-to-frame change across batches
+    saturation: float
+        data number at which a pixel is saturated
+
+    Returns
+    -------
+    stats: dict of numpy.ndarray
+        (time,) mean, std, p01, p50, p99, saturated fraction, change from previous frame
+    """
+    imgs = np.asarray(imgs)
+    if mask is None:
+        mask = np.ones(imgs.shape[1:], dtype=bool)
+
+    x = imgs[:, mask].astype(np.float32)
+
+    mean = x.mean(axis=1)
+    p01, p50, p99 = np.percentile(x, [1, 50, 99], axis=1)
+
+    change = np.full(mean.size, np.nan, dtype=np.float32)
+    if prev is not None:
+        x = np.concatenate((np.asarray(prev)[mask][None, :].astype(np.float32), x))
+        change[:] = abs(np.diff(x, axis=0)).mean(axis=1) / np.maximum(mean, 1)
+    elif mean.size > 1:
+        change[1:] = abs(np.diff(x, axis=0)).mean(axis=1) / np.maximum(mean[1:], 1)
+
+    return {
+        "mean": mean,
+        "std": x[-mean.size :].std(axis=1),
+        "p01": p01,
+        "p50": p50,
+        "p99": p99,
+        "saturated": (x[-mean.size :] >= saturation).mean(axis=1),
+        "change": change,
+    }
+
+
+def screen(
+    fn: Path,
+    cal: xarray.Dataset | None = None,
+    batch: int = 64,
+    saturation: float = SATURATION,
+    write: bool = True,
+) -> xarray.Dataset:
+    """
+    compute per-frame statistics of a data file, streaming in batches of records
+
+    Parameters
+    ----------
+    fn: pathlib.Path
+        THEMIS ASI data file
+    cal: xarray.Dataset, optional
+        calibration for the FOV mask. If not given, the calibration next to the data file is used if found.
+    batch: int
+        number of records read at once
+    saturation: float
+        data number at which a pixel is saturated
+    write: bool
+        write the sidecar table next to the data file
+
+    Returns
+    -------
+    stats: xarray.Dataset
+        per-frame statistics
+    """
+    fn = Path(fn).expanduser()
+
+    stats: dict[str, list] = {}
+    time = []
+    mask = None
+    prev = None
+
+    for imgs in iterload(fn, batch=batch):
+        if mask is None:
+            mask = _fovmask(fn, imgs, cal)
+
+        for k, v in frame_stats(imgs.values, mask, prev, saturation).items():
+            stats.setdefault(k, []).append(v)
+        time.append(imgs.time.values)
+        prev = imgs.values[-1]
+
+    st = os.stat(fn)
+
+    q = xarray.Dataset(
+        {k: ("time", np.concatenate(v)) for k, v in stats.items()},
+        coords={"time": np.concatenate(time)},
+        attrs={
+            "filename": fn.name,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "saturation": saturation,
+            "fovmask": int(mask is not None and not mask.all()),
+        },
+    )
+
+    if write:
+        try:
+            q.to_netcdf(sidecar(fn))
+        except OSError as e:
+            logging.warning(f"could not write quality table for {fn}: {e}")
+
+    return q
+
+
+def sidecar(fn: Path) -> Path:
+    """quality table filename for a data file"""
+    fn = Path(fn).expanduser()
+    return fn.with_name(fn.stem + "_quality.nc")
+
+
+def load_stats(fn: Path) -> xarray.Dataset:
+    """
+    per-frame statistics of a data file, from the sidecar table if current, else computed and stored
+
+    Parameters
+    ----------
+    fn: pathlib.Path
+        THEMIS ASI data file
+
+    Returns
+    -------
+    stats: xarray.Dataset
+        per-frame statistics
+    """
+    fn = Path(fn).expanduser()
+    sfn = sidecar(fn)
+
+    if sfn.is_file():
+        st = os.stat(fn)
+        with xarray.open_dataset(sfn) as q:
+            # data files may be replaced or grow while being written
+            if q.attrs["size"] == st.st_size and q.attrs["mtime"] == st.st_mtime:
+                return q.load()
+
+    return screen(fn)
+
+
+def flags(stats: xarray.Dataset, thresholds: dict[str, float | None] | None = None):
+    """
+    rejection flags of each frame, zero for accepted frames. See FLAGS for bit values.
+
+    Parameters
+    ----------
+    stats: xarray.Dataset
+        per-frame statistics
+    thresholds: dict, optional
+        overrides of THRESHOLDS. None disables a test.
+
+    Returns
+    -------
+    flags: numpy.ndarray of int
+        (time,) bitwise OR of FLAGS
+    """
+    thres = THRESHOLDS | (thresholds or {})
+
+    f = np.zeros(stats.time.size, dtype=np.uint8)
+    # constant frames e.g. all zero are dropouts
+    f[stats["std"].values == 0] |= FLAGS["dropout"]
+
+    if (t := thres["max_saturated"]) is not None:
+        f[stats["saturated"].values > t] |= FLAGS["saturated"]
+    if (t := thres["max_mean"]) is not None:
+        f[stats["mean"].values > t] |= FLAGS["bright"]
+    if (t := thres["min_contrast"]) is not None:
+        f[(stats["p99"] - stats["p50"]).values < t] |= FLAGS["lowcontrast"]
+    if (t := thres["max_change"]) is not None:
+        f[stats["change"].values > t] |= FLAGS["jump"]
+
+    return f
+
+
+def accepted(fn: Path, thresholds: dict[str, float | None] | None = None):
+    """
+    which records of a data file pass quality screening
+
+    Parameters
+    ----------
+    fn: pathlib.Path
+        THEMIS ASI data file
+    thresholds: dict, optional
+        overrides of THRESHOLDS
+
+    Returns
+    -------
+    good: numpy.ndarray of bool
+        (records,) True for accepted records
+    """
+    return flags(load_stats(fn), thresholds) == 0
+
+
+def _fovmask(fn: Path, imgs: xarray.DataArray, cal: xarray.Dataset | None):
+    """pixels above MIN_EL, or all pixels if no calibration is available"""
+    if cal is None:
+        try:
+            cal = loadcal(
+                fn.parent, imgs.site, imgs.time.values[0].astype("datetime64[us]").item()
+            )
+        except (FileNotFoundError, ValueError):
+            return None
+
+    if cal["el"].shape != imgs.shape[1:]:
+        logging.warning(f"{cal.calfilename} shape does not match {fn.name}, not using FOV mask")
+        return None
+
+    return azel(cal)[1] >= MIN_EL
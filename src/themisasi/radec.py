@@ -6,9 +6,6 @@ ThemisRadec ~/data/2012-11-03/ gako 2012-11-03T06:30 ~/data/themis
 
 from argparse import ArgumentParser
 
-from .io import load
-from .projections import asi_radec
-
 
 def cli():
     p = ArgumentParser(
@@ -21,6 +18,9 @@ def cli():
     p.add_argument("-o", "--odir", help="output directory to write plots")
     P = p.parse_args()
 
+    from .io import load
+    from .projections import asi_radec
+
     imgs = load(P.path, site=P.site, treq=P.treq, calfn=P.calpath)
     # %% plot
     asi_radec(imgs, P.odir)
@@ -0,0 +1,186 @@
+"""
+radiometric calibration: data numbers to intensity
+
+The conversion of a site is precomputed once as per-pixel arrays,
+
+    intensity = (DN - dark) * gain
+
+where gain combines the spectral response of the camera (ICX249AL CCD datasheet) and IR cut filter (Jackel 2014)
+at the emission wavelength, the absolute sensitivity if known, and an optional flat-field.
+Batches of frames are then converted in float32 in place, at read speed:
+
+    conv = themisasi.radiometric.conversion(cal, wavelength_nm=557.7, dn_per_rayleigh=2.0)
+    for imgs in themisasi.radiometric.calibrated(themisasi.io.iterload(fn), conv):
+        ...
+
+Without dn_per_rayleigh, intensity is in DN normalized to the response at reference_nm.
+"""
+
+from __future__ import annotations
+import collections.abc
+import importlib.resources
+import typing
+
+import numpy as np
+
+from .io import azel
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+CAMERA_RESPONSE = "icx249al_response.csv"
+FILTER_TRANSMISSION = "ir_filter.csv"
+REFERENCE_NM = 557.7  # O(1S) green line, typical absolute calibration wavelength
+
+
+def response(wavelength_nm) -> np.ndarray:
+    """
+    relative spectral response of camera and filter, bundled with themisasi
+
+    Parameters
+    ----------
+    wavelength_nm: float or numpy.ndarray
+        wavelength (nanometers)
+
+    Returns
+    -------
+    r: numpy.ndarray
+        product of CCD response and filter transmission, 0 outside the tabulated range
+    """
+    wl = np.asarray(wavelength_nm, dtype=float)
+
+    r = np.ones_like(wl)
+    for name in (CAMERA_RESPONSE, FILTER_TRANSMISSION):
+        with (importlib.resources.files(__package__) / name).open("r") as f:
+            tab = np.loadtxt(f, delimiter=",", skiprows=1)
+        r = r * np.interp(wl, tab[:, 0], tab[:, 1], left=0, right=0)
+
+    return r
+
+
+def conversion(
+    cal: xarray.Dataset,
+    wavelength_nm: float | tuple = REFERENCE_NM,
+    dark: float | np.ndarray | str | None = "outside",
+    flat: np.ndarray | None = None,
+    dn_per_rayleigh: float | None = None,
+    reference_nm: float = REFERENCE_NM,
+) -> xarray.Dataset:
+    """
+    precompute the per-pixel conversion of a site from data numbers to intensity
+
+    Parameters
+    ----------
+    cal: xarray.Dataset
+        calibration from themisasi.loadcal() or data with calibration from themisasi.load()
+    wavelength_nm: float or tuple of numpy.ndarray
+        emission line wavelength (nanometers), or (wavelength, spectrum) of a broadband source
+    dark: float, numpy.ndarray, "outside" or None
+        dark/bias level to subtract: fixed (y, x) or scalar level,
+        "outside" for the median of each frame's pixels outside the FOV, or None for no subtraction
+    flat: numpy.ndarray, optional
+        (y, x) relative sensitivity e.g. vignetting, 1 at zenith
+    dn_per_rayleigh: float, optional
+        absolute sensitivity at reference_nm. If not given, intensity is relative.
+    reference_nm: float
+        wavelength (nanometers) of the absolute sensitivity
+
+    Returns
+    -------
+    conv: xarray.Dataset
+        "gain" (y, x) float32, NaN outside the FOV, "offset" (y, x) float32 and "outside" (y, x) bool
+    """
+    import xarray
+
+    valid = np.isfinite(azel(cal)[1])
+
+    if isinstance(wavelength_nm, tuple):
+        wl, spec = (np.asarray(a, dtype=float) for a in wavelength_nm)
+        from scipy.integrate import trapezoid
+
+        rel = trapezoid(spec * response(wl), wl) / trapezoid(spec, wl)
+        wavelength = float(np.average(wl, weights=spec))
+    else:
+        rel = response(wavelength_nm)
+        wavelength = float(wavelength_nm)
+    rel = float(rel / response(reference_nm))
+    if rel <= 0:
+        raise ValueError(f"camera is not sensitive at {wavelength} nm")
+
+    gain = np.full(valid.shape, 1 / rel, dtype=np.float64)
+    if dn_per_rayleigh is not None:
+        gain /= dn_per_rayleigh
+    if flat is not None:
+        gain = gain / np.asarray(flat)
+    gain[~valid] = np.nan
+
+    offset = np.zeros(valid.shape, dtype=np.float32)
+    if dark is not None and not isinstance(dark, str):
+        offset[:] = dark
+    elif isinstance(dark, str) and dark != "outside":
+        raise ValueError(f"unknown dark {dark}")
+    elif dark == "outside" and valid.all():
+        raise ValueError("no pixels outside the FOV to estimate dark level")
+
+    return xarray.Dataset(
+        {
+            "gain": (("y", "x"), gain.astype(np.float32)),
+            "offset": (("y", "x"), offset),
+            "outside": (("y", "x"), ~valid),
+        },
+        attrs={
+            "site": cal.attrs.get("site"),
+            "wavelength_nm": wavelength,
+            "dark": dark if isinstance(dark, str) else ("fixed" if dark is not None else "none"),
+            "units": "R" if dn_per_rayleigh is not None else "relative",
+        },
+    )
+
+
+def apply(imgs, conv: xarray.Dataset, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    convert a batch of frames to intensity, in place in float32
+
+    Parameters
+    ----------
+    imgs: numpy.ndarray or xarray.DataArray
+        (time, y, x) data numbers
+    conv: xarray.Dataset
+        from conversion()
+    out: numpy.ndarray, optional
+        (time, y, x) float32 buffer to reuse across batches. May be imgs itself if float32.
+
+    Returns
+    -------
+    out: numpy.ndarray
+        (time, y, x) float32 intensity
+    """
+    a = np.asarray(imgs)
+    if out is None:
+        out = np.empty(a.shape, dtype=np.float32)
+    if out is not a:
+        np.copyto(out, a, casting="unsafe")
+
+    if conv.attrs["dark"] == "outside":
+        out -= np.median(out[:, conv["outside"].values], axis=1)[:, None, None]
+    elif conv.attrs["dark"] == "fixed":
+        out -= conv["offset"].values
+
+    out *= conv["gain"].values
+
+    return out
+
+
+def calibrated(
+    batches: collections.abc.Iterable[xarray.DataArray], conv: xarray.Dataset
+) -> collections.abc.Iterator[xarray.DataArray]:
+    """
+    convert streaming batches of frames e.g. from themisasi.io.iterload()
+
+    Yields
+    ------
+    imgs: xarray.DataArray
+        (time, y, x) float32 intensity, with "units" attribute
+    """
+    for imgs in batches:
+        yield imgs.copy(data=apply(imgs.values, conv)).assign_attrs(units=conv.attrs["units"])
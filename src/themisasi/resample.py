@@ -0,0 +1,250 @@
+"""
+streaming time resampling of image stacks, e.g. 1-minute averages or max-projections over hours
+
+Records are read in time order across hourly files, a batch at a time,
+and accumulated into preallocated per-bin arrays, so the whole image stack is never in memory.
+Each hourly file is resampled independently (bin widths must divide an hour),
+and the result is stored next to the data file, so a repeated query of the same site, hour and bin width
+does not re-read the images.
+When only part of an hour is requested, only the records of the requested bins are read and the result is not stored.
+
+    dat = themisasi.resample.resample("~/data/themis", "gako", ("2011-01-06T17", "2011-01-06T19"), "1min")
+"""
+
+from __future__ import annotations
+import itertools
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import xarray
+
+from .io import iterload, _datafiles, _timereq
+
+HOUR = np.timedelta64(3600, "s")
+
+
+def resample(
+    path: Path | list[Path],
+    site: str | None = None,
+    treq=None,
+    width: str | np.timedelta64 = "1min",
+    percentiles: tuple[float, ...] = (),
+    batch: int = 64,
+    quality: bool | dict[str, float | None] | None = None,
+    cache: bool = True,
+) -> xarray.Dataset:
+    """
+    per time bin mean, max, frame count and optional percentiles of images
+
+    Parameters
+    ----------
+    path: pathlib.Path or list of pathlib.Path
+        directory where Themis ASI data files are, data file, or list of data files
+    site: str, optional
+        site code e.g. gako.  Only needed if "path" is a directory
+    treq: datetime.datetime or list of datetime.datetime, optional
+        min,max time range, which may span many hourly files. Whole bins overlapping the range are returned.
+    width: str or numpy.timedelta64
+        bin width e.g. "1min", "30s". Must divide an hour.
+    percentiles: tuple of float
+        per-pixel percentiles (0..100) of each bin e.g. (50, 90)
+    batch: int
+        number of records read at once
+    quality: bool or dict, optional
+        skip frames rejected by quality screening. Results with quality screening are not cached.
+    cache: bool
+        read and write resampled hours next to the data files
+
+    Returns
+    -------
+    dat: xarray.Dataset
+        "mean", "max", "p<q>" (time, y, x) and "count" (time,). Time is the start of each bin.
+        Bins without frames have count 0 and NaN mean and percentiles.
+    """
+    width = _width(width)
+    if treq is not None:
+        treq = _timereq(treq)
+    cache = cache and not quality
+
+    hours = [
+        d
+        for fn in _datafiles(path, site, treq)
+        if (d := _resample_file(fn, width, tuple(percentiles), batch, quality, cache, treq))
+        is not None
+    ]
+    if not hours:
+        raise ValueError(f"no images to resample in {treq}")
+    dat = xarray.concat(hours, dim="time") if len(hours) > 1 else hours[0]
+
+    if treq is not None:
+        t = np.atleast_1d(np.asarray(treq, dtype="datetime64[ns]"))
+        # bins overlapping the requested range
+        dat = dat.sel(time=slice(t[0] - width + np.timedelta64(1, "ns"), t[-1]))
+
+    return dat
+
+
+def sidecar(fn: Path, width: np.timedelta64) -> Path:
+    """resampled hour filename for a data file"""
+    fn = Path(fn).expanduser()
+    return fn.with_name(f"{fn.stem}_{width.astype('timedelta64[ms]').astype(int)}ms.nc")
+
+
+def _resample_file(
+    fn: Path,
+    width: np.timedelta64,
+    percentiles: tuple[float, ...],
+    batch: int,
+    quality: bool | dict[str, float | None] | None,
+    cache: bool,
+    treq=None,
+) -> xarray.Dataset | None:
+    """
+    resample one hourly file, from the stored result if current.
+    None if the requested part of the hour has no images.
+    """
+    names = ["mean", "max", "count"] + [_pname(q) for q in percentiles]
+    sfn = sidecar(fn, width)
+    st = os.stat(fn)
+    span = _span(fn, width, treq)
+
+    if cache and sfn.is_file():
+        with xarray.open_dataset(sfn) as d:
+            # data files may be replaced or grow while being written
+            if d.attrs["size"] == st.st_size and d.attrs["mtime"] == st.st_mtime:
+                if all(k in d for k in names):
+                    return d[names].load()
+                # keep percentiles stored earlier
+                stored = {float(str(k)[1:]) for k in d if str(k).startswith("p")}
+                percentiles = tuple(sorted(set(percentiles) | stored))
+
+    try:
+        dat = _accumulate(
+            iterload(fn, treq=span, batch=batch, quality=quality), width, percentiles
+        )
+    except ValueError:
+        if span is None:
+            raise
+        return None
+    dat.attrs.update({"filename": fn.name, "size": st.st_size, "mtime": st.st_mtime})
+
+    # a partly read hour is not stored
+    if cache and span is None:
+        try:
+            dat.to_netcdf(sfn)
+        except OSError as e:
+            logging.warning(f"could not write resampled data for {fn}: {e}")
+
+    return dat[names]
+
+
+def _accumulate(batches, width: np.timedelta64, percentiles: tuple[float, ...]) -> xarray.Dataset:
+    """
+    accumulate batches of one hour into preallocated per-bin arrays
+
+    Bins are contiguous in time order, so only the frames of the current bin are held for percentiles.
+    """
+    nbin = int(HOUR // width)
+
+    it = iter(batches)
+    first = next(it, None)
+    if first is None:
+        raise ValueError("no images to resample")
+
+    t0 = first.time.values[0].astype("datetime64[h]").astype("datetime64[ns]")
+    shape = (nbin, *first.shape[1:])
+    total = np.zeros(shape, dtype=np.float64)
+    peak = np.zeros(shape, dtype=first.dtype)
+    count = np.zeros(nbin, dtype=np.int64)
+    pct = np.full((len(percentiles), *shape), np.nan, dtype=np.float32)
+    site = first.site
+
+    pending: list[np.ndarray] = []
+    current = -1
+
+    for imgs in itertools.chain([first], it):
+        b = ((imgs.time.values - t0) // width).astype(int)
+        # %% per-bin reductions of each run of frames in the same bin
+        starts = np.flatnonzero(np.diff(b, prepend=-1))
+        ub = b[starts]
+        x = imgs.values
+        total[ub] += np.add.reduceat(x, starts, axis=0, dtype=np.float64)
+        peak[ub] = np.maximum(peak[ub], np.maximum.reduceat(x, starts, axis=0))
+        count[ub] += np.diff(np.append(starts, b.size))
+
+        if percentiles:
+            for k, s, e in zip(ub, starts, np.append(starts[1:], b.size)):
+                if k != current and pending:
+                    pct[:, current] = _percentile(pending, percentiles)
+                    pending = []
+                current = k
+                pending.append(x[s:e])
+
+    if pending:
+        pct[:, current] = _percentile(pending, percentiles)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (total / count[:, None, None]).astype(np.float32)
+
+    dims = ("time", "y", "x")
+    dat = xarray.Dataset(
+        {
+            "mean": (dims, mean),
+            "max": (dims, peak),
+            "count": ("time", count),
+            **{_pname(q): (dims, p) for q, p in zip(percentiles, pct)},
+        },
+        coords={"time": t0 + np.arange(nbin) * width},
+        attrs={"site": site, "width_s": width / np.timedelta64(1, "s")},
+    )
+
+    return dat
+
+
+def _span(fn: Path, width: np.timedelta64, treq) -> list[datetime] | None:
+    """time range of the whole bins of a data file overlapping treq, None for the whole hour"""
+    m = re.search(r"_(\d{4})(\d{2})(\d{2})(\d{2})_v", Path(fn).name)
+    if treq is None or m is None:
+        return None
+
+    h0 = np.datetime64("{}-{}-{}T{}".format(*m.groups()), "ns")
+    t = np.atleast_1d(np.asarray(treq, dtype="datetime64[ns]"))
+    lo = max(_floor(t[0], width), h0)
+    hi = min(_floor(t[-1], width) + width, h0 + HOUR)
+    if lo <= h0 and hi >= h0 + HOUR:
+        return None
+
+    return [
+        lo.astype("datetime64[us]").item(),
+        (hi - np.timedelta64(1, "us")).astype("datetime64[us]").item(),
+    ]
+
+
+def _floor(t: np.datetime64, width: np.timedelta64) -> np.datetime64:
+    return t - (t - np.datetime64(0, "ns")) % width
+
+
+def _percentile(frames: list[np.ndarray], percentiles: tuple[float, ...]) -> np.ndarray:
+    return np.percentile(np.concatenate(frames), percentiles, axis=0).astype(np.float32)
+
+
+def _pname(q: float) -> str:
+    return f"p{q:g}"
+
+
+def _width(width: str | np.timedelta64) -> np.timedelta64:
+    """bin width from e.g. "1min", "30s" """
+    if isinstance(width, str):
+        import pandas
+
+        width = pandas.Timedelta(width).to_timedelta64()
+
+    width = np.timedelta64(width, "ns")
+    if width <= np.timedelta64(0, "ns") or HOUR % width:
+        raise ValueError(f"bin width {width} must divide an hour")
+
+    return width
@@ -0,0 +1,177 @@
+"""
+share loaded calibration and image stacks between processes without copies
+
+The parent process publishes a Dataset into shared memory segments and passes the small, picklable handle
+to the workers, which attach to the same memory as a zero-copy Dataset.
+A pool of 32 workers then holds one copy of each site's skymap instead of 32.
+
+    cal = themisasi.loadcal(calfn)
+    with themisasi.shared.published(cal) as handle:
+        with multiprocessing.Pool(32) as pool:
+            pool.starmap(work, [(handle, fn) for fn in files])
+
+    def work(handle, fn):
+        cal = themisasi.shared.attach(handle)
+        ...
+
+Attached arrays are read-only. Segments are unlinked by release() or at exit of the publishing process.
+Before Python 3.13, attach only from processes started by the publisher, such as its multiprocessing pools,
+which share its resource tracker.
+"""
+
+from __future__ import annotations
+import atexit
+import contextlib
+import sys
+import typing
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+# segments created by this process, unlinked at release or exit
+_published: dict[str, SharedMemory] = {}
+# segments attached by this process, kept open while their arrays may be in use
+_attached: dict[str, SharedMemory] = {}
+
+
+def publish(ds: xarray.Dataset, variables: list[str] | None = None) -> dict:
+    """
+    copy Dataset variables into shared memory
+
+    Parameters
+    ----------
+    ds: xarray.Dataset
+        e.g. calibration from themisasi.loadcal() or data from themisasi.load()
+    variables: list of str, optional
+        data variables to share, by default all. Others are omitted, e.g. share only "az", "el".
+
+    Returns
+    -------
+    handle: dict
+        picklable description of the shared Dataset, for attach() and release()
+    """
+    if variables is None:
+        variables = [str(k) for k in ds.data_vars]
+
+    handle: dict[str, typing.Any] = {
+        "vars": {},
+        "coords": {k: (v.dims, v.values) for k, v in ds.coords.items()},
+        "attrs": dict(ds.attrs),
+    }
+
+    for k in variables:
+        v = ds[k]
+        a = np.ascontiguousarray(v.values)
+        if a.dtype.hasobject:
+            raise TypeError(f"{k} has dtype {a.dtype}, which cannot be shared")
+
+        shm = SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        _published[shm.name] = shm
+
+        handle["vars"][k] = {
+            "name": shm.name,
+            "shape": a.shape,
+            "dtype": a.dtype.str,
+            "dims": v.dims,
+            "attrs": dict(v.attrs),
+        }
+
+    return handle
+
+
+def attach(handle: dict) -> xarray.Dataset:
+    """
+    zero-copy read-only Dataset of shared memory from publish()
+
+    Parameters
+    ----------
+    handle: dict
+        from publish()
+
+    Returns
+    -------
+    ds: xarray.Dataset
+        Dataset backed by the shared memory segments
+    """
+    import xarray
+
+    data = {}
+    for k, v in handle["vars"].items():
+        shm = _segment(v["name"])
+        a = np.ndarray(v["shape"], np.dtype(v["dtype"]), buffer=shm.buf)
+        a.flags.writeable = False
+        data[k] = (v["dims"], a, v["attrs"])
+
+    return xarray.Dataset(data, coords=handle["coords"], attrs=handle["attrs"])
+
+
+def release(handle: dict):
+    """
+    free the shared memory of a handle. Call in the publishing process when workers are done.
+    Datasets attached in this process must not be used afterwards.
+    """
+    for v in handle["vars"].values():
+        if shm := _attached.pop(v["name"], None):
+            _close(shm)
+        if shm := _published.pop(v["name"], None):
+            _close(shm)
+            shm.unlink()
+
+
+@contextlib.contextmanager
+def published(ds: xarray.Dataset, variables: list[str] | None = None):
+    """
+    publish a Dataset for the duration of a with block, then release it
+
+    yields
+    ------
+    handle: dict
+        from publish()
+    """
+    handle = publish(ds, variables)
+    try:
+        yield handle
+    finally:
+        release(handle)
+
+
+def _segment(name: str) -> SharedMemory:
+    """open a segment once per process"""
+    if name in _published:
+        return _published[name]
+
+    if name not in _attached:
+        if sys.version_info >= (3, 13):
+            shm = SharedMemory(name, track=False)
+        else:
+            # Python < 3.13 registers attached segments unconditionally. Workers started by the
+            # publisher share its resource tracker, where this is a no-op: tracking stays with
+            # the publisher, which unregisters the segment when it unlinks it.
+            shm = SharedMemory(name)
+        _attached[name] = shm
+
+    return _attached[name]
+
+
+def _close(shm: SharedMemory):
+    try:
+        shm.close()
+    except BufferError:
+        # arrays still reference the buffer; the mapping is freed when they are garbage collected
+        pass
+
+
+@atexit.register
+def _cleanup():
+    for shm in _attached.values():
+        _close(shm)
+    _attached.clear()
+
+    for shm in _published.values():
+        _close(shm)
+        shm.unlink()
+    _published.clear()
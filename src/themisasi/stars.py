@@ -0,0 +1,277 @@
+"""
+star-based verification of camera pointing
+
+Point sources are detected in the images, bright stars from the bundled catalog are predicted
+onto the image via the calibration az/el, and detections are matched to predictions.
+The rotation between the calibration directions of the matched detections and the true star directions
+is the pointing error, e.g. if the camera was bumped since the skymap was made.
+"""
+
+import importlib.resources
+import logging
+from pathlib import Path
+
+import numpy as np
+import xarray
+import scipy.ndimage as ndi
+from scipy.spatial import cKDTree
+from scipy.spatial.transform import Rotation
+
+from .celestial import azel2enu, enu2azel, radec2azel
+from .io import load, azel
+
+CATALOG = "bright_stars.csv"
+
+
+def catalog(vmag_max: float = 3.0) -> np.ndarray:
+    """
+    bright star catalog bundled with themisasi, J2000 positions.
+    Precession to the date of observation (about 0.014 degree/year) is neglected as small compared to a pixel.
+
+    Parameters
+    ----------
+    vmag_max: float
+        faintest visual magnitude to include
+
+    Returns
+    -------
+    cat: numpy.ndarray
+        structured array with fields name, ra_deg, dec_deg, vmag
+    """
+    with (importlib.resources.files(__package__) / CATALOG).open("r") as f:
+        cat = np.genfromtxt(f, delimiter=",", names=True, dtype=None, encoding="utf8")
+
+    return cat[cat["vmag"] <= vmag_max]
+
+
+def detect(imgs, mask=None, nsigma: float = 6.0, size: int = 5, background: int = 15) -> tuple:
+    """
+    detect point sources in a batch of images
+
+    Parameters
+    ----------
+    imgs: numpy.ndarray
+        (time, y, x) images
+    mask: numpy.ndarray of bool, optional
+        (y, x) True for pixels to search e.g. within the FOV
+    nsigma: float
+        detection threshold in robust standard deviations above local background
+    size: int
+        width (pixels) of the neighborhood a detection must be the maximum of
+    background: int
+        width (pixels) of the local background estimate
+
+    Returns
+    -------
+    frame, row, col: numpy.ndarray
+        frame index and sub-pixel position of each detection
+    amp: numpy.ndarray
+        brightness above background
+    """
+    imgs = np.asarray(imgs, dtype=np.float32)
+    if mask is None:
+        mask = np.ones(imgs.shape[1:], dtype=bool)
+
+    resid = imgs - ndi.uniform_filter(imgs, size=(1, background, background))
+    # %% robust noise of each frame over the FOV
+    r = resid[:, mask]
+    med = np.median(r, axis=1)
+    sigma = 1.4826 * np.median(abs(r - med[:, None]), axis=1)
+    thres = (med + nsigma * sigma)[:, None, None]
+
+    peak = (resid == ndi.maximum_filter(resid, size=(1, size, size))) & (resid > thres) & mask
+    f, i, j = np.nonzero(peak)
+    # %% sub-pixel centroid of 3x3 neighborhood
+    d = np.arange(-1, 2)
+    ii = np.clip(i[:, None, None] + d[None, :, None], 0, imgs.shape[1] - 1)
+    jj = np.clip(j[:, None, None] + d[None, None, :], 0, imgs.shape[2] - 1)
+    w = np.clip(resid[f[:, None, None], ii, jj], 0, None)
+    wsum = w.sum(axis=(1, 2))
+
+    row = i + (w.sum(axis=2) * d).sum(axis=1) / wsum
+    col = j + (w.sum(axis=1) * d).sum(axis=1) / wsum
+
+    return f, row, col, resid[f, i, j]
+
+
+def match_stars(
+    dat: xarray.Dataset,
+    vmag_max: float = 3.0,
+    min_el: float = 15.0,
+    tol: float = 3.0,
+    batch: int = 64,
+    nsigma: float = 6.0,
+) -> xarray.Dataset:
+    """
+    match detected point sources to catalog stars predicted through the calibration
+
+    Parameters
+    ----------
+    dat: xarray.Dataset
+        images with az, el calibration from themisasi.load()
+    vmag_max: float
+        faintest catalog star to use
+    min_el: float
+        minimum elevation angle (degrees). Data near the horizon is poorly calibrated (large angular error).
+    tol: float
+        maximum distance (pixels) between prediction and detection
+    batch: int
+        number of frames processed at once
+    nsigma: float
+        detection threshold, see detect()
+
+    Returns
+    -------
+    matches: xarray.Dataset
+        one entry per matched star per frame, with calibration and catalog az/el
+    """
+    cat = catalog(vmag_max)
+    lat = np.asarray(dat.lat).item()
+    lon = np.asarray(dat.lon).item()
+
+    az, el = azel(dat)
+    fov = np.isfinite(az) & (el >= min_el)
+    enu = azel2enu(az, el)
+    # %% spatial index of calibration pixel directions
+    pix = np.column_stack(np.nonzero(fov))
+    tree = cKDTree(enu[fov])
+    # angular size of a pixel, chord length on unit sphere
+    pixscale = np.median(tree.query(enu[fov], k=2)[0][:, 1])
+
+    out: dict[str, list] = {k: [] for k in ("time", "star", "row", "col", "az_star", "el_star")}
+
+    for k in range(0, dat.time.size, batch):
+        time = dat.time.values[k : k + batch]
+        f, row, col, _ = detect(dat["imgs"].values[k : k + batch], fov, nsigma)
+        if f.size == 0:
+            continue
+        # %% predict star pixels
+        az_star, el_star = radec2azel(cat["ra_deg"], cat["dec_deg"], lat, lon, time)
+        dist, ipix = tree.query(azel2enu(az_star, el_star), distance_upper_bound=2 * pixscale)
+        tf, ts = np.nonzero(np.isfinite(dist) & (el_star >= min_el))
+        if tf.size == 0:
+            continue
+        pred = pix[ipix[tf, ts]]
+        # %% match predictions to detections, frame index separates frames in the spatial index
+        sep = 10 * max(dat["imgs"].shape[1:])
+        dtree = cKDTree(np.column_stack((f * sep, row, col)))
+        d, idet = dtree.query(
+            np.column_stack((tf * sep, pred[:, 0], pred[:, 1])), distance_upper_bound=tol
+        )
+        good = np.isfinite(d)
+        # a detection claimed by more than one star is ambiguous
+        _, inv, counts = np.unique(idet[good], return_inverse=True, return_counts=True)
+        good[good] = counts[inv] == 1
+
+        tf = tf[good]
+        ts = ts[good]
+        idet = idet[good]
+
+        out["time"].append(time[tf])
+        out["star"].append(cat["name"][ts])
+        out["row"].append(row[idet])
+        out["col"].append(col[idet])
+        out["az_star"].append(az_star[tf, ts])
+        out["el_star"].append(el_star[tf, ts])
+
+    m = {k: np.concatenate(v) if v else np.empty(0) for k, v in out.items()}
+    # %% calibration direction at the sub-pixel detection
+    cal = np.stack(
+        [ndi.map_coordinates(enu[..., i], (m["row"], m["col"]), order=1) for i in range(3)],
+        axis=-1,
+    )
+    m["az_cal"], m["el_cal"] = enu2azel(cal / np.linalg.norm(cal, axis=-1, keepdims=True))
+
+    return xarray.Dataset(
+        {k: ("match", v) for k, v in m.items()},
+        attrs={"site": dat.attrs.get("site"), "calfilename": dat.attrs.get("calfilename")},
+    )
+
+
+def fit_pointing(matches: xarray.Dataset, nsigma: float = 3.0, niter: int = 3) -> xarray.Dataset:
+    """
+    fit the rotation taking true star directions to the calibration directions
+
+    A perfect calibration gives zero rotation.
+    Outliers beyond nsigma times the RMS residual are rejected and the fit repeated.
+
+    Parameters
+    ----------
+    matches: xarray.Dataset
+        from match_stars()
+    nsigma: float
+        outlier rejection threshold
+    niter: int
+        number of fit / reject iterations
+
+    Returns
+    -------
+    matches: xarray.Dataset
+        with "residual_deg", "used" and attributes:
+
+        * az_offset_deg: calibration azimuth minus true azimuth, rotation about zenith
+        * tilt_east_deg, tilt_north_deg: rotation about the East and North axes
+        * rms_deg: RMS residual after the fit
+        * nmatch: number of matches used
+    """
+    good = np.isfinite(matches["az_cal"].values) & np.isfinite(matches["el_cal"].values)
+    if good.sum() < 3:
+        raise ValueError(f"only {good.sum()} stars matched, cannot fit pointing")
+
+    star = azel2enu(matches["az_star"].values, matches["el_star"].values)
+    cal = azel2enu(matches["az_cal"].values, matches["el_cal"].values)
+
+    for _ in range(niter):
+        R, _ = Rotation.align_vectors(cal[good], star[good])
+        resid = np.degrees(np.arccos(np.clip((R.apply(star) * cal).sum(axis=1), -1, 1)))
+        rms = np.sqrt(np.mean(resid[good] ** 2))
+        new = good & (resid <= max(nsigma * rms, 1e-6))
+        if (new == good).all() or new.sum() < 3:
+            break
+        good = new
+
+    east, north, up = np.degrees(R.as_rotvec())
+
+    out = matches.assign(residual_deg=("match", resid), used=("match", good))
+    out.attrs.update(
+        {
+            # rotation about Up is counterclockwise from above, azimuth is clockwise
+            "az_offset_deg": -up,
+            "tilt_east_deg": east,
+            "tilt_north_deg": north,
+            "rms_deg": rms,
+            "nmatch": int(good.sum()),
+        }
+    )
+
+    return out
+
+
+def verify_pointing(files: list[Path], calfn: Path | None = None, **kwargs) -> xarray.Dataset:
+    """
+    star-based pointing check over many hourly files e.g. a night for one site
+
+    Parameters
+    ----------
+    files: list of pathlib.Path
+        THEMIS ASI data files
+    calfn: pathlib.Path, optional
+        calibration file, otherwise found next to the data
+    kwargs:
+        passed to match_stars()
+
+    Returns
+    -------
+    fit: xarray.Dataset
+        see fit_pointing()
+    """
+    matches = []
+    for fn in files:
+        dat = load(fn, calfn=calfn)
+        if "az" not in dat:
+            raise ValueError(f"no calibration for {fn}")
+        m = match_stars(dat, **kwargs)
+        logging.info(f"{fn.name}: {m.match.size} star matches")
+        matches.append(m)
+
+    return fit_pointing(xarray.concat(matches, dim="match"))
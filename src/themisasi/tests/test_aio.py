@@ -0,0 +1,72 @@
+from pathlib import Path
+import asyncio
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.aio as taa
+import themisasi.io as tai
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+treq = ("2011-01-06T17:00:00", "2011-01-06T17:00:30")
+
+
+@pytest.mark.asyncio
+async def test_aload():
+    dat = await taa.aload(datfn, treq=treq)
+    ref = ta.load(datfn, treq=treq)
+
+    assert dat.site == "gako"
+    assert (dat.time.values == ref.time.values).all()
+    assert np.array_equal(dat["imgs"].values, ref["imgs"].values)
+
+    # calibration is after the data, like themisasi.load()
+    with pytest.raises(ValueError):
+        await taa.aload(datfn, treq=treq, calfn=cal1fn)
+
+
+@pytest.mark.asyncio
+async def test_coalesce():
+    dats = await asyncio.gather(*[taa.aload(datfn, treq=treq) for _ in range(4)])
+
+    # one read shared by all requests
+    assert all(np.shares_memory(d["imgs"].values, dats[0]["imgs"].values) for d in dats)
+    assert not taa._inflight
+
+
+@pytest.mark.asyncio
+async def test_aload_sites():
+    dats = await taa.aload_sites(R, ["gako"], "2011-01-06T17:00:03")
+
+    assert list(dats) == ["gako"]
+    assert dats["gako"]["imgs"].shape[0] == 1
+
+    with pytest.raises(ExceptionGroup):
+        await taa.aload_sites(R, ["gako", "fykn"], "2011-01-06T17:00:03")
+
+
+@pytest.mark.asyncio
+async def test_aiterload():
+    ref = list(tai.iterload(datfn, batch=10))
+    got = [imgs async for imgs in taa.aiterload(datfn, batch=10)]
+
+    assert [b.shape[0] for b in got] == [10, 10, 3]
+    for a, b in zip(got, ref):
+        assert np.array_equal(a.values, b.values)
+
+    it = taa.aiterload(datfn, batch=10)
+    await anext(it)
+    await it.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel():
+    task = asyncio.create_task(taa.aload(datfn, treq=treq))
+    await asyncio.sleep(0)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not taa._inflight
@@ -0,0 +1,64 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.align as taa
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+
+T0 = np.datetime64("2011-01-06T17:00:00", "ns")
+
+
+def _t(seconds):
+    return T0 + (np.asarray(seconds) * 1e9).astype("timedelta64[ns]")
+
+
+def test_nearest():
+    time = _t([0, 3, 6, 9])
+
+    i = taa.nearest(time, _t([-0.5, 1.5, 2.9, 7.6, 10.2, -2]), tol=1.0)
+
+    assert i.tolist() == [0, -1, 1, -1, -1, -1]
+    assert taa.nearest(time, _t([1.5]), tol=2.0).tolist() == [0]
+
+
+def test_align():
+    a = _t(np.arange(0, 30, 3))
+    b = _t(np.arange(0.4, 30, 3))
+    c = np.delete(_t(np.arange(1.3, 30, 3)), 4)
+
+    idx = taa.align({"a": a, "b": b, "c": c}, tol=1.5)
+
+    assert (idx.time.values == np.delete(a, 4)).all()
+    assert idx["b"].values.tolist() == [0, 1, 2, 3, 5, 6, 7, 8, 9]
+    assert idx["c"].values.tolist() == list(range(9))
+
+    partial = taa.align({"a": a, "c": c}, tol=1.5, complete=False)
+    assert partial["c"].values[4] == -1
+
+
+def test_cadence():
+    dat = ta.load(datfn)
+    shifted = dat.assign_coords(time=dat.time + np.timedelta64(1, "s"))
+
+    idx = taa.align({"gako": dat, "other": shifted}, tol=1.6, cadence=3.0)
+
+    assert idx.time.size > 0
+    assert (np.diff(idx.time.values) == np.timedelta64(3, "s")).all()
+    for k, d in (("gako", dat), ("other", shifted)):
+        dt = abs(d.time.values[idx[k].values] - idx.time.values)
+        assert (dt <= np.timedelta64(1600, "ms")).all()
+
+
+def test_empty():
+    with pytest.raises(ValueError):
+        taa.align({})
+
+
+def test_cadence_disjoint():
+    idx = taa.align({"a": _t([0, 3, 6]), "b": _t([60, 63])}, cadence=3.0)
+
+    assert idx.time.size == 0
+    assert idx["a"].size == idx["b"].size == 0
@@ -0,0 +1,73 @@
+from pathlib import Path
+import shutil
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.background as tab
+import themisasi.io as tai
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def test_quantile():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(1000, 5000, (2000, 3, 4))
+
+    hist = np.zeros((12, tab.BINS), dtype=np.uint32)
+    for k in range(0, x.shape[0], 300):
+        tab.accumulate(hist, x[k : k + 300])
+
+    assert hist.sum(axis=1) == pytest.approx(2000)
+    q = tab.quantile(hist, 50).reshape(3, 4)
+    assert q == pytest.approx(np.median(x, axis=0), rel=0.01)
+
+
+def test_vanrhijn():
+    assert tab.vanrhijn(90.0) == pytest.approx(1)
+    assert 5 < tab.vanrhijn(0.0) < 6
+
+
+def test_estimate():
+    cal = ta.loadcal(cal1fn)
+    model = tab.estimate(datfn, cal=cal, batch=10)
+
+    assert model.frames == 23
+    assert model.site == "gako"
+
+    bg = model["background"].values
+    ref = np.median(np.concatenate([b.values for b in tai.iterload(datfn)]), axis=0)
+    assert np.median(bg / ref) == pytest.approx(1, abs=0.02)
+
+    flat = model["flat"].values
+    assert np.isnan(flat[~cal["valid"].values]).all()
+    assert np.nanmax(model["profile"].values) > 0
+    assert model["profile"].sel(el=model.el.max()) == pytest.approx(1)
+
+
+def test_load_background(tmp_path):
+    cal = ta.loadcal(cal1fn)
+    model = tab.estimate(datfn, cal=cal)
+    # calibration epoch before the data, the test calibration file is from later
+    model.attrs["caltime"] = "2010-12-01 00:00:00"
+    fn = tab.save(model, tmp_path)
+    assert fn.name == "themis_background_gako_20101201000000.nc"
+
+    shutil.copy(datfn, tmp_path)
+    dat = ta.load(tmp_path / datfn.name, background=True)
+
+    assert dat["imgs"].dtype == np.float32
+    assert dat.background == fn.name
+    assert tab.lookup(tmp_path, "gako", time=dat.time.values[0]) is tab.lookup(
+        tmp_path, "gako", "2010-12-01 00:00:00"
+    )
+
+    with pytest.raises(FileNotFoundError):
+        tab.lookup(tmp_path, "gako", time="2010-11-01")
+    # calibration epoch without a model falls back to the latest model before the time
+    later = tab.lookup(tmp_path, "gako", "2011-01-01 00:00:00", dat.time.values[0])
+    assert later.modelfilename == fn.name
+    with pytest.raises(FileNotFoundError, match="calibration"):
+        tab.lookup(tmp_path, "gako", "2011-01-01 00:00:00")
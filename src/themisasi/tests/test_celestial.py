@@ -0,0 +1,42 @@
+import pytest
+from pytest import approx
+import numpy as np
+from datetime import datetime
+
+import themisasi.celestial as tac
+
+az = np.array([[10.0, 200.0], [95.0, 300.0]])
+el = np.array([[30.0, 80.0], [15.0, 45.0]])
+times = np.array(["2011-01-06T17:00:00", "2011-01-06T23:30:10"], dtype="datetime64[ns]")
+
+
+def test_radec_vallado():
+    pv = pytest.importorskip("pymap3d.vallado")
+
+    ra, dec = tac.azel2radec(az, el, 62.4, -145.16, times)
+    assert ra.shape == dec.shape == (2, 2, 2)
+
+    for k, t in enumerate(times.astype("datetime64[us]").astype(datetime)):
+        for i in range(2):
+            for j in range(2):
+                r, d = pv.azel2radec(az[i, j], el[i, j], 62.4, -145.16, t)
+                assert ra[k, i, j] == approx(r)
+                assert dec[k, i, j] == approx(d)
+
+
+def test_iter_radec():
+    ra, dec = tac.azel2radec(az, el, 62.4, -145.16, times)
+
+    for k, (r, d) in enumerate(tac.iter_radec(az, el, 62.4, -145.16, times, np.float32)):
+        assert r.dtype == np.float32
+        assert r == approx(ra[k], abs=1e-3)
+        assert d == approx(dec[k], abs=1e-3)
+
+
+def test_declination_fixed():
+    """sky rotates about the celestial pole"""
+    ra, dec = tac.azel2radec(az, el, 62.4, -145.16, times)
+    assert dec[0] == approx(dec[1])
+
+    _, dec = tac.azel2radec(0.0 * az, 0 * el + 62.4, 62.4, -145.16, times)
+    assert dec == approx(90.0)
@@ -0,0 +1,85 @@
+from pathlib import Path
+import numpy as np
+import pytest
+import xarray
+
+import themisasi as ta
+import themisasi.conjunction as tac
+import themisasi.geometry as tag
+import themisasi.io as tai
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+ROWS = np.array([129, 100, 60, 129, 0])
+COLS = np.array([124, 150, 90, 124, 0])
+
+
+def track():
+    cal = ta.loadcal(cal1fn)
+    lat, lon, alt = tag.camera(cal).geodetic(110e3, (ROWS, COLS))
+    t = tai.filetimes(datfn)[[2, 5, 9, 9, 12]] + np.timedelta64(400, "ms")
+    # last sample outside the FOV, one an hour later without data
+    t[3] += np.timedelta64(1, "h")
+    lat[4], lon[4] = 0.0, 0.0
+
+    trk = xarray.Dataset(
+        {"lat": ("time", lat), "lon": ("time", lon), "alt_m": ("time", np.full(5, 110e3))},
+        coords={"time": t},
+    )
+    return cal, trk
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_footprint(processes):
+    cal, trk = track()
+    b = tac.footprint(R, "gako", trk, cals={"gako": cal}, processes=processes)
+
+    assert (b["row"][:4, 0] == ROWS[:4]).all()
+    assert (b["col"][:4, 0] == COLS[:4]).all()
+    assert b["row"][4, 0] == -1
+
+    imgs = next(tai.iterload(datfn, batch=23)).values
+    bb = b["brightness"][:, 0].values
+    assert bb[:3] == pytest.approx(imgs[[2, 5, 9], ROWS[:3], COLS[:3]])
+    assert np.isnan(bb[3:]).all()
+    assert b["frame_time"][0, 0] == tai.filetimes(datfn)[2]
+
+
+def test_neighborhood():
+    cal, trk = track()
+    b = tac.footprint([datfn], "gako", trk, radius=1, agg="max", cals={"gako": cal})
+
+    img = next(tai.iterload(datfn, batch=23)).values[2]
+    r, c = ROWS[0], COLS[0]
+    assert b["brightness"][0, 0] == img[r - 1 : r + 2, c - 1 : c + 2].max()
+
+    with pytest.raises(ValueError):
+        tac.footprint([datfn], "gako", trk, agg="sum", cals={"gako": cal})
+
+
+def test_calibration_per_hour(tmp_path, monkeypatch):
+    _, trk = track()
+    # a calibration change between the two hours of the track
+    caltimes = {"a": "2011-01-01", "b": "2011-01-06T17:30", "c": "2011-01-07"}
+    for k in caltimes:
+        (tmp_path / f"themis_skymap_gako_{k}.sav").touch()
+    read = []
+
+    def loadcal_file(fn):
+        read.append(fn.name)
+        return xarray.Dataset(attrs={"caltime": np.datetime64(caltimes[fn.stem[-1]], "us").item()})
+
+    monkeypatch.setattr(tac, "loadcal_file", loadcal_file)
+
+    cm = tac._calibrations([tmp_path / datfn.name], "gako", trk.time.values)
+
+    assert [str(c.caltime) for c, _ in cm] == ["2011-01-01 00:00:00", "2011-01-06 17:30:00"]
+    assert (cm[0][1] == [True, True, True, False, True]).all()
+    assert (cm[1][1] == ~cm[0][1]).all()
+    # each skymap read once for the whole track
+    assert sorted(read) == [f"themis_skymap_gako_{k}.sav" for k in caltimes]
+
+    with pytest.raises(FileNotFoundError):
+        tac._calibrations(tmp_path, "gako", trk.time.values - np.timedelta64(365, "D"))
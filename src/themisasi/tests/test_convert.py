@@ -0,0 +1,113 @@
+import shutil
+import numpy as np
+from pathlib import Path
+import pytest
+
+import themisasi as ta
+import themisasi.convert as tac
+import themisasi.calformats as tacf
+
+R = Path(__file__).parent
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def test_convert(tmp_path):
+    ofn = tac.convert(cal1fn, tmp_path)
+    assert ofn.suffix == ".npz"
+
+    cal = ta.loadcal(cal1fn)
+    npz = ta.loadcal(ofn)
+
+    assert npz["az"].dtype == np.float32
+    assert npz.identical(cal)
+
+
+def test_compiled_sibling(tmp_path):
+    fn = Path(shutil.copy2(cal1fn, tmp_path))
+    assert tacf.compiled(fn) == fn
+
+    ofn = tac.convert(fn)
+    assert tacf.compiled(fn) == ofn
+    assert ta.loadcal(fn).identical(ta.loadcal(cal1fn))
+
+
+def test_sniff(tmp_path):
+    fn = Path(shutil.copy2(cal1fn, tmp_path / "skymap.dat"))
+    assert tacf.reader(fn) is tacf.read_sav
+    assert ta.loadcal(fn)["el"].equals(ta.loadcal(cal1fn)["el"])
+
+    bad = tmp_path / "bad.dat"
+    bad.write_bytes(b"not a calibration file")
+    with pytest.raises(ValueError):
+        ta.loadcal(bad)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+def test_caldtype(dtype):
+    cal = ta.loadcal(cal1fn)
+    small = ta.loadcal(cal1fn, dtype=dtype)
+
+    assert small["az"].dtype == dtype
+    assert small.nbytes <= cal.nbytes
+    assert small["valid"].equals(cal["valid"])
+
+    az, el = ta.io.azel(small)
+    assert np.array_equal(np.isnan(el), ~cal["valid"].values)
+    v = cal["valid"].values
+    assert el[v] == pytest.approx(cal["el"].values[v], abs=0.006)
+    assert az[v] == pytest.approx(cal["az"].values[v] % 360, abs=0.006)
+
+
+def test_caldtype_bad():
+    with pytest.raises(ValueError):
+        ta.loadcal(cal1fn, dtype="int8")
+
+
+@pytest.mark.parametrize("shape", [(128, 128), (100, 100)])
+def test_calbin(shape):
+    cal = ta.loadcal(cal1fn)
+    b = ta.io._downsample(cal, shape)
+
+    assert b["el"].shape == shape
+    assert ta.io._downsample(cal, shape) is b
+    # about the same FOV area
+    assert b["valid"].mean() == pytest.approx(cal["valid"].mean(), rel=0.02)
+    assert np.isnan(b["el"].values[~b["valid"].values]).all()
+
+    if shape == (128, 128):
+        el = cal["el"].values.reshape(128, 2, 128, 2)
+        full = np.isfinite(el).all(axis=(1, 3))
+        assert np.median(abs(b["el"].values[full] - el.mean(axis=(1, 3))[full])) < 0.01
+
+
+@pytest.mark.parametrize("shape", [(512, 512), (128, 300)])
+def test_calbin_larger(shape):
+    cal = ta.loadcal(cal1fn)
+    with pytest.raises(ValueError):
+        ta.io._downsample(cal, shape)
+
+
+def test_masked_nc(tmp_path):
+    netCDF4 = pytest.importorskip("netCDF4")
+
+    fn = tmp_path / "dasc.nc"
+    with netCDF4.Dataset(fn, "w") as h:
+        h.createDimension("y", 2)
+        h.createDimension("x", 3)
+        h.createDimension("one", 1)
+        h.createDimension("three", 3)
+        for k in ("az", "el"):
+            v = h.createVariable(k, "f4", ("y", "x"), fill_value=-999.0)
+            v[:] = np.ma.masked_values([[-999.0, 10, 20], [30, 40, 50]], -999.0)
+        h.createVariable("lla", "f8", ("three",))[:] = [65.1, -147.4, 689.0]
+        h.createVariable("x", "i4", ("one", "x"))[:] = [[0, 1, 2]]
+        h.createVariable("y", "i4", ("y", "one"))[:] = [[1], [0]]
+
+    for dtype in (None, "int16"):
+        cal = ta.loadcal(fn, dtype=dtype)
+        az, el = ta.io.azel(cal)
+
+        assert not cal["valid"][0, 0]
+        assert cal["valid"].values.sum() == 5
+        assert np.isnan(az[0, 0]) and np.isnan(el[0, 0])
+        assert el[1, 2] == pytest.approx(50)
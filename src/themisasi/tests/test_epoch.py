@@ -0,0 +1,56 @@
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pytest
+import cdflib
+
+import themisasi.io as tai
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+
+
+def test_cdf_epoch():
+    epoch = cdflib.CDF(datfn)["thg_asf_gako_epoch"][:]
+    time = tai.epoch2datetime64(epoch)
+
+    assert time.dtype == "datetime64[ns]"
+    assert (time == cdflib.cdfepoch.to_datetime(epoch)).all()
+    assert np.isnat(tai.epoch2datetime64(np.array([-1e31])))
+
+
+def test_tt2000():
+    # around the 2016-12-31 leap second
+    tt = cdflib.cdfepoch.compute_tt2000(
+        [
+            [2016, 12, 31, 23, 59, 59, 0, 0, 0],
+            [2017, 1, 1, 0, 0, 0, 0, 0, 0],
+            [2011, 1, 6, 17, 0, 0, 0, 0, 0],
+        ]
+    )
+    tt = np.append(np.arange(tt[0], tt[1] + 1, 250_000_000), tt[2])
+
+    assert (tai.epoch2datetime64(tt) == cdflib.cdfepoch.to_datetime(tt)).all()
+    assert np.isnat(tai.epoch2datetime64(np.array([tai.TT2000_FILL])))
+
+
+@pytest.mark.parametrize(
+    "treq,i",
+    [
+        (datetime(2011, 1, 6, 16, 59, 59, 500000), [0]),
+        (datetime(2011, 1, 6, 17, 0, 2), [1]),
+        (datetime(2011, 1, 6, 17, 1, 7), [22]),
+        ((datetime(2011, 1, 6, 17, 0, 2), datetime(2011, 1, 6, 17, 0, 30)), range(1, 10)),
+    ],
+)
+def test_timeindex(treq, i):
+    time = tai.epoch2datetime64(cdflib.CDF(datfn)["thg_asf_gako_epoch"][:])
+
+    assert tai._timeindex(time, treq, datfn).tolist() == list(i)
+
+
+def test_timeindex_outside():
+    time = tai.epoch2datetime64(cdflib.CDF(datfn)["thg_asf_gako_epoch"][:])
+
+    with pytest.raises(ValueError):
+        tai._timeindex(time, datetime(2011, 1, 6, 18), datfn)
@@ -0,0 +1,76 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.events as tae
+import themisasi.io as tai
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+TH = {"min_rise": None, "min_bright": 0.0012}
+
+
+def test_features():
+    cal = ta.loadcal(cal1fn)
+    mask = cal["valid"].values
+    whole = tae.features(next(tai.iterload(datfn, batch=23)), mask)
+
+    prev = None
+    parts: dict[str, list] = {}
+    for imgs in tai.iterload(datfn, batch=7):
+        for k, v in tae.features(imgs, mask, prev).items():
+            parts.setdefault(k, []).append(v)
+        prev = (imgs.time.values[-1], parts["mean"][-1][-1])
+
+    assert np.isnan(whole["rise"][0])
+    for k, v in whole.items():
+        assert np.concatenate(parts[k]) == pytest.approx(v, rel=1e-4, nan_ok=True)
+
+
+def test_events_gap():
+    t = np.datetime64("2011-01-06T17") + np.arange(10) * np.timedelta64(3, "s")
+    f = {
+        "mean": np.arange(10, dtype=np.float32),
+        "rise": np.ones(10, dtype=np.float32),
+        "bright": np.zeros(10, dtype=np.float32),
+    }
+    flag = np.array([0, 1, 1, 0, 0, 0, 0, 0, 1, 0], dtype=np.int8)
+
+    assert len(tae._events(t, f, flag, 30.0, "gako", "x")) == 1
+    ev = tae._events(t, f, flag, 5.0, "gako", "x")
+    assert len(ev) == 2
+    assert ev[0]["start"] == t[1] and ev[0]["end"] == t[2] and ev[0]["peak"] == t[2]
+
+
+def test_detect():
+    cal = ta.loadcal(cal1fn)
+    ev, n = tae.detect(datfn, cal, batch=5, thresholds=TH)
+
+    assert n == 23
+    assert len(ev) == 1
+    assert ev[0]["flags"] == tae.FLAGS["bright"]
+    assert ev[0]["max_bright"] >= TH["min_bright"]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_catalog(processes):
+    cat = tae.catalog([datfn, datfn], processes=processes, thresholds=TH)
+
+    assert cat.frames == 46
+    assert cat.frames_per_s > 0
+    assert cat.event.size == 2
+    assert (cat["site"] == "gako").all()
+
+
+def test_catalog_missing_site():
+    treq = ("2011-01-06T17:00:00", "2011-01-06T17:59:59")
+    cat = tae.catalog(R, ["gako", "fykn"], treq, processes=1, thresholds=TH)
+
+    assert cat.files == 1
+    assert (cat["site"] == "gako").all()
+
+    with pytest.raises(FileNotFoundError):
+        tae.catalog(R, ["fykn"], treq, processes=1)
@@ -0,0 +1,55 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.geometry as tag
+
+pm = pytest.importorskip("pymap3d")
+
+R = Path(__file__).parent
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+@pytest.fixture
+def cal():
+    return ta.loadcal(cal1fn)
+
+
+def test_camera(cal):
+    g = tag.camera(cal)
+
+    assert tag.camera(cal) is g
+    assert g.origin == pytest.approx(pm.geodetic2ecef(g.lat, g.lon, g.alt_m))
+
+    lat, lon, alt = g.geodetic(110e3)
+    assert np.nanmax(abs(alt - 110e3)) < 1.0
+    # rays return to their own pixel az/el
+    az, el = g.look(g.intersect(110e3))
+    az0, el0 = ta.io.azel(cal)
+    v = el0 > 0
+    assert el[v] == pytest.approx(el0[v], abs=1e-6)
+
+
+def test_float32(cal):
+    p = tag.camera(cal).intersect(110e3)
+    p32 = tag.camera(cal, np.float32).intersect(110e3)
+
+    assert tag.camera(cal, np.float32).ecef.dtype == np.float32
+    assert np.nanmax(np.linalg.norm(p32 - p, axis=-1)) < 5.0
+
+
+def test_mapto(cal):
+    other = cal.copy()
+    other.attrs = dict(cal.attrs, lat=cal.lat + 0.5, lon=cal.lon - 1.0, calfilename="other")
+    g0 = tag.camera(cal)
+    g1 = tag.camera(other)
+
+    mask = np.zeros(cal["el"].shape, dtype=bool)
+    mask[100:150, 100:150] = True
+    az, el = tag.mapto(g0, g1, 110e3, mask)
+
+    p = g1.intersect(110e3)[mask]
+    az_pm, el_pm, _ = pm.ecef2aer(p[:, 0], p[:, 1], p[:, 2], g0.lat, g0.lon, g0.alt_m)
+    assert el == pytest.approx(el_pm, abs=1e-6)
+    assert az == pytest.approx(az_pm, abs=1e-6)
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+from pathlib import Path
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+
+HEAVY = ["xarray", "cdflib", "scipy", "h5py", "netCDF4", "matplotlib", "pymap3d"]
+
+
+def loaded(code: str) -> set[str]:
+    ret = subprocess.check_output(
+        [sys.executable, "-c", f"import sys\n{code}\nprint(' '.join(sys.modules))"], text=True
+    )
+    return {m for m in HEAVY if m in ret.split()}
+
+
+def import_time_us(module: str) -> int:
+    """cumulative import time of a module, from python -X importtime"""
+    ret = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in ret.stderr.splitlines():
+        if line.split("|")[-1].strip() == module:
+            return int(line.split("|")[1])
+
+    raise ValueError(f"{module} not in import time report")
+
+
+def test_lazy_import():
+    assert not loaded("import themisasi")
+    assert not loaded("import themisasi.download; import themisasi.io")
+    assert not loaded("import themisasi.video, themisasi.pixels, themisasi.radec")
+
+    assert "xarray" not in loaded(f"import themisasi; themisasi.filetimes(r'{datfn}')")
+    assert {"xarray", "cdflib"} <= loaded(f"import themisasi; themisasi.load(r'{datfn}')")
+
+
+def test_import_time():
+    """importing themisasi costs less than importing its dependencies"""
+    assert import_time_us("themisasi") < import_time_us("xarray")
@@ -130,3 +130,65 @@ def test_calread_sitedate():
     cal = ta.loadcal(R, "gako", "2011-01-06")
 
     assert cal.caltime.date() in {date(2007, 2, 1), date(2007, 2, 2)}
+
+
+def test_frame_cache(monkeypatch):
+    import themisasi.io as tai
+
+    monkeypatch.setattr(tai, "BLOCK_RECORDS", 8)
+    tai.frame_cache_clear()
+
+    ref = ta.load(datfn)["imgs"]
+    info = tai.frame_cache_info()
+    assert info["misses"] == 3 and info["hits"] == 0
+    assert info["blocks"] == 3 and info["bytes"] == ref.values.nbytes
+
+    dat = ta.load(datfn, treq=("2011-01-06T17:00:03", "2011-01-06T17:00:30"))["imgs"]
+    assert tai.frame_cache_info()["misses"] == 3
+    assert tai.frame_cache_info()["hits"] > 0
+    assert (dat.values == ref.sel(time=dat.time).values).all()
+
+    # returned images are copies of the cached blocks
+    dat.values[:] = 0
+    assert (ta.load(datfn)["imgs"].values == ref.values).all()
+
+
+def test_frame_cache_evict(monkeypatch):
+    import themisasi.io as tai
+
+    monkeypatch.setattr(tai, "BLOCK_RECORDS", 8)
+    monkeypatch.setattr(tai, "FRAME_CACHE_BYTES", 2 * 8 * 256 * 256 * 2)
+    tai.frame_cache_clear()
+
+    ta.load(datfn)
+    info = tai.frame_cache_info()
+    assert info["blocks"] == 2 and info["bytes"] <= info["max_bytes"]
+
+
+def test_frame_cache_threads(monkeypatch):
+    import concurrent.futures
+    import time
+    import themisasi.io as tai
+
+    monkeypatch.setattr(tai, "BLOCK_RECORDS", 8)
+    tai.frame_cache_clear()
+
+    decoded = []
+    read = tai._read_records
+
+    def slow(h, var, i, cache=False):
+        if not cache:
+            decoded.append(i[0])
+            time.sleep(0.05)
+        return read(h, var, i, cache)
+
+    monkeypatch.setattr(tai, "_read_records", slow)
+
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        dats = list(pool.map(lambda _: ta.load(datfn)["imgs"].values, range(4)))
+
+    # each block decoded once, concurrent misses wait for it
+    assert sorted(decoded) == [0, 8, 16]
+    assert tai.frame_cache_info()["misses"] == 3
+    assert all((d == dats[0]).all() for d in dats)
+    assert not tai._frame_reading
@@ -0,0 +1,67 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.io as tai
+import themisasi.magnetic as tam
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def test_zenith():
+    # declination and inclination of Gakona, 2010
+    Baz, Bel = tam.zenith(62.41, -145.16, 0.0, 2010.0)
+    assert Baz == pytest.approx(21.03, abs=0.5)
+    assert Bel == pytest.approx(75.82, abs=1.5)
+
+    # Poker Flat DASC, as formerly set by hand for themisasi.fov
+    Baz, Bel = tam.zenith(65.126, -147.479, 200.0, 2010.0)
+    assert Baz == pytest.approx(21.03, abs=0.5)
+    assert Bel == pytest.approx(75.82, abs=3)
+
+    assert np.linalg.norm(tam.field(62.41, -145.16, 0.0, 2010.0)) == pytest.approx(56000, rel=0.03)
+
+    with pytest.raises(ValueError):
+        tam.coefficients(1990.0)
+
+
+def test_dipole():
+    g, h = tam.coefficients(2010.0)
+    pole = -np.array([g[1, 1], h[1, 1], g[1, 0]])
+    mlat, mlon = tam.dipole(pole * 1e3, 2010.0)
+    assert mlat == pytest.approx(90)
+    # geomagnetic north pole near 80 N, 72 W in 2010
+    assert np.degrees(np.arcsin(pole[2] / np.linalg.norm(pole))) == pytest.approx(80, abs=0.5)
+
+
+def test_lookup(tmp_path):
+    cal = ta.loadcal(cal1fn)
+    tam._lut_cache.clear()
+    mag = tam.lookup(cal, 110e3, cache=tmp_path)
+
+    assert len(list(tmp_path.glob("*.nc"))) == 1
+    assert tam.lookup(cal, 110e3, cache=tmp_path) is mag
+    tam._lut_cache.clear()
+    stored = tam.lookup(cal, 110e3, cache=tmp_path)
+    assert stored["mz_angle"].values == pytest.approx(mag["mz_angle"].values, nan_ok=True)
+    assert stored.Bepoch == 2011.2
+
+    valid = cal["valid"].values
+    assert np.isnan(mag["mlat"].values[~valid]).all()
+    assert np.nanmin(mag["mz_angle"]) < 1
+    assert 60 < np.nanmedian(mag["mlat"]) < 66
+
+
+def test_keogram(tmp_path):
+    cal = ta.loadcal(cal1fn)
+    imgs = next(tai.iterload(datfn, batch=23))
+    dat = tam.assign(cal.assign(imgs=imgs), cache=tmp_path)
+
+    assert dat.Bel > 70
+    keo = tam.keogram(dat)
+    assert keo.shape[0] == 23
+    assert keo.mlat.size > 20
+    assert np.isfinite(keo).any(axis=0).sum() > 20
@@ -0,0 +1,63 @@
+from pathlib import Path
+import numpy as np
+import pytest
+import xarray
+from scipy.ndimage import gaussian_filter
+
+import themisasi as ta
+import themisasi.io as tai
+import themisasi.motion as tam
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def scene(n, shift, batch):
+    rng = np.random.default_rng(0)
+    big = gaussian_filter(rng.normal(size=(256, 256)), 2) * 1000 + 5000
+    t = np.datetime64("2011-01-06T17") + np.arange(n) * np.timedelta64(3, "s")
+
+    frames = np.stack([np.roll(big, (k * shift[0], k * shift[1]), axis=(0, 1)) for k in range(n)])
+    frames = frames[:, 64:192, 64:192].astype(np.uint16)
+
+    return [
+        xarray.DataArray(
+            frames[k : k + batch], coords={"time": t[k : k + batch]}, dims=("time", "y", "x")
+        )
+        for k in range(0, n, batch)
+    ]
+
+
+@pytest.mark.parametrize("batch", [1, 4, 10])
+def test_motion(batch):
+    flow = tam.motion(scene(10, (2, -3), batch))
+
+    assert flow.time.size == 9
+    assert flow.tile.size == 16
+    assert np.median(flow["vy"]) * 3 == pytest.approx(2, abs=0.2)
+    assert np.median(flow["vx"]) * 3 == pytest.approx(-3, abs=0.2)
+    assert (flow["peak"] > 0.3).all()
+
+
+def test_gap():
+    s = scene(4, (1, 1), 4)[0]
+    t = s.time.values.copy()
+    t[2:] += np.timedelta64(60, "s")
+    flow = tam.motion([s.assign_coords(time=t)], tile=16)
+
+    assert np.isnan(flow["vy"][1]).all()
+    assert np.isfinite(flow["vy"][[0, 2]]).all()
+
+
+def test_geographic():
+    cal = ta.loadcal(cal1fn)
+    flow = tam.motion(tai.iterload(datfn, batch=8), cal=cal, alt_m=110e3)
+
+    assert flow.time.size == 22
+    assert flow.tile.size < 64
+    assert np.isfinite(flow["ve"]).any() and np.isfinite(flow["vn"]).any()
+    assert flow.lat.min() > 50 and flow.lat.max() < 75
+
+    with pytest.raises(ValueError):
+        tam.motion(tai.iterload(datfn), alt_m=110e3)
@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+from pathlib import Path
+
+import themisasi as ta
+import themisasi.io as tai
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def test_fill_nan_coords():
+    pytest.importorskip("matplotlib")
+    import themisasi.plots as tap
+
+    x = np.array(
+        [
+            [np.nan, np.nan, np.nan],
+            [np.nan, 1.0, 2.0],
+            [3.0, np.nan, 4.0],
+            [np.nan, np.nan, np.nan],
+        ]
+    )
+    y = x + 10
+
+    xf, yf, mask = tap.fill_nan_coords(x, y)
+
+    assert np.isfinite(xf).all() and np.isfinite(yf).all()
+    assert (mask == np.isfinite(x)).all()
+    assert (xf[mask] == x[mask]).all()
+    assert xf[1].tolist() == [1, 1, 2]
+    assert xf[2].tolist() == [3, 3, 4]
+    assert xf[0].tolist() == xf[1].tolist()
+    assert xf[3].tolist() == xf[2].tolist()
+    assert (yf == xf + 10).all()
+
+
+def test_projected_grid():
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("pymap3d")
+    import themisasi.projections as tapj
+
+    cal = ta.loadcal(cal1fn)
+
+    lon, lat, mask = tapj.projected_grid(cal, 110e3)
+    assert np.isfinite(lon).all() and np.isfinite(lat).all()
+    assert mask.sum() == (cal["el"] >= 10).sum()
+    assert not lon.flags.writeable
+
+    # same calibration attributes, other camera position
+    far = cal.assign_attrs(calfilename=None, caltime=None).assign(lat=40.0)
+    near = cal.assign_attrs(calfilename=None, caltime=None)
+    assert tapj.projected_grid(far, 110e3)[1].mean() < tapj.projected_grid(near, 110e3)[1].mean()
+
+
+def test_prefetch():
+    pytest.importorskip("matplotlib")
+    import themisasi.plots as tap
+
+    assert list(tap._prefetch(range(100), 3)) == list(range(100))
+
+    def bad():
+        yield 1
+        raise OSError("read failure")
+
+    with pytest.raises(OSError):
+        list(tap._prefetch(bad()))
+
+
+def test_play():
+    pytest.importorskip("matplotlib")
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.pyplot import figure
+    import themisasi.plots as tap
+
+    fg = figure()
+    hi = fg.gca().imshow(np.zeros((8, 8)))
+    frames = (np.full((8, 8), i) for i in range(20))
+
+    fps = tap.play(fg, (hi,), hi.set_data, frames, fps=1000)
+    assert fps > 0
+
+    # batches of images from disk, read ahead by the background thread
+    played = []
+    tap.play(fg, (hi,), lambda f: played.append(f[0]), tap._frames(tai.iterload(datfn)), fps=1000)
+    assert len(played) == 23
+
+
+def test_plotazel_int16():
+    pytest.importorskip("matplotlib")
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import themisasi.plots as tap
+
+    cal = ta.loadcal(cal1fn, dtype="int16")
+    fg, ax = tap.plotazel(cal.assign_attrs(filename=cal1fn.name))
+
+    # contours of degrees, not of stored centidegrees
+    caz, cel = ax[0].collections[0], ax[1].collections[0]
+    assert 0 <= caz.zmin and caz.zmax <= 360
+    assert cel.zmax <= 90
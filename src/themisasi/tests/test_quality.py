@@ -0,0 +1,51 @@
+import shutil
+import numpy as np
+from pathlib import Path
+import pytest
+
+import themisasi as ta
+import themisasi.quality as taq
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+
+
+@pytest.fixture
+def fn(tmp_path):
+    return Path(shutil.copy2(datfn, tmp_path))
+
+
+def test_frame_stats():
+    imgs = np.ones((4, 8, 8), dtype=np.uint16)
+    imgs[1] = 3
+    imgs[2, :2] = taq.SATURATION
+
+    full = taq.frame_stats(imgs)
+    assert full["mean"][1] == 3
+    assert full["saturated"].tolist() == [0, 0, 0.25, 0]
+    assert np.isnan(full["change"][0])
+    # batches give the same result as the whole stack
+    b0 = taq.frame_stats(imgs[:2])
+    b1 = taq.frame_stats(imgs[2:], prev=imgs[1])
+    for k in full:
+        assert np.allclose(np.concatenate((b0[k], b1[k])), full[k], equal_nan=True)
+
+
+def test_sidecar(fn):
+    q = taq.screen(fn, batch=5)
+    assert taq.sidecar(fn).is_file()
+    assert q.time.size == 23
+
+    assert taq.load_stats(fn).identical(q)
+    assert taq.accepted(fn).all()
+
+
+def test_load_quality(fn):
+    q = taq.load_stats(fn)
+    thres = float(q["mean"].median())
+
+    dat = ta.load(fn, quality={"max_mean": thres})
+
+    assert dat.time.size == (q["mean"] <= thres).sum()
+    assert (dat.time.values == q.time.values[q["mean"].values <= thres]).all()
+    assert (dat["imgs"].values == ta.load(fn)["imgs"].values[q["mean"].values <= thres]).all()
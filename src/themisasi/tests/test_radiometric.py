@@ -0,0 +1,59 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.io as tai
+import themisasi.radiometric as tar
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def test_response():
+    r = tar.response([427.8, 557.7, 630.0, 1200.0])
+
+    assert (r[:3] > 0).all() and r[3] == 0
+    assert r[0] == pytest.approx(0.5 * 0.4, rel=0.5)
+
+
+def test_conversion():
+    cal = ta.loadcal(cal1fn)
+
+    conv = tar.conversion(cal, 630.0, dark=100.0, dn_per_rayleigh=2.0)
+    g = conv["gain"].values
+
+    assert conv.units == "R"
+    assert np.isnan(g[~cal["valid"].values]).all()
+    assert np.nanmax(g) == pytest.approx(tar.response(557.7) / tar.response(630.0) / 2)
+
+    with pytest.raises(ValueError):
+        tar.conversion(cal, 1200.0)
+
+
+def test_apply():
+    cal = ta.loadcal(cal1fn)
+    imgs = next(tai.iterload(datfn, batch=5))
+    conv = tar.conversion(cal, dark=None)
+
+    out = np.empty(imgs.shape, dtype=np.float32)
+    res = tar.apply(imgs, conv, out)
+    assert res is out
+
+    v = cal["valid"].values
+    assert res[:, v] == pytest.approx(imgs.values[:, v].astype(np.float32))
+
+
+def test_calibrated():
+    cal = ta.loadcal(cal1fn)
+    conv = tar.conversion(cal)
+
+    for imgs in tar.calibrated(tai.iterload(datfn, batch=10), conv):
+        assert imgs.dtype == np.float32
+        assert imgs.units == "relative"
+        # dark level from outside the FOV
+        assert np.nanmedian(imgs.values[0]) < np.nanmedian(
+            tai.iterload(datfn, batch=1).__next__().values[0]
+        )
+        break
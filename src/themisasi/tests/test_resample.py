@@ -0,0 +1,76 @@
+import shutil
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.resample as tar
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+
+
+@pytest.fixture
+def fn(tmp_path):
+    return Path(shutil.copy2(datfn, tmp_path))
+
+
+def test_resample(fn):
+    dat = tar.resample(fn, width="30s", percentiles=(50,), batch=5)
+    ref = ta.load(datfn)["imgs"].resample(time="30s")
+
+    assert dat.time.size == 120
+    n = ref.count("time").values[:, 0, 0]
+    assert (dat["count"].values[: n.size] == n).all()
+    assert dat["count"].values[n.size :].sum() == 0
+
+    assert dat["mean"].values[: n.size] == pytest.approx(ref.mean().values, rel=1e-6)
+    assert (dat["max"].values[: n.size] == ref.max().values).all()
+    assert (dat["p50"].values[: n.size] == ref.median().values.astype(np.float32)).all()
+    assert np.isnan(dat["mean"].values[-1]).all()
+
+
+def test_cache(fn):
+    dat = tar.resample(fn, width="1min")
+    assert tar.sidecar(fn, tar._width("1min")).is_file()
+
+    again = tar.resample(fn, width="1min")
+    assert again.identical(dat)
+
+    with_p = tar.resample(fn, width="1min", percentiles=(90,))
+    assert "p90" in with_p
+    assert with_p["mean"].equals(dat["mean"])
+
+
+def test_treq(fn):
+    dat = tar.resample(fn, treq=("2011-01-06T17:00:10", "2011-01-06T17:01"), width="30s")
+
+    assert dat.time.size == 3
+    # whole bins overlapping the request
+    assert dat["count"].sum() == 23
+
+
+def test_width():
+    with pytest.raises(ValueError):
+        tar._width("7min")
+
+
+def test_treq_partial(fn, monkeypatch):
+    import themisasi.io as tai
+
+    read = []
+    records = tai._read_records
+    monkeypatch.setattr(
+        tai, "_read_records", lambda h, v, i, **kw: read.extend(i) or records(h, v, i)
+    )
+
+    treq = ("2011-01-06T17:00:10", "2011-01-06T17:00:20")
+    dat = tar.resample(fn, treq=treq, width="30s")
+
+    # only the records of the requested bin are read, and the partial hour is not stored
+    assert len(read) == dat["count"].sum() < 23
+    assert not tar.sidecar(fn, tar._width("30s")).is_file()
+
+    ref = tar.resample(fn, width="30s", cache=False)
+    assert dat.time.size == 1
+    assert dat["mean"].equals(ref["mean"].isel(time=[0]))
@@ -0,0 +1,69 @@
+import multiprocessing
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+import themisasi.shared as tas
+
+R = Path(__file__).parent
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def _nansum(handle):
+    cal = tas.attach(handle)
+    return float(np.nansum(cal["el"].values)), cal["el"].values.flags.writeable
+
+
+def test_attach():
+    cal = ta.loadcal(cal1fn, dtype="int16")
+
+    with tas.published(cal) as handle:
+        shared = tas.attach(handle)
+        assert shared.identical(cal)
+        assert not shared["az"].values.flags.writeable
+
+    assert not tas._published
+
+
+def test_variables():
+    cal = ta.loadcal(cal1fn)
+
+    with tas.published(cal, ["el"]) as handle:
+        shared = tas.attach(handle)
+        assert list(shared.data_vars) == ["el"]
+        assert shared["el"].equals(cal["el"])
+
+
+def test_pool():
+    cal = ta.loadcal(cal1fn)
+
+    with tas.published(cal) as handle:
+        with multiprocessing.get_context("spawn").Pool(2) as pool:
+            res = pool.map(_nansum, [handle] * 4)
+
+    assert res == [(pytest.approx(float(np.nansum(cal["el"].values))), False)] * 4
+
+
+def test_pool_tracker():
+    # the publisher unlinks its segments cleanly after pool workers attached them
+    code = f"""
+import multiprocessing
+import subprocess
+import sys
+import themisasi as ta
+import themisasi.shared as tas
+from themisasi.tests.test_shared import _nansum
+
+if __name__ == "__main__":
+    with tas.published(ta.loadcal({str(cal1fn)!r})) as handle:
+        with multiprocessing.get_context("spawn").Pool(2) as pool:
+            pool.map(_nansum, [handle] * 4)
+"""
+    ret = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=120)
+
+    assert ret.returncode == 0, ret.stderr
+    assert "Traceback" not in ret.stderr
+    assert "leaked" not in ret.stderr
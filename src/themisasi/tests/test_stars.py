@@ -0,0 +1,63 @@
+import numpy as np
+import xarray
+from pathlib import Path
+from pytest import approx
+
+import themisasi as ta
+import themisasi.stars as tas
+from themisasi.celestial import radec2azel
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+
+def test_catalog():
+    cat = tas.catalog(2.0)
+    assert "Polaris" in cat["name"] and "Vega" in cat["name"]
+    assert (cat["vmag"] <= 2.0).all()
+
+
+def test_detect():
+    imgs = np.random.default_rng(0).normal(1000, 5, (3, 64, 64))
+    imgs[1, 20, 30] += 200
+    imgs[2, 40:42, 10] += 200
+
+    f, row, col, amp = tas.detect(imgs)
+
+    assert f.tolist() == [1, 2]
+    assert row[0] == approx(20, abs=0.1) and col[0] == approx(30, abs=0.1)
+    assert row[1] == approx(40.5, abs=0.1) and col[1] == approx(10, abs=0.1)
+
+
+def test_bumped_camera():
+    """stars rendered with the skymap, then the skymap azimuth is off by 2 degrees"""
+    cal = ta.loadcal(cal1fn)
+    time = ta.load(datfn).time[:4]
+
+    cat = tas.catalog(3.0)
+    az, el = radec2azel(cat["ra_deg"], cat["dec_deg"], cal.lat, cal.lon, time.values)
+
+    imgs = np.random.default_rng(1).normal(1000, 5, (time.size, *cal["az"].shape))
+    caz = cal["az"].values
+    cel = cal["el"].values
+    for k in range(time.size):
+        for a, e in zip(az[k], el[k]):
+            if e < 20:
+                continue
+            d = np.hypot((caz - a + 180) % 360 - 180, cel - e)
+            i, j = np.unravel_index(np.nanargmin(d), d.shape)
+            imgs[k, i, j] += 500
+
+    cal["az"] = (cal["az"] + 2) % 360
+    dat = xarray.merge(
+        (xarray.Dataset({"imgs": (("time", "y", "x"), imgs)}, coords={"time": time}), cal)
+    )
+    dat.attrs = cal.attrs
+
+    fit = tas.fit_pointing(tas.match_stars(dat, tol=5))
+
+    assert fit.nmatch >= 10
+    assert fit.az_offset_deg == approx(2.0, abs=0.3)
+    assert fit.tilt_east_deg == approx(0, abs=0.3)
+    assert fit.tilt_north_deg == approx(0, abs=0.3)
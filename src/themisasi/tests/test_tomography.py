@@ -0,0 +1,74 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+
+pytest.importorskip("pymap3d")
+import themisasi.tomography as tat  # noqa: E402
+
+R = Path(__file__).parent
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+X = np.arange(-200e3, 300e3, 5e3)
+Z = np.arange(90e3, 300e3, 5e3)
+
+
+@pytest.fixture
+def cams():
+    cal = ta.loadcal(cal1fn)
+    other = cal.copy()
+    other.attrs = dict(cal.attrs, lon=cal.lon + 1.0, calfilename="other")
+
+    cut = {"cutrow": ("cut", np.full(160, 129)), "cutcol": ("cut", np.arange(48, 208))}
+
+    return [cal.assign(cut), other.assign(cut)]
+
+
+def test_projection(cams):
+    A = tat.projection(cams, X, Z)
+
+    assert A.shape == (320, (X.size - 1) * (Z.size - 1))
+    assert tat.projection(cams, X, Z) is A
+    # near-zenith ray crosses the whole altitude range
+    el = ta.io.azel(cams[0])[1][129, 124]
+    assert A[124 - 48].sum() == pytest.approx((Z[-1] - Z[0]) / np.sin(np.radians(el)), rel=0.01)
+    # path lengths within a cell are at most the cell diagonal
+    assert A.max() <= np.hypot(5e3, 5e3) * 1.001
+
+
+def test_projection_exact(cams):
+    import pymap3d as pm
+
+    A = tat.projection(cams, X, Z)
+    geoms = [tat.camera(c) for c in cams]
+    cuts = [(c["cutrow"].values, c["cutcol"].values) for c in cams]
+    h = tat._along(geoms, cuts, Z)
+    g = geoms[0]
+
+    # reference by dense sampling of a few rays
+    step = 5.0
+    for ray in (20, 76, 140):
+        d = g.ecef[129, 48 + ray]
+        s = (np.arange(int(600e3 / step)) + 0.5) * step
+        p = g.origin + s[:, None] * d
+        alt = pm.ecef2geodetic(p[:, 0], p[:, 1], p[:, 2])[2]
+        ix = np.searchsorted(X, (p - g.origin) @ h) - 1
+        iz = np.searchsorted(Z, alt) - 1
+        ok = (ix >= 0) & (ix < X.size - 1) & (iz >= 0) & (iz < Z.size - 1)
+        ref = np.bincount(iz[ok] * (X.size - 1) + ix[ok], minlength=A.shape[1]) * step
+
+        # within the sampling error of the reference
+        assert abs(A[ray].toarray()[0] - ref).max() < 2 * step
+        # lengths are not quantized to a sampling step
+        assert (A[ray].data % step != 0).any()
+
+
+def test_brightness(cams):
+    imgs = np.arange(2 * 256 * 256, dtype=np.uint16).reshape(2, 256, 256)
+    dat = [c.assign(imgs=(("time", "y", "x"), imgs)) for c in cams]
+
+    b = tat.brightness(dat, cams)
+
+    assert b.shape == (2, 320)
+    assert b[1, 0] == imgs[1, 129, 48]
@@ -0,0 +1,47 @@
+from pathlib import Path
+import numpy as np
+import pytest
+
+import themisasi as ta
+
+pytest.importorskip("pymap3d")
+import themisasi.geometry as tag  # noqa: E402
+import themisasi.triangulation as tat  # noqa: E402
+
+R = Path(__file__).parent
+cal1fn = R / "themis_skymap_gako_20110305-+_vXX.sav"
+
+H = 130e3  # emission altitude of the synthetic aurora
+
+
+def _frames(cal, lat0, time):
+    """synthetic auroral arcs drifting south at altitude H"""
+    lat, lon, _ = tag.camera(cal).geodetic(H)
+    imgs = [
+        1000
+        + 2000 * np.exp(-(((lat - lat0 - 0.02 * k) / 0.05) ** 2))
+        + 1000 * np.exp(-((((lon - 0.4 * lat - 0.3 * k) % 2 - 1) / 0.1) ** 2))
+        for k in range(time.size)
+    ]
+    imgs = np.nan_to_num(np.stack(imgs)).astype(np.uint16)
+
+    return cal.assign(imgs=(("time", "y", "x"), imgs)).assign_coords(time=time)
+
+
+def test_triangulate():
+    cal = ta.loadcal(cal1fn)
+    other = cal.copy()
+    other.attrs = dict(cal.attrs, lat=cal.lat + 0.5, calfilename="other", site="other")
+
+    t = np.datetime64("2011-03-06T06:00") + np.arange(4) * np.timedelta64(3, "s")
+    dat0 = _frames(cal, cal.lat + 0.3, t)
+    # exposures of the other site are not simultaneous
+    dat1 = _frames(other, cal.lat + 0.3, t + np.timedelta64(400, "ms"))
+
+    alt = tat.triangulate(dat0, dat1, region=32)
+
+    assert alt.time.size == 4
+    assert alt["correlation"].shape == (4, tat.ALTITUDES.size, alt.region.size)
+    good = alt["corr"].values > 0.9
+    assert good.sum() > 20
+    assert np.median(alt["altitude_m"].values[good]) == pytest.approx(H, abs=5e3)
@@ -0,0 +1,46 @@
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import themisasi.watch as taw
+
+R = Path(__file__).parent
+datfn = R / "thg_l1_asf_gako_2011010617_v01.cdf"
+
+
+def test_since(tmp_path):
+    shutil.copy2(datfn, tmp_path)
+
+    state: dict = {}
+    imgs = list(
+        taw.watch(
+            tmp_path,
+            "gako",
+            since=datetime(2011, 1, 6, 17),
+            batch=10,
+            poll=0.1,
+            timeout=0.3,
+            state=state,
+        )
+    )
+
+    assert [i.time.size for i in imgs] == [10, 10, 3]
+    assert np.datetime64(state[datfn.name]) == imgs[-1].time.values[-1]
+    # nothing is consumed twice, also after saving the state
+    state = json.loads(json.dumps(state))
+    assert not list(taw.watch(tmp_path, "gako", poll=0.1, timeout=0.3, state=state))
+
+
+def test_new_file(tmp_path):
+    timer = threading.Timer(0.3, shutil.copy2, (datfn, tmp_path))
+    timer.start()
+
+    imgs = list(taw.watch(tmp_path, "gako", poll=0.1, timeout=1.0))
+    timer.join()
+
+    assert sum(i.time.size for i in imgs) == 23
+    assert imgs[0].filename == datfn.name
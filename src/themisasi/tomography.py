@@ -0,0 +1,199 @@
+"""
+sparse tomography projection matrix for 1-D cuts of camera images
+
+fov.line2plane() picks the pixels (cutrow, cutcol) of each camera along the plane through the cameras
+and magnetic zenith. Here the rays of those pixels are traced through a 2-D grid of cells in that plane,
+horizontal distance along the plane by altitude, giving the projection matrix A of exact intersection lengths:
+the brightness of each cut pixel is A @ (volume emission rate of each cell).
+
+    A = themisasi.tomography.projection([cam0, cam1], xedges_m, zedges_m)
+    b = themisasi.tomography.brightness([dat0, dat1], [cam0, cam1])  # (time, ray)
+
+The matrix is cached per cameras, calibrations and grid.
+"""
+
+from __future__ import annotations
+import typing
+
+import numpy as np
+import scipy.sparse
+
+from .geometry import camera
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+PROJECTION_CACHE_SIZE = 4
+_projection_cache: dict[tuple, scipy.sparse.csr_matrix] = {}
+
+
+def projection(
+    cams: list[xarray.Dataset], xedges_m, zedges_m, chunk: int = 64
+) -> scipy.sparse.csr_matrix:
+    """
+    ray-cell intersection lengths of the cut pixels of each camera
+
+    Each ray is split at its crossings of the cell boundaries, Siddon-style:
+    the vertical boundaries are planes, crossed where the distance along the plane is an edge,
+    and the altitude boundaries are shells of the Earth's shape, crossed where geometry.Camera.intersect() says.
+    Rising rays cross each altitude once, so the segment between consecutive crossings lies in one cell,
+    and its length is the exact intersection length.
+
+    Parameters
+    ----------
+    cams: list of xarray.Dataset
+        cameras with calibration and "cutrow", "cutcol" from fov.line2plane()
+    xedges_m: numpy.ndarray
+        cell edges of horizontal distance (meters) along the plane from the first camera
+    zedges_m: numpy.ndarray
+        cell edges of altitude (meters)
+    chunk: int
+        rays traced at once, to bound memory
+
+    Returns
+    -------
+    A: scipy.sparse.csr_matrix
+        (ray, cell) intersection lengths (meters). Rays are the cut pixels of each camera in order,
+        cells are altitude-major: cell = iz * (len(xedges_m) - 1) + ix
+    """
+    xedges_m = np.asarray(xedges_m, dtype=float)
+    zedges_m = np.asarray(zedges_m, dtype=float)
+
+    geoms = [camera(c) for c in cams]
+    cuts = [(np.asarray(c["cutrow"]), np.asarray(c["cutcol"])) for c in cams]
+
+    key = (
+        tuple((g, r.tobytes(), c.tobytes()) for g, (r, c) in zip(geoms, cuts)),
+        xedges_m.tobytes(),
+        zedges_m.tobytes(),
+    )
+    if key in _projection_cache:
+        return _projection_cache[key]
+
+    origin = geoms[0].origin
+    h = _along(geoms, cuts, zedges_m)
+    nx = xedges_m.size - 1
+    nz = zedges_m.size - 1
+
+    rows = []
+    cells = []
+    lengths = []
+    ray0 = 0
+    for g, (r, c) in zip(geoms, cuts):
+        for k in range(0, r.size, chunk):
+            rc = (r[k : k + chunk], c[k : k + chunk])
+            ray, cell, L = _trace(g, rc, origin, h, xedges_m, zedges_m)
+            rows.append(ray0 + k + ray)
+            cells.append(cell)
+            lengths.append(L)
+        ray0 += r.size
+
+    A = scipy.sparse.coo_matrix(
+        (np.concatenate(lengths), (np.concatenate(rows), np.concatenate(cells))),
+        shape=(ray0, nx * nz),
+    ).tocsr()
+
+    if len(_projection_cache) >= PROJECTION_CACHE_SIZE:
+        _projection_cache.pop(next(iter(_projection_cache)))
+    _projection_cache[key] = A
+
+    return A
+
+
+def _trace(g, rc, origin, h, xedges_m, zedges_m) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (ray, cell, length) of each ray segment within a cell
+
+    Parameters
+    ----------
+    g: geometry.Camera
+        camera
+    rc: tuple of numpy.ndarray
+        (row, col) pixels of the rays
+    origin: numpy.ndarray
+        ECEF origin (meters) of distance along the plane
+    h: numpy.ndarray
+        ECEF unit vector along the plane
+    xedges_m, zedges_m: numpy.ndarray
+        cell edges (meters)
+    """
+    nx = xedges_m.size - 1
+    nz = zedges_m.size - 1
+
+    d = g.ecef[rc]
+    # rays outside the FOV or not rising have no segments
+    rising = np.nan_to_num(d @ g.rotation[:, 2]) > 0
+
+    # distance along each ray to each altitude shell, 0 for shells below the camera
+    sz = np.stack(
+        [np.linalg.norm(g.intersect(z, rc) - g.origin, axis=-1) for z in zedges_m], axis=-1
+    )
+    sz[:, zedges_m <= g.alt_m] = 0.0
+    # distance along each ray to each vertical boundary, where x(s) = x0 + s * dh
+    x0 = (g.origin - origin) @ h
+    dh = d @ h
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sx = (xedges_m - x0) / dh[:, None]
+
+    top = np.nan_to_num(sz[:, -1:])
+    b = np.sort(np.clip(np.nan_to_num(np.hstack((sx, sz)), posinf=0, neginf=0), 0, top), axis=1)
+
+    L = np.diff(b, axis=1)
+    mid = (b[:, 1:] + b[:, :-1]) / 2
+    ix = np.searchsorted(xedges_m, x0 + mid * dh[:, None]) - 1
+    # altitude increases along rising rays, so the cell is the number of shells passed
+    iz = (mid[..., None] >= sz[:, None, :]).sum(axis=-1) - 1
+
+    good = rising[:, None] & (L > 0) & (ix >= 0) & (ix < nx) & (iz >= 0) & (iz < nz)
+    ray = np.nonzero(good)[0]
+
+    return ray, iz[good] * nx + ix[good], L[good]
+
+
+def brightness(imgs: list, cams: list[xarray.Dataset]) -> np.ndarray:
+    """
+    brightness of the cut pixels of each camera, in the ray order of projection()
+
+    Parameters
+    ----------
+    imgs: list of xarray.Dataset or xarray.DataArray
+        time-aligned images of each camera e.g. gathered with themisasi.align
+    cams: list of xarray.Dataset
+        cameras with "cutrow", "cutcol" from fov.line2plane()
+
+    Returns
+    -------
+    b: numpy.ndarray
+        (time, ray) brightness
+    """
+    b = []
+    for im, c in zip(imgs, cams):
+        if hasattr(im, "data_vars"):
+            im = im["imgs"]
+        b.append(im.values[:, np.asarray(c["cutrow"]), np.asarray(c["cutcol"])])
+
+    return np.concatenate(b, axis=1)
+
+
+def _along(geoms, cuts, zedges_m) -> np.ndarray:
+    """
+    ECEF unit vector along the plane, horizontal at the first camera:
+    principal horizontal direction of the cut rays, pointing toward the second camera if any
+    """
+    g0 = geoms[0]
+    up = g0.rotation[:, 2]
+    z = zedges_m[len(zedges_m) // 2]
+
+    p = np.concatenate([g.intersect(z, rc) for g, rc in zip(geoms, cuts)]) - g0.origin
+    p = p[np.isfinite(p).all(axis=1)]
+    p -= np.outer(p @ up, up)
+
+    h = np.linalg.svd(p - p.mean(axis=0), full_matrices=False)[2][0]
+    h -= (h @ up) * up
+    h /= np.linalg.norm(h)
+
+    ref = geoms[1].origin - g0.origin if len(geoms) > 1 else p[-1] - p[0]
+    if h @ ref < 0:
+        h = -h
+
+    return h
@@ -0,0 +1,211 @@
+"""
+stereo triangulation of auroral emission altitude from two cameras with overlapping FOV
+
+For each candidate altitude, camera 0 pixels are projected onto the altitude shell
+and looked up in camera 1, once per pair of calibrations (cached).
+The emission altitude of each image region is where the brightness of camera 0 pixels
+best correlates with the brightness of the corresponding camera 1 pixels.
+Frames are matched in time with themisasi.align and processed in batches,
+so a whole night costs a few gathers and reductions per frame.
+
+    alt = themisasi.triangulation.triangulate(gako, fykn)
+    alt["altitude_m"]  # (time, region)
+"""
+
+from __future__ import annotations
+import typing
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .align import align
+from .celestial import azel2enu
+from .geometry import camera
+from .io import TIME_TOL
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+ALTITUDES = np.arange(80e3, 260e3, 5e3)  # meters, candidate emission altitudes
+MIN_EL = 15.0  # degrees, calibration error is large near the horizon
+MIN_PIXELS = 16  # fewest matched pixels in a region for a correlation
+
+CORRESPONDENCE_CACHE_SIZE = 8
+_correspondence_cache: dict[tuple, dict[str, np.ndarray]] = {}
+
+
+def correspondence(
+    cal0: xarray.Dataset, cal1: xarray.Dataset, altitudes=ALTITUDES, min_el: float = MIN_EL
+) -> dict[str, np.ndarray]:
+    """
+    camera 1 pixel seeing each camera 0 pixel at each candidate altitude, cached per calibration pair
+
+    Parameters
+    ----------
+    cal0, cal1: xarray.Dataset
+        calibrations with az, el, lat, lon, alt_m
+    altitudes: numpy.ndarray
+        candidate emission altitudes (meters)
+    min_el: float
+        minimum elevation angle (degrees) in either camera
+
+    Returns
+    -------
+    corr: dict
+        * rows, cols: (pixel,) camera 0 pixels above min_el
+        * index: (altitude, pixel) flat index of the nearest camera 1 pixel, -1 where not seen by camera 1
+    """
+    g0 = camera(cal0)
+    g1 = camera(cal1)
+    altitudes = np.atleast_1d(np.asarray(altitudes, dtype=float))
+
+    key = (g0, g1, tuple(altitudes), float(min_el))
+    if key in _correspondence_cache:
+        return _correspondence_cache[key]
+
+    el0 = g0.enu[..., 2]
+    rows, cols = np.nonzero(el0 >= np.sin(np.radians(min_el)))
+
+    fov1 = np.flatnonzero(g1.enu[..., 2].ravel() >= np.sin(np.radians(min_el)))
+    tree = cKDTree(g1.enu.reshape(-1, 3)[fov1])
+    # angular size of a pixel, chord length on unit sphere
+    pixscale = np.median(tree.query(tree.data[:: max(fov1.size // 1000, 1)], k=2)[0][:, 1])
+
+    index = np.full((altitudes.size, rows.size), -1)
+    for k, alt in enumerate(altitudes):
+        az, el = g1.look(g0.intersect(alt, (rows, cols)))
+        d, j = tree.query(azel2enu(az, el), distance_upper_bound=2 * pixscale)
+        ok = np.isfinite(d)
+        index[k, ok] = fov1[j[ok]]
+
+    corr = {"rows": rows, "cols": cols, "index": index, "altitudes": altitudes}
+
+    if len(_correspondence_cache) >= CORRESPONDENCE_CACHE_SIZE:
+        _correspondence_cache.pop(next(iter(_correspondence_cache)))
+    _correspondence_cache[key] = corr
+
+    return corr
+
+
+def triangulate(
+    dat0: xarray.Dataset,
+    dat1: xarray.Dataset,
+    altitudes=ALTITUDES,
+    region: int = 16,
+    min_el: float = MIN_EL,
+    tol: float = TIME_TOL,
+    batch: int = 64,
+) -> xarray.Dataset:
+    """
+    emission altitude of each image region for each pair of time-aligned frames
+
+    Parameters
+    ----------
+    dat0, dat1: xarray.Dataset
+        images with calibration from themisasi.load() of two sites with overlapping FOV
+    altitudes: numpy.ndarray
+        candidate emission altitudes (meters)
+    region: int
+        width (pixels) of the square camera 0 image regions, each gets its own altitude
+    min_el: float
+        minimum elevation angle (degrees)
+    tol: float
+        maximum time offset (seconds) between frames of the two sites
+    batch: int
+        number of frame pairs processed at once
+
+    Returns
+    -------
+    alt: xarray.Dataset
+        * altitude_m: (time, region) altitude of best correlation, refined between candidates. NaN if not found.
+        * corr: (time, region) best correlation
+        * correlation: (time, altitude, region) correlation at each candidate altitude
+        * row, col: (region,) center of each region in camera 0
+    """
+    import xarray
+
+    c = correspondence(dat0, dat1, altitudes, min_el)
+    altitudes = c["altitudes"]
+    # %% group camera 0 pixels by region
+    ncol = -(-dat0["imgs"].shape[2] // region)
+    label = (c["rows"] // region) * ncol + c["cols"] // region
+    order = np.argsort(label, kind="stable")
+    regions, starts = np.unique(label[order], return_index=True)
+    rows = c["rows"][order]
+    cols = c["cols"][order]
+    index = c["index"][:, order]
+    w = (index >= 0).astype(np.float32)  # (altitude, pixel)
+    index = np.where(index >= 0, index, 0)
+
+    n = np.add.reduceat(w, starts, axis=1)  # (altitude, region)
+    # %% frame pairs
+    idx = align({"0": dat0, "1": dat1}, tol=tol)
+    i0 = idx["0"].values
+    i1 = idx["1"].values
+
+    out = np.full((i0.size, altitudes.size, regions.size), np.nan, dtype=np.float32)
+
+    for k in range(0, i0.size, batch):
+        a = dat0["imgs"].values[i0[k : k + batch]][:, rows, cols].astype(np.float32)
+        img1 = dat1["imgs"].values[i1[k : k + batch]]
+        img1 = img1.reshape(img1.shape[0], -1)
+        for j in range(altitudes.size):
+            b = img1[:, index[j]].astype(np.float32)
+            out[k : k + batch, j] = _correlate(a, b, w[j], starts, n[j])
+
+    out[:, n < MIN_PIXELS] = np.nan
+
+    alt, best = _peak(out, altitudes)
+
+    return xarray.Dataset(
+        {
+            "altitude_m": (("time", "region"), alt),
+            "corr": (("time", "region"), best),
+            "correlation": (("time", "altitude", "region"), out),
+        },
+        coords={
+            "time": idx.time.values,
+            "altitude": altitudes,
+            "row": ("region", (regions // ncol) * region + region / 2),
+            "col": ("region", (regions % ncol) * region + region / 2),
+        },
+        attrs={"site0": dat0.attrs.get("site"), "site1": dat1.attrs.get("site")},
+    )
+
+
+def _correlate(a, b, w, starts, n):
+    """weighted Pearson correlation over the pixels of each region"""
+
+    def rsum(x):
+        return np.add.reduceat(x * w, starts, axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ma = rsum(a) / n
+        mb = rsum(b) / n
+        cov = rsum(a * b) / n - ma * mb
+        va = rsum(a * a) / n - ma**2
+        vb = rsum(b * b) / n - mb**2
+
+        return cov / np.sqrt(va * vb)
+
+
+def _peak(corr, altitudes) -> tuple[np.ndarray, np.ndarray]:
+    """altitude of maximum correlation, refined by a parabola through the neighboring candidates"""
+    c = np.where(np.isfinite(corr), corr, -np.inf)
+    k = c.argmax(axis=1)
+    best = np.take_along_axis(corr, k[:, None], axis=1)[:, 0]
+
+    # the end candidates are not refined
+    km = np.clip(k, 1, max(altitudes.size - 2, 1))
+    y0, y1, y2 = (
+        np.take_along_axis(corr, np.clip(km + d, 0, altitudes.size - 1)[:, None], axis=1)[:, 0]
+        for d in (-1, 0, 1)
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shift = 0.5 * (y0 - y2) / (y0 - 2 * y1 + y2)
+    shift = np.where((km == k) & np.isfinite(shift) & (abs(shift) <= 1), shift, 0)
+
+    alt = np.interp(k + shift, np.arange(altitudes.size), altitudes)
+    alt[~np.isfinite(best)] = np.nan
+
+    return alt, best
@@ -1,8 +1,5 @@
 from argparse import ArgumentParser
 
-from .io import load
-from .plots import plotasi, plotazel
-
 """
 Playback THEMIS ASI videos
 * optionally, save images to stack of PNGs
@@ -19,13 +16,22 @@ def cli():
     p.add_argument("site", help="THEMIS ASI site code e.g. fykn")
     p.add_argument("treq", help="time or start,stop time range requested", nargs="+")
     p.add_argument("-o", "--odir", help="write video to this directory")
+    p.add_argument("--fps", help="fast playback at this target frames/second", type=float)
     P = p.parse_args()
 
-    imgs = load(P.path, site=P.site, treq=P.treq)
+    from .io import load, iterload
+    from .plots import plotasi, plotazel
+
+    fast = P.fps and not P.odir
+    # fast playback streams frames from disk, so only the first frame is loaded up front
+    imgs = load(P.path, site=P.site, treq=P.treq[0] if fast else P.treq)
     # %% plot
     plotazel(imgs)
 
-    plotasi(imgs, P.odir)
+    if fast:
+        plotasi(imgs, fps=P.fps, batches=iterload(P.path, P.site, P.treq))
+    else:
+        plotasi(imgs, P.odir, P.fps)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""
+near-real-time tail of a growing THEMIS ASI data directory
+
+New hourly files and new records of growing files are yielded as they arrive.
+The time of the last consumed record of each file is kept, so records are never read twice.
+Pass the same "state" dict to resume after a restart, e.g. saved as JSON by the operations display:
+its values are ISO 8601 time strings.
+
+    for imgs in themisasi.watch.watch("~/data/themis", "gako"):
+        display(imgs)
+
+With the optional inotify_simple package on Linux, files are picked up as soon as they are written,
+otherwise the directory is polled.
+"""
+
+from __future__ import annotations
+import collections.abc
+import logging
+import time
+import typing
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .io import _read_records, epoch2datetime64
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+if typing.TYPE_CHECKING:
+    import xarray
+
+POLL = 5.0  # seconds between directory scans without inotify, or as backstop with inotify
+
+
+def watch(
+    path: Path,
+    site: str,
+    since: datetime | None = None,
+    batch: int = 64,
+    poll: float = POLL,
+    timeout: float | None = None,
+    state: dict[str, str] | None = None,
+) -> collections.abc.Iterator[xarray.DataArray]:
+    """
+    yields new images of a site as data files appear or grow
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        directory where Themis ASI data files arrive
+    site: str
+        site code e.g. gako
+    since: datetime.datetime, optional
+        yield records after this time, including those already on disk.
+        By default only records arriving after watch() starts are yielded.
+    batch: int
+        maximum number of records per yielded batch
+    poll: float
+        seconds between directory scans
+    timeout: float, optional
+        stop after this many seconds without new records. By default, watch forever.
+    state: dict, optional
+        filename: ISO 8601 time of last consumed record, updated in place. Takes precedence over "since".
+
+    Yields
+    ------
+    imgs: xarray.DataArray
+        (time, y, x) batch of new images, in time order
+    """
+    path = Path(path).expanduser()
+    if not path.is_dir():
+        raise NotADirectoryError(path)
+
+    if state is None:
+        state = {}
+    seen: dict[str, tuple[int, float]] = {}  # filename: (size, mtime) when last read
+
+    if since is None and not state:
+        for fn in _files(path, site):
+            try:
+                t = _newrecords(fn, site, None)[0]
+            except (OSError, ValueError, KeyError, IndexError):
+                continue
+            if t.size:
+                state[fn.name] = _iso(t[-1])
+            seen[fn.name] = _stat(fn)
+    start = None if since is None else _iso(np.datetime64(since, "ns"))
+
+    notify = None
+    if INotify is not None:
+        notify = INotify()
+        notify.add_watch(path, flags.CLOSE_WRITE | flags.MOVED_TO)
+
+    tlast = time.monotonic()
+
+    try:
+        while True:
+            new = False
+            for fn in _files(path, site):
+                st = _stat(fn)
+                if seen.get(fn.name) == st:
+                    continue
+
+                try:
+                    t, i, h = _newrecords(fn, site, state.get(fn.name, start))
+                except (OSError, ValueError, KeyError, IndexError) as e:
+                    # file still being written, try again next scan
+                    logging.debug(f"{fn.name} not readable yet: {e}")
+                    continue
+
+                seen[fn.name] = st
+
+                for k in range(0, i.size, batch):
+                    j = i[k : k + batch]
+                    yield _dataarray(h, fn, site, t[j], j)
+                    state[fn.name] = _iso(t[j[-1]])
+                    new = True
+
+            if new:
+                tlast = time.monotonic()
+            elif timeout is not None and time.monotonic() - tlast > timeout:
+                return
+
+            wait = poll if timeout is None else min(poll, timeout)
+            if notify is not None:
+                notify.read(timeout=int(wait * 1000), read_delay=100)
+            else:
+                time.sleep(wait)
+    finally:
+        if notify is not None:
+            notify.close()
+
+
+def _files(path: Path, site: str) -> list[Path]:
+    """data files of a site, in time order"""
+    return sorted(path.glob(f"thg_l1_asf_{site}_*.cdf"))
+
+
+def _stat(fn: Path) -> tuple[int, float]:
+    st = fn.stat()
+    return st.st_size, st.st_mtime
+
+
+def _iso(t: np.datetime64) -> str:
+    """time as a JSON-friendly ISO 8601 string, to nanoseconds"""
+    return str(np.datetime_as_string(t, unit="ns"))
+
+
+def _newrecords(fn: Path, site: str, after: str | None) -> tuple:
+    """
+    times and indices of records after a time
+
+    Returns
+    -------
+    time: numpy.ndarray of datetime64
+        times of all records in file
+    i: numpy.ndarray of int
+        indices of records after "after"
+    h: cdflib.cdfread.CDF
+        open file
+    """
+    import cdflib
+
+    h = cdflib.cdfread.CDF(fn)
+    t = epoch2datetime64(h[f"thg_asf_{site}_epoch"][:])
+
+    if after is None:
+        return t, np.arange(t.size), h
+
+    return t, np.flatnonzero(t > np.datetime64(after, "ns")), h
+
+
+def _dataarray(h, fn: Path, site: str, t, i) -> xarray.DataArray:
+    import xarray
+
+    return xarray.DataArray(
+        _read_records(h, f"thg_asf_{site}", i),
+        coords={"time": t},
+        dims=["time", "y", "x"],
+        attrs={"filename": fn.name, "site": site},
+    )